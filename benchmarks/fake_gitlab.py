@@ -0,0 +1,96 @@
+import time
+import random
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from benchmarks.stub import GitLabStub, StubProject, linear_commits
+
+__all__ = (
+    'OrgShape',
+    'synthetic_org',
+    'FakeGitLab',
+)
+
+
+@dataclass
+class OrgShape:
+    """Shape of a synthetic GitLab organisation."""
+    groups: int = 4
+    projects_per_group: int = 10
+    branches: int = 4
+    commits_per_branch: int = 200
+    tree_depth: int = 3
+    files_per_directory: int = 5
+    authors: int = 8
+    seed: int = 0
+
+
+def _tree(depth: int, files_per_directory: int, prefix: str = '') -> Dict[str, str]:
+    files = {f'{prefix}module_{index}.py': 'pass\n' for index in range(files_per_directory)}
+    if depth > 1:
+        for index in range(2):
+            files.update(_tree(depth - 1, files_per_directory, f'{prefix}package_{index}/'))
+    return files
+
+
+def synthetic_org(shape: OrgShape) -> List[StubProject]:
+    """Projects with a main branch, ``branches - 1`` feature branches forked from it, and a nested source tree."""
+    rng = random.Random(shape.seed)
+    authors = [f'dev{index}' for index in range(shape.authors)]
+    projects = []
+    for group_index in range(shape.groups):
+        for project_index in range(shape.projects_per_group):
+            project_id = (group_index + 1) * 1000 + project_index
+            main = linear_commits(shape.commits_per_branch, author=rng.choice(authors))
+            commits, branches = list(main), {'main': main[-1]['id']}
+            for branch_index in range(1, shape.branches):
+                fork = rng.choice(main)
+                branch = linear_commits(shape.commits_per_branch, author=rng.choice(authors),
+                                        start=branch_index * shape.commits_per_branch, parent=fork['id'])
+                commits += branch
+                branches[f'feature-{branch_index}'] = branch[-1]['id']
+            files = _tree(shape.tree_depth, shape.files_per_directory, 'src/')
+            files.update({'.gitlab-ci.yml': 'stages:\n  - test\n', 'Dockerfile': 'FROM python:3.11\n',
+                          'tests/test_app.py': 'def test(): pass\n'})
+            projects.append(StubProject(
+                id=project_id,
+                name=f'project-{project_index}',
+                group=f'group-{group_index}',
+                commits=commits,
+                branches=branches,
+                files=files,
+                languages={'Python': 100.0},
+                hooks=project_index % 3,
+            ))
+    return projects
+
+
+class FakeGitLab(GitLabStub):
+    """
+    The test stub with production-like behaviour: every response is delayed by ``latency`` seconds, and once more
+    than ``rate_limit`` requests were made in the current second, requests are answered 429 until the next one.
+    """
+
+    def __init__(self, projects: List[StubProject], latency: float = 0.0, rate_limit: int = 0):
+        super().__init__(projects)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.num_rate_limited = 0
+        self._window: Tuple[int, int] = (0, 0)
+        self._window_lock = threading.Lock()
+
+    def handle(self, method: str, raw_path: str, if_none_match: str | None = None) -> Tuple[int, Dict[str, str], bytes]:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit:
+            now = time.time()
+            with self._window_lock:
+                second, count = self._window
+                second, count = (second, count + 1) if second == int(now) else (int(now), 1)
+                self._window = (second, count)
+                if count > self.rate_limit:
+                    self.num_rate_limited += 1
+                    return 429, {'Retry-After': '1', 'RateLimit-Remaining': '0', 'RateLimit-Reset': str(second + 1)}, \
+                        b'{"message": "429 Too Many Requests"}'
+        return super().handle(method, raw_path, if_none_match)
@@ -0,0 +1,186 @@
+"""
+Offline benchmarks: the crawl, the user activity scan and the report writer against a synthetic GitLab served on
+localhost. Run from the repository root, e.g.
+
+    python -m benchmarks.run --groups 4 --projects_per_group 25 --latency 0.02 --rate_limit 500 --output before.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import sqlite3
+import resource
+import tempfile
+import multiprocessing
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Dict, List
+
+import gitlab
+
+from benchmarks.fake_gitlab import FakeGitLab, OrgShape, synthetic_org
+
+__all__ = (
+    'BenchmarkResult',
+    'SCENARIOS',
+    'run_benchmarks',
+)
+
+REPORT_ROWS = 10000
+
+
+@dataclass
+class BenchmarkResult:
+    scenario: str
+    projects: int
+    wall_seconds: float
+    api_calls: int
+    rate_limited: int
+    peak_rss_mb: float
+    projects_per_minute: float
+
+
+def _peak_rss_mb() -> float:
+    # kilobytes on Linux; the largest pool worker is added to the scenario process
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return usage / 1024 if sys.platform != 'darwin' else usage / 2 ** 20
+
+
+def _worker_pool(url: str, directory: str, workers: int, backend: str = 'process', metrics: str = '') -> int:
+    from gitfile import process_project_attributes
+    from crawler.discovery import iter_projects
+    from crawler.pool import ClientSettings, open_worker_pool
+
+    gl = gitlab.Gitlab(url, private_token='token')
+    with open_worker_pool(backend, ClientSettings(url, 'token'), max_workers=workers) as executor:
+        futures = [executor.submit(process_project_attributes, project.attributes,
+                                   cache_path=os.path.join(directory, 'cache.sqlite'), metrics=metrics)
+                   for project in iter_projects(gl)]
+        return sum(future.result() is not None for future in futures)
+
+
+def _process_pool(url: str, directory: str, workers: int) -> int:
+    return _worker_pool(url, directory, workers)
+
+
+def _thread_pool(url: str, directory: str, workers: int) -> int:
+    return _worker_pool(url, directory, workers, backend='thread')
+
+
+def _inventory(url: str, directory: str, workers: int) -> int:
+    return _worker_pool(url, directory, workers, metrics='inventory')
+
+
+def _async_engine(url: str, directory: str, workers: int) -> int:
+    from crawler.async_crawl import run_crawl
+    from crawler.discovery import iter_projects
+
+    gl = gitlab.Gitlab(url, private_token='token')
+    rows = run_crawl(url, 'token', (project.attributes for project in iter_projects(gl)),
+                     cache_path=os.path.join(directory, 'cache.sqlite'))
+    return len(rows)
+
+
+def _users_activity(url: str, directory: str, workers: int) -> int:
+    from config import Settings
+    from use_cases.users_activity import get_user_activity
+
+    # built without the command line / .env sources, which belong to the benchmark here
+    settings = Settings.model_construct(access_token='token', gitlab_url=url, http_cache_path='',
+                                        cache_path=os.path.join(directory, 'activity.sqlite'))
+    get_user_activity(settings)
+    with sqlite3.connect(settings.cache_path) as connection:
+        return connection.execute('SELECT COUNT(*) FROM activity_watermarks').fetchone()[0]
+
+
+def _report_writer(url: str, directory: str, workers: int) -> int:
+    from gitfile import process_project
+    from crawler.report import open_report_sink, read_report
+
+    gl = gitlab.Gitlab(url, private_token='token')
+    row = process_project(gl.projects.list(get_all=False, per_page=1)[0])
+    # the rows of a large instance, written to and read back from both report formats
+    for path in ('report.parquet', 'report.jsonl'):
+        path = os.path.join(directory, path)
+        with open_report_sink(path) as sink:
+            for project_id in range(REPORT_ROWS):
+                sink.write(dict(row, **{'Project ID': project_id}))
+        read_report(path)
+    return REPORT_ROWS
+
+
+# each scenario returns the number of projects it handled
+SCENARIOS: Dict[str, Callable[[str, str, int], int]] = {
+    'process_pool': _process_pool,
+    'thread_pool': _thread_pool,
+    'inventory': _inventory,
+    'async_engine': _async_engine,
+    'users_activity': _users_activity,
+    'report_writer': _report_writer,
+}
+
+
+def _run_scenario(name: str, url: str, workers: int, results: multiprocessing.Queue):
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        num_projects = SCENARIOS[name](url, directory, workers)
+        results.put((num_projects, time.perf_counter() - start, _peak_rss_mb()))
+
+
+def run_benchmarks(shape: OrgShape, scenarios: List[str], latency: float = 0.0, rate_limit: int = 0,
+                   workers: int = 8) -> List[BenchmarkResult]:
+    """
+    Run every scenario in a fresh process (so that peak RSS is its own) against a fake GitLab serving ``shape``,
+    counting the API calls the fake server answered.
+    """
+    projects = synthetic_org(shape)
+    results = []
+    context = multiprocessing.get_context('fork')
+    with FakeGitLab(projects, latency=latency, rate_limit=rate_limit) as server:
+        for name in scenarios:
+            server.requests.clear()
+            server.num_rate_limited = 0
+            queue = context.Queue()
+            process = context.Process(target=_run_scenario, args=(name, server.url, workers, queue))
+            process.start()
+            num_projects, wall_seconds, peak_rss_mb = queue.get()
+            process.join()
+            results.append(BenchmarkResult(
+                scenario=name,
+                projects=num_projects,
+                wall_seconds=round(wall_seconds, 3),
+                api_calls=len(server.requests) + server.num_rate_limited,
+                rate_limited=server.num_rate_limited,
+                peak_rss_mb=round(peak_rss_mb, 1),
+                projects_per_minute=round(num_projects / wall_seconds * 60, 1),
+            ))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks against a synthetic GitLab served on localhost.')
+    for field in fields(OrgShape):
+        parser.add_argument(f'--{field.name}', type=int, default=field.default)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--rate_limit', type=int, default=0, help='requests per second before answering 429')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--output', default='', help='JSON file to write the results to, e.g. to compare versions')
+    args = parser.parse_args()
+
+    shape = OrgShape(**{field.name: getattr(args, field.name) for field in fields(OrgShape)})
+    results = run_benchmarks(shape, args.scenarios, latency=args.latency, rate_limit=args.rate_limit,
+                             workers=args.workers)
+    columns = list(asdict(results[0]))
+    print(' '.join(f'{column:>20}' for column in columns))
+    for result in results:
+        print(' '.join(f'{value:>20}' for value in asdict(result).values()))
+    if args.output:
+        report: Dict[str, Any] = {'shape': asdict(shape), 'latency': args.latency, 'rate_limit': args.rate_limit,
+                                  'results': [asdict(result) for result in results]}
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
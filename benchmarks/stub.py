@@ -0,0 +1,343 @@
+import re
+import json
+import base64
+import hashlib
+import threading
+from datetime import datetime
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Set, Tuple
+
+__all__ = (
+    'StubProject',
+    'GitLabStub',
+    'linear_commits',
+    'sample_project',
+)
+
+
+@dataclass
+class StubProject:
+    """A project served by the stub: commits are dicts with `id`, `parent_ids`, `author_*`, `created_at` and `message`."""
+    id: int
+    name: str
+    group: str
+    commits: List[Dict[str, Any]]
+    branches: Dict[str, str]
+    files: Dict[str, str] = field(default_factory=dict)
+    languages: Dict[str, float] = field(default_factory=dict)
+    hooks: int = 0
+    default_branch: str = 'main'
+    last_activity_at: str = '2024-01-02T00:00:00.000Z'
+    archived: bool = False
+    ci_config_path: str = ''
+
+    @property
+    def path_with_namespace(self) -> str:
+        return f'{self.group}/{self.name}'
+
+    def attributes(self, base_url: str, simple: bool = False) -> Dict[str, Any]:
+        """The API representation of the project, without the fields the `simple` one lacks if `simple`."""
+        attributes = {
+            'id': self.id,
+            'name': self.name,
+            'path': self.name,
+            'path_with_namespace': self.path_with_namespace,
+            'namespace': {'id': self.id // 1000, 'name': self.group, 'path': self.group, 'full_path': self.group},
+            'web_url': f'{base_url}/{self.path_with_namespace}',
+            'created_at': '2024-01-01T00:00:00.000Z',
+            'last_activity_at': self.last_activity_at,
+            'default_branch': self.default_branch,
+        }
+        if not simple:
+            attributes.update(archived=self.archived, ci_config_path=self.ci_config_path or None)
+        return attributes
+
+    def reachable(self, sha: str) -> Set[str]:
+        parents = {commit['id']: commit['parent_ids'] for commit in self.commits}
+        visited, stack = set(), [sha]
+        while stack:
+            node = stack.pop()
+            if node in parents and node not in visited:
+                visited.add(node)
+                stack.extend(parents[node])
+        return visited
+
+    def tree(self, path: str, recursive: bool) -> List[Dict[str, Any]]:
+        prefix = f'{path}/' if path else ''
+        entries = {}
+        for file_path in sorted(self.files):
+            if not file_path.startswith(prefix):
+                continue
+            parts = file_path[len(prefix):].split('/')
+            for depth in range(1, len(parts) + 1):
+                if depth > 1 and not recursive:
+                    break
+                entry_path = prefix + '/'.join(parts[:depth])
+                entry_type = 'blob' if depth == len(parts) else 'tree'
+                entries[entry_path] = {'id': entry_path, 'name': parts[depth - 1], 'type': entry_type, 'path': entry_path}
+        return list(entries.values())
+
+
+class GitLabStub:
+    """
+    Minimal GitLab v4 REST (and GraphQL project metadata) server on localhost for tests. Every request path is
+    recorded in `requests`; `rate_limited_requests` makes the next N requests answer 429 with a `Retry-After` header.
+    Responses carry an `ETag`, and requests with a matching `If-None-Match` are answered 304 (counted in
+    `not_modified`). `ci_templates` are the GitLab CI templates served by name.
+    """
+
+    def __init__(self, projects: List[StubProject]):
+        self.projects = {project.id: project for project in projects}
+        self.requests: List[str] = []
+        self.rate_limited_requests = 0
+        self.retry_after = '0'
+        self.graphql_enabled = True
+        self.not_modified = 0
+        self.connections = 0
+        self.ci_templates: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'GitLabStub':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive connections, counted in `connections`
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, headers, body = stub.handle('GET', self.path, self.headers.get('If-None-Match'))
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_HEAD(self):
+                status, headers, body = stub.handle('HEAD', self.path)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stub._lock:
+                    stub.requests.append(self.path)
+                if self.path != '/api/graphql' or not stub.graphql_enabled:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                payload = json.dumps(stub.graphql(json.loads(body)['variables'])).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def graphql(self, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer the project metadata query of `crawler.graphql` for `fullPaths`."""
+        nodes = []
+        for project in self.projects.values():
+            if project.path_with_namespace not in variables['fullPaths']:
+                continue
+            nodes.append({
+                'id': f'gid://gitlab/Project/{project.id}',
+                'fullPath': project.path_with_namespace,
+                'languages': [{'name': name, 'share': share} for name, share in project.languages.items()],
+                'repository': {
+                    'rootRef': project.default_branch,
+                    'blobs': {'nodes': [{'path': path} for path in variables['markerPaths'] if path in project.files]},
+                },
+            })
+        return {'data': {'projects': {'nodes': nodes}}}
+
+    def project(self, project_id: str) -> StubProject:
+        project_id = unquote(project_id)
+        if project_id.isdigit():
+            return self.projects[int(project_id)]
+        return next(project for project in self.projects.values() if project.path_with_namespace == project_id)
+
+    def handle(self, method: str, raw_path: str, if_none_match: str | None = None) -> Tuple[int, Dict[str, str], bytes]:
+        status, headers, body = self.respond(raw_path)
+        if status != 200:
+            return status, headers, body
+        headers['ETag'] = f'W/"{hashlib.sha1(body).hexdigest()}"'
+        if if_none_match == headers['ETag']:
+            with self._lock:
+                self.not_modified += 1
+            return 304, {'ETag': headers['ETag']}, b''
+        return status, headers, body
+
+    def respond(self, raw_path: str) -> Tuple[int, Dict[str, str], bytes]:
+        url = urlsplit(raw_path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        with self._lock:
+            self.requests.append(url.path)
+            if self.rate_limited_requests:
+                self.rate_limited_requests -= 1
+                return 429, {'Retry-After': self.retry_after, 'RateLimit-Remaining': '0'}, b'{"message": "429"}'
+        try:
+            payload = self.route(url.path, query)
+        except (KeyError, StopIteration):
+            return 404, {'Content-Type': 'application/json'}, b'{"message": "404 Not Found"}'
+        if isinstance(payload, list):
+            return self.paginate(url.path, query, payload)
+        if isinstance(payload, bytes):
+            return 200, {'Content-Type': 'text/plain'}, payload
+        headers = {'Content-Type': 'application/json'}
+        if isinstance(payload, dict) and 'blob_id' in payload:
+            headers['X-Gitlab-Blob-Id'] = payload['blob_id']
+        return 200, headers, json.dumps(payload).encode()
+
+    def route(self, path: str, query: Dict[str, str]) -> Any:
+        if path == '/api/v4/projects':
+            return self.list_projects(self.projects.values(), query)
+        match = re.fullmatch(r'/api/v4/groups/([^/]+)/projects', path)
+        if match:
+            group = unquote(match.group(1))
+            subgroups = query.get('include_subgroups', '').lower() == 'true'
+            return self.list_projects([
+                project for project in self.projects.values()
+                if project.group == group or (subgroups and project.group.startswith(f'{group}/'))
+            ], query)
+        match = re.fullmatch(r'/api/v4/templates/gitlab_ci_ymls/(.+)', path)
+        if match:
+            name = unquote(match.group(1))
+            return {'name': name, 'content': self.ci_templates[name]}
+        match = re.fullmatch(r'/api/v4/projects/([^/]+)(/.*)?', path)
+        if match is None:
+            raise KeyError(path)
+        project, resource = self.project(match.group(1)), match.group(2) or ''
+        if resource == '':
+            return project.attributes(self.url)
+        if resource == '/repository/commits':
+            commits = project.commits
+            if 'ref_name' in query:
+                reachable = project.reachable(project.branches[query['ref_name']])
+                commits = [commit for commit in commits if commit['id'] in reachable]
+            elif query.get('all', '').lower() != 'true':
+                reachable = project.reachable(project.branches[project.default_branch])
+                commits = [commit for commit in commits if commit['id'] in reachable]
+            # dates are compared in time, whatever the offset of each
+            if 'since' in query:
+                commits = [commit for commit in commits if _date(commit['created_at']) >= _date(query['since'])]
+            if 'until' in query:
+                commits = [commit for commit in commits if _date(commit['created_at']) <= _date(query['until'])]
+            return sorted(commits, key=lambda commit: commit['created_at'], reverse=True)
+        if resource == '/repository/branches':
+            return [{'name': name, 'commit': {'id': sha}, 'default': name == project.default_branch}
+                    for name, sha in project.branches.items()]
+        if resource == '/repository/tree':
+            return project.tree(query.get('path', ''), query.get('recursive', '').lower() == 'true')
+        if resource == '/languages':
+            return project.languages
+        if resource == '/hooks':
+            return [{'id': index} for index in range(project.hooks)]
+        match = re.fullmatch(r'/repository/files/(.+?)(/raw)?', resource)
+        if match:
+            file_path = unquote(match.group(1))
+            content = project.files[file_path]
+            if match.group(2):
+                return content.encode()
+            return {
+                'file_path': file_path,
+                'encoding': 'base64',
+                'content': base64.b64encode(content.encode()).decode(),
+                'ref': query.get('ref'),
+                'blob_id': hashlib.sha1(content.encode()).hexdigest(),
+            }
+        raise KeyError(path)
+
+    def list_projects(self, projects, query: Dict[str, str]) -> List[Dict[str, Any]]:
+        if query.get('archived', '').lower() == 'false':
+            projects = [project for project in projects if not project.archived]
+        if 'last_activity_after' in query:
+            projects = [project for project in projects if project.last_activity_at > query['last_activity_after']]
+        simple = query.get('simple', '').lower() == 'true'
+        return [project.attributes(self.url, simple) for project in sorted(projects, key=lambda project: project.id)]
+
+    def paginate(self, path: str, query: Dict[str, str], items: List[Any]) -> Tuple[int, Dict[str, str], bytes]:
+        per_page = int(query.get('per_page', 20))
+        page = int(query.get('page', 1))
+        total_pages = max(1, -(-len(items) // per_page))
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Page': str(page),
+            'X-Per-Page': str(per_page),
+            'X-Total': str(len(items)),
+            'X-Total-Pages': str(total_pages),
+        }
+        if page < total_pages:
+            headers['X-Next-Page'] = str(page + 1)
+            next_query = '&'.join(f'{key}={quote(str(value))}' for key, value in dict(query, page=page + 1).items())
+            headers['Link'] = f'<{self.url}{path}?{next_query}>; rel="next"'
+        body = json.dumps(items[(page - 1) * per_page:page * per_page]).encode()
+        return 200, headers, body
+
+
+def _date(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def linear_commits(count: int, author: str = 'dev', start: int = 0, parent: str | None = None) -> List[Dict[str, Any]]:
+    """A chain of `count` commits, the first one on top of `parent`."""
+    commits = []
+    for i in range(start, start + count):
+        parents = [commits[-1]['id']] if commits else ([parent] if parent else [])
+        commits.append({
+            'id': f'{author}-{i:05d}',
+            'parent_ids': parents,
+            'author_name': author,
+            'author_email': f'{author}@example.com',
+            'created_at': f'2024-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.000+00:00',
+            'message': 'feat: change' if i % 2 else 'update',
+        })
+    return commits
+
+
+def sample_project(project_id: int = 1, name: str = 'demo', group: str = 'team') -> StubProject:
+    main = linear_commits(120, author='alice')
+    feature = linear_commits(15, author='bob', start=120, parent=main[60]['id'])
+    return StubProject(
+        id=project_id,
+        name=name,
+        group=group,
+        commits=main + feature,
+        branches={'main': main[-1]['id'], 'feature': feature[-1]['id']},
+        files={
+            '.gitlab-ci.yml': 'stages:\n  - build\n  - test\n',
+            'Dockerfile': 'FROM python:3.11\n',
+            'docker-compose.yml': 'services: {}\n',
+            'src/app/main.py': 'print(1)\n',
+            'src/app/docker/dockerfile': 'FROM scratch\n',
+            'tests/test_main.py': 'def test(): pass\n',
+        },
+        languages={'Python': 97.5, 'Dockerfile': 2.5},
+        hooks=2,
+    )
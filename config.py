@@ -11,3 +11,25 @@ class Settings(CustomizedSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
     access_token: str
     gitlab_url: str
+    cache_path: str = 'gitlab_cache.sqlite'
+    force_refresh: bool = False
+    engine: str = 'process'
+    workers: int = 8
+    max_concurrency: int = 32
+    graphql: bool = False
+    mirror_dir: str = ''
+    report_path: str = 'gitlab_projects.parquet'
+    resume: bool = False
+    excel_path: str = './gitlab_projects.xlsx'
+    facts_path: str = 'gitlab_facts'
+    http_cache_path: str = 'gitlab_http_cache.sqlite'
+    http_cache_size_mb: int = 256
+    profile_dir: str = ''
+    metrics: str = ''
+    last_activity_after: str = ''
+    include_archived: bool = False
+    include_groups: str = ''
+    exclude_groups: str = ''
+    group_ids: str = ''
+    merge_identities: bool = False
+    activity_window_days: int = 365
@@ -0,0 +1,207 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+import pandas as pd
+
+from crawler.async_client import AsyncGitLabClient
+from crawler.snapshot import parse_commit_date
+from utils.basic_logger import simple_logger
+
+__all__ = (
+    'ActivityStore',
+    'time_windows',
+    'scan_project_activity',
+    'scan_activity',
+)
+
+logger = simple_logger(__name__)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS activity_watermarks (
+    project_id INTEGER PRIMARY KEY,
+    scanned_until TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS author_activity (
+    author_email TEXT PRIMARY KEY,
+    author_name TEXT,
+    first TEXT NOT NULL,
+    last TEXT NOT NULL,
+    commits INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS author_projects (
+    author_email TEXT NOT NULL,
+    project_id INTEGER NOT NULL,
+    PRIMARY KEY (author_email, project_id)
+);
+'''
+
+
+def _utc(created_at: str) -> str:
+    """A commit date (in the committer's own offset) in UTC, so that dates compare in time order as strings."""
+    return datetime.fromisoformat(created_at.replace('Z', '+00:00')).astimezone(timezone.utc).isoformat()
+
+
+class ActivityStore:
+    """
+    First / last commit date, commit count and projects of every author, persisted in SQLite together with the
+    date up to which every project was scanned, so that later runs only scan the commits created since.
+    """
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def reset(self):
+        with self.connection:
+            for table in ('activity_watermarks', 'author_activity', 'author_projects'):
+                self.connection.execute(f'DELETE FROM {table}')
+
+    def watermark(self, project_id: int) -> str | None:
+        """The date of the newest commit scanned in the project, in UTC."""
+        row = self.connection.execute(
+            'SELECT scanned_until FROM activity_watermarks WHERE project_id = ?', (project_id,)
+        ).fetchone()
+        return None if row is None else _utc(row[0])
+
+    def add_commits(self, project_id: int, commits: List[Dict[str, Any]]):
+        authors: Dict[str, List] = {}
+        for commit in commits:
+            commit_date = parse_commit_date(commit['created_at']).date().isoformat()
+            author = authors.setdefault(commit['author_email'], [commit['author_name'], commit_date, commit_date, 0])
+            author[1], author[2], author[3] = min(author[1], commit_date), max(author[2], commit_date), author[3] + 1
+        with self.connection:
+            self.connection.executemany('''
+                INSERT INTO author_activity (author_email, author_name, first, last, commits) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (author_email) DO UPDATE SET
+                    first = MIN(first, excluded.first),
+                    last = MAX(last, excluded.last),
+                    commits = commits + excluded.commits
+            ''', [(email, *values) for email, values in authors.items()])
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO author_projects (author_email, project_id) VALUES (?, ?)',
+                [(email, project_id) for email in authors],
+            )
+            if commits:
+                scanned_until = max(_utc(commit['created_at']) for commit in commits)
+                watermark = self.watermark(project_id)
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO activity_watermarks (project_id, scanned_until) VALUES (?, ?)',
+                    (project_id, scanned_until if watermark is None else max(watermark, scanned_until)),
+                )
+
+    def table(self, merge_identities: bool = False) -> pd.DataFrame:
+        """
+        One row per author: ``author`` (email), ``name``, ``first`` and ``last`` commit dates, ``active_projects`` and
+        ``commits``. With ``merge_identities`` the emails used under the same author name are merged into one row
+        (under the email with the most commits), and ``emails`` lists them.
+        """
+        authors = pd.read_sql_query(
+            'SELECT author_email AS author, author_name AS name, first, last, commits FROM author_activity',
+            self.connection, parse_dates=['first', 'last'],
+        )
+        projects = pd.read_sql_query('SELECT author_email AS author, project_id FROM author_projects', self.connection)
+        authors['identity'] = authors['author']
+        if merge_identities:
+            authors['identity'] = _merge_identities(authors)
+            projects['identity'] = projects['author'].map(authors.set_index('author')['identity'])
+        else:
+            projects['identity'] = projects['author']
+
+        authors = authors.sort_values('commits', ascending=False)
+        table = authors.groupby('identity', sort=False).agg(
+            author=('author', 'first'),
+            name=('name', 'first'),
+            emails=('author', list),
+            first=('first', 'min'),
+            last=('last', 'max'),
+            commits=('commits', 'sum'),
+        )
+        table['active_projects'] = projects.groupby('identity')['project_id'].nunique().reindex(table.index).fillna(0)
+        table['active_projects'] = table['active_projects'].astype(int)
+        columns = ['author', 'name', 'first', 'last', 'active_projects', 'commits']
+        if merge_identities:
+            columns.insert(2, 'emails')
+        return table.reset_index(drop=True)[columns]
+
+
+def _merge_identities(authors: pd.DataFrame) -> pd.Series:
+    """Union of the emails sharing a case-insensitive author email or name: the representative email of each."""
+    parent = {email: email for email in authors['author']}
+
+    def find(email: str) -> str:
+        while parent[email] != email:
+            parent[email] = parent[parent[email]]
+            email = parent[email]
+        return email
+
+    by_key: Dict[str, str] = {}
+    for email, name in zip(authors['author'], authors['name']):
+        for key in (f'email:{email.lower()}', f'name:{(name or "").strip().lower()}'):
+            if key == 'name:':
+                continue
+            if key in by_key:
+                parent[find(email)] = find(by_key[key])
+            else:
+                by_key[key] = email
+    return authors['author'].map(find)
+
+
+def time_windows(start: str, end: datetime, window_days: int) -> List[Tuple[str | None, str | None]]:
+    """
+    ``(since, until)`` windows of ``window_days`` from ``start`` to ``end``, to be fetched concurrently; the last one
+    is open towards the future.
+    """
+    current = datetime.fromisoformat(start.replace('Z', '+00:00'))
+    boundaries = []
+    while current + timedelta(days=window_days) < end:
+        current += timedelta(days=window_days)
+        boundaries.append(current.isoformat())
+    return list(zip([start] + boundaries, boundaries + [None]))
+
+
+async def scan_project_activity(client: AsyncGitLabClient, project: Dict[str, Any], store: ActivityStore,
+                                window_days: int = 365):
+    """Scan the commits of every ref created since the project watermark, in concurrently fetched time windows."""
+    watermark = store.watermark(project['id'])
+    if watermark is None:
+        windows = time_windows(project['created_at'], datetime.now(timezone.utc), window_days)
+        # imported repositories have commits older than the project itself
+        windows[0] = (None, windows[0][1])
+    else:
+        windows = time_windows(watermark, datetime.now(timezone.utc), window_days)
+
+    def params(since, until):
+        return {key: value for key, value in (('all', 'true'), ('since', since), ('until', until)) if value}
+
+    pages = await asyncio.gather(*[
+        client.list(f'/projects/{project["id"]}/repository/commits', params(since, until)) for since, until in windows
+    ])
+    # window bounds are inclusive, so a commit on a bound or already scanned up to the watermark can come twice
+    commits = {commit['id']: commit for page in pages for commit in page}
+    new_commits = [commit for commit in commits.values()
+                   if watermark is None or _utc(commit['created_at']) > watermark]
+    store.add_commits(project['id'], new_commits)
+
+
+async def scan_activity(client: AsyncGitLabClient, projects: Iterable[Dict[str, Any]], store: ActivityStore,
+                        window_days: int = 365, max_projects: int | None = None):
+    """
+    Scan the activity of the projects, at most ``max_projects`` at once (by default, the request concurrency of
+    the client), so that only that many commit histories are held in memory.
+    """
+    projects = iter(projects)
+
+    async def scan():
+        # the workers share the iterator, each takes the next project once it is done with the previous one
+        for project in projects:
+            try:
+                await scan_project_activity(client, project, store, window_days)
+            except Exception as e:
+                logger.error(f'Error in scanning the activity of {project["name"]}: {e}')
+
+    await asyncio.gather(*[scan() for _ in range(max_projects or client.max_concurrency)])
@@ -0,0 +1,157 @@
+import time
+import random
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+import httpx
+
+from crawler.profiler import CallRecorder
+from crawler.snapshot import PER_PAGE
+from utils.basic_logger import simple_logger
+
+__all__ = (
+    'AsyncGitLabClient',
+    'retry_delay',
+)
+
+logger = simple_logger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_delay(response: httpx.Response, attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """
+    Seconds to wait before retrying ``response``: ``Retry-After`` if given, else the time until ``RateLimit-Reset``
+    when the rate limit is exhausted, else an exponential backoff with jitter.
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass
+    reset = response.headers.get('RateLimit-Reset')
+    if response.headers.get('RateLimit-Remaining') == '0' and reset is not None:
+        return min(max(float(reset) - time.time(), 0.0), max_delay)
+    return min(base_delay * 2 ** attempt, max_delay) * random.uniform(0.5, 1.0)
+
+
+class AsyncGitLabClient:
+    """
+    Asynchronous client of the GitLab v4 REST API.
+
+    A global semaphore bounds the number of requests in flight and a single connection pool is kept per host.
+    Rate-limited (429) and transient (5xx) responses are retried after the delay given by the server; while one
+    request waits for the rate limit to reset, every other request of the client waits as well.
+    """
+
+    def __init__(self, gitlab_url: str, private_token: str, max_concurrency: int = 32, max_retries: int = 5,
+                 base_delay: float = 1.0, transport: httpx.AsyncBaseTransport | None = None,
+                 recorder: CallRecorder | None = None):
+        self.gitlab_url = gitlab_url.rstrip('/')
+        self._client = httpx.AsyncClient(
+            base_url=f'{gitlab_url.rstrip("/")}/api/v4',
+            headers={'PRIVATE-TOKEN': private_token},
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(60.0),
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self._resume_at = 0.0
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.num_requests = 0
+        self.recorder = recorder
+
+    async def __aenter__(self) -> 'AsyncGitLabClient':
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _wait_for_rate_limit(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _slow_down(self, response: httpx.Response):
+        # spread the remaining budget until the reset instead of running into 429s
+        remaining, reset = response.headers.get('RateLimit-Remaining'), response.headers.get('RateLimit-Reset')
+        if remaining is None or reset is None or int(remaining) > 0:
+            return
+        delay = max(float(reset) - time.time(), 0.0)
+        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    async def request(self, method: str, path: str, params: Dict[str, Any] | None = None) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_rate_limit()
+            async with self._semaphore:
+                self.num_requests += 1
+                start = time.time()
+                response = await self._client.request(method, path, params=params)
+            if self.recorder is not None:
+                self.recorder.record(method, str(response.url), response.status_code, len(response.content), start,
+                                     time.time() - start, cache=response.headers.get('X-Cache', ''))
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                break
+            delay = retry_delay(response, attempt, base_delay=self.base_delay)
+            if response.status_code == 429:
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            logger.warning(f'{response.status_code} on {path}, retrying in {delay:.1f}s')
+            await asyncio.sleep(delay)
+        self._slow_down(response)
+        response.raise_for_status()
+        return response
+
+    async def get(self, path: str, params: Dict[str, Any] | None = None) -> httpx.Response:
+        return await self.request('GET', path, params)
+
+    async def exists(self, path: str, params: Dict[str, Any] | None = None) -> bool:
+        """Whether a HEAD request on ``path`` succeeds; only a 404 answers False, other errors are raised."""
+        try:
+            await self.request('HEAD', path, params)
+            return True
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return False
+            raise
+
+    async def get_json(self, path: str, params: Dict[str, Any] | None = None) -> Any:
+        return (await self.get(path, params)).json()
+
+    async def iter_pages(self, path: str, params: Dict[str, Any] | None = None,
+                         per_page: int = PER_PAGE) -> AsyncIterator[List[Any]]:
+        """
+        Yield the pages of a list endpoint. When the first page announces the number of pages,
+        the remaining ones are requested concurrently, otherwise the next page links are followed.
+        """
+        params = dict(params or {}, per_page=per_page)
+        first = await self.get(path, dict(params, page=1))
+        yield first.json()
+        total_pages = first.headers.get('X-Total-Pages')
+        if total_pages is not None:
+            pages = [self.get_json(path, dict(params, page=page)) for page in range(2, int(total_pages) + 1)]
+            for page in await asyncio.gather(*pages):
+                yield page
+            return
+        response = first
+        while True:
+            next_page, next_url = response.headers.get('X-Next-Page'), response.links.get('next', {}).get('url')
+            if next_page:
+                response = await self.get(path, dict(params, page=int(next_page)))
+            elif next_url:
+                # keyset pagination only announces the next page as a link
+                response = await self.get(next_url)
+            else:
+                return
+            yield response.json()
+
+    async def list(self, path: str, params: Dict[str, Any] | None = None) -> List[Any]:
+        items = []
+        async for page in self.iter_pages(path, params):
+            items.extend(page)
+        return items
@@ -0,0 +1,310 @@
+import asyncio
+from contextlib import aclosing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List
+from urllib.parse import quote
+
+import httpx
+
+from crawler.async_client import AsyncGitLabClient
+from crawler.cache import ProjectCache
+from crawler.ci import (CiFile, included_blob_ids, parse_ci_config, resolve_ci_config, root_ci_file,
+                        summarize_ci_config, template_key)
+from crawler.facts import write_commit_facts
+from crawler.http_cache import CachingTransport, HttpCache
+from crawler.profiler import CallRecorder, metric, project_scope
+from crawler.tree import MarkerScan
+from crawler.metrics import ProjectResources, build_row, required_resources, resource_versions, select_metrics
+from crawler.snapshot import COMMIT_FIELDS, CommitSnapshot
+from utils.basic_logger import simple_logger
+
+__all__ = (
+    'fetch_snapshot',
+    'crawl_project',
+    'crawl_projects',
+    'run_crawl',
+)
+
+logger = simple_logger(__name__)
+
+
+async def _fetch_commits(client: AsyncGitLabClient, project_id: int, snapshot: CommitSnapshot, since: str | None,
+                         ref_name: str | None = None):
+    params = {'ref_name': ref_name} if ref_name else {'all': 'true'}
+    if since:
+        params['since'] = since
+    async for page in client.iter_pages(f'/projects/{project_id}/repository/commits', params):
+        snapshot.commits.extend({key: commit.get(key) for key in COMMIT_FIELDS} for commit in page)
+        snapshot.pages_fetched += 1
+
+
+async def _fetch_branches(client: AsyncGitLabClient, project_id: int, snapshot: CommitSnapshot):
+    async for page in client.iter_pages(f'/projects/{project_id}/repository/branches'):
+        snapshot.branches.extend({'name': branch['name'], 'commit_id': branch['commit']['id']} for branch in page)
+        snapshot.pages_fetched += 1
+
+
+async def fetch_snapshot(client: AsyncGitLabClient, project_id: int, since: str | None = None) -> CommitSnapshot:
+    """The asynchronous counterpart of ``CommitSnapshot.fetch``."""
+    snapshot = CommitSnapshot()
+    await asyncio.gather(
+        _fetch_commits(client, project_id, snapshot, since),
+        _fetch_branches(client, project_id, snapshot),
+    )
+    return snapshot
+
+
+async def _fetch_incremental_snapshot(client: AsyncGitLabClient, project_id: int, cache: ProjectCache,
+                                      force_refresh: bool) -> CommitSnapshot:
+    since = None if force_refresh else cache.last_commit_at(project_id)
+    snapshot = await fetch_snapshot(client, project_id, since=since)
+    cache.save_snapshot(project_id, snapshot, replace=since is None)
+    if since is None:
+        return snapshot
+    cached = cache.load_snapshot(project_id)
+    # see crawler.cache.fetch_incremental_snapshot: branches pushed with older commits get their own history
+    missing = cached.branches_without_history()
+    branch_snapshots = [CommitSnapshot() for _ in missing]
+    await asyncio.gather(*(_fetch_commits(client, project_id, branch_snapshot, None, ref_name=branch_name)
+                           for branch_name, branch_snapshot in zip(missing, branch_snapshots)))
+    for branch_snapshot in branch_snapshots:
+        cache.save_commits(project_id, branch_snapshot.commits)
+    if missing:
+        cached = cache.load_snapshot(project_id)
+    cached.pages_fetched = snapshot.pages_fetched + sum(branch.pages_fetched for branch in branch_snapshots)
+    return cached
+
+
+async def _cached_resource(cache: ProjectCache, project_id: int, kind: str, version: str, loader) -> Any:
+    value = cache.load_resource(project_id, kind, version)
+    if value is None:
+        value = await loader()
+        cache.save_resource(project_id, kind, version, value)
+    return value
+
+
+async def _probe_file(client: AsyncGitLabClient, project_id: int, path: str, ref: str) -> bool | None:
+    try:
+        return await client.exists(f'/projects/{project_id}/repository/files/{quote(path, safe="")}', {'ref': ref})
+    except httpx.HTTPStatusError:
+        return None
+
+
+async def _scan_tree_markers(client: AsyncGitLabClient, project_id: int, ref: str,
+                             probes: Dict[str, bool] | None = None) -> Dict[str, bool]:
+    scan = MarkerScan()
+    for path, exists in (probes or {}).items():
+        scan.probed(path, exists)
+    # the probes are independent HEAD requests, sent together
+    paths = scan.probe_paths()
+    for path, exists in zip(paths, await asyncio.gather(*(_probe_file(client, project_id, path, ref)
+                                                          for path in paths))):
+        if exists is not None:
+            scan.probed(path, exists)
+    if scan.done:
+        return scan.finish()
+    pages = client.iter_pages(f'/projects/{project_id}/repository/tree',
+                              {'ref': ref, 'recursive': 'true', 'pagination': 'keyset'})
+    async with aclosing(pages):
+        async for page in pages:
+            if scan.feed(page):
+                break
+    return scan.finish()
+
+
+async def _ci_blob_id(client: AsyncGitLabClient, file: CiFile) -> str | None:
+    try:
+        response = await client.request('HEAD', f'/projects/{quote(file.project, safe="")}/repository/files/'
+                                                 f'{quote(file.path, safe="")}', {'ref': file.ref})
+        return response.headers.get('X-Gitlab-Blob-Id', '')
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code != 404:
+            logger.warning(f'Cannot read {file}: {e}')
+        return None
+
+
+async def _load_ci_file(client: AsyncGitLabClient, project_id: int, file: CiFile,
+                        cache: ProjectCache) -> Dict[str, Any] | None:
+    """The asynchronous counterpart of ``crawler.ci._load_ci_file``."""
+    key = (client.gitlab_url, file)
+    if file.is_template:
+        blob_id = f'template:{template_key(file)}'
+        config = cache.load_ci_config(blob_id) if key in included_blob_ids else None
+        if config is None:
+            template = await client.get_json(f'/templates/gitlab_ci_ymls/{quote(template_key(file), safe="")}')
+            config = parse_ci_config(template['content'])
+            cache.save_ci_config(blob_id, config)
+            included_blob_ids[key] = blob_id
+        return config
+
+    if file.project == str(project_id):
+        blob_id = await _ci_blob_id(client, file)
+    else:
+        if key not in included_blob_ids:
+            included_blob_ids[key] = await _ci_blob_id(client, file)
+        blob_id = included_blob_ids[key]
+    if blob_id is None:
+        return None
+    config = cache.load_ci_config(blob_id) if blob_id else None
+    if config is None:
+        response = await client.get(f'/projects/{quote(file.project, safe="")}/repository/files/'
+                                    f'{quote(file.path, safe="")}/raw', {'ref': file.ref})
+        config = parse_ci_config(response.content)
+        if blob_id:
+            cache.save_ci_config(blob_id, config)
+    return config
+
+
+async def _fetch_ci_summary(client: AsyncGitLabClient, project: Dict[str, Any], cache: ProjectCache) -> Dict[str, Any]:
+    """The asynchronous counterpart of ``crawler.ci.fetch_ci_summary``, fetching each level of includes concurrently."""
+    resolution = resolve_ci_config(root_ci_file(project))
+    try:
+        files = next(resolution)
+        while True:
+            configs = await asyncio.gather(*(_load_ci_file(client, project['id'], file, cache) for file in files),
+                                           return_exceptions=True)
+            for file, config in zip(files, configs):
+                if isinstance(config, Exception):
+                    logger.warning(f'Cannot read {file}: {config}')
+            files = resolution.send([None if isinstance(config, Exception) else config for config in configs])
+    except StopIteration as stop:
+        config, unresolved = stop.value
+    return summarize_ci_config(config, unresolved)
+
+
+async def _in_metric(name: str, awaitable: Awaitable) -> Any:
+    with metric(name):
+        return await awaitable
+
+
+async def crawl_project(client: AsyncGitLabClient, project: Dict[str, Any], cache: ProjectCache,
+                        force_refresh: bool = False, metadata: Dict[str, Any] | None = None,
+                        facts_path: str = '', metrics: str = '') -> Dict[str, Any] | None:
+    """The asynchronous counterpart of ``gitfile.process_project``, producing the same row."""
+    project_id = project['id']
+    with project_scope(project['path_with_namespace']):
+        try:
+            selected_metrics = select_metrics(metrics)
+            required = required_resources(selected_metrics)
+            resources = ProjectResources(project)
+            if 'commits' in required:
+                resources.snapshot = await _in_metric('fetch_incremental_snapshot',
+                                                      _fetch_incremental_snapshot(client, project_id, cache,
+                                                                                  force_refresh))
+                logger.info(f'{project["name"]}: fetched {resources.snapshot.pages_fetched} API pages of commits and '
+                            f'branches')
+                if facts_path:
+                    write_commit_facts(facts_path, project, resources.snapshot)
+            elif 'branches' in required:
+                await _in_metric('fetch_incremental_snapshot', _fetch_branches(client, project_id, resources.snapshot))
+            tree_ref, markers_version, languages_version = resource_versions(resources, required)
+            metadata = metadata or {}
+            probes = metadata.get('probes') if metadata.get('default_branch') == tree_ref else None
+
+            async def fetch_markers():
+                resources.markers = await _in_metric('scan_tree_markers', _cached_resource(
+                    cache, project_id, 'markers', markers_version,
+                    lambda: _scan_tree_markers(client, project_id, tree_ref, probes),
+                ))
+
+            async def fetch_languages():
+                resources.languages = await _in_metric('get_language_percentages', _cached_resource(
+                    cache, project_id, 'languages', languages_version,
+                    lambda: client.get_json(f'/projects/{project_id}/languages'),
+                ))
+
+            async def fetch_ci():
+                resources.ci = await _in_metric('ci_config', _fetch_ci_summary(client, project, cache))
+
+            async def fetch_hooks():
+                resources.num_hooks = len(await _in_metric('hooks', client.list(f'/projects/{project_id}/hooks')))
+
+            if 'languages' in metadata and 'languages' in required:
+                resources.languages = metadata['languages']
+                required = required - {'languages'}
+            fetches = {'tree': fetch_markers, 'languages': fetch_languages, 'hooks': fetch_hooks, 'ci': fetch_ci}
+            await asyncio.gather(*[fetch() for resource, fetch in fetches.items() if resource in required])
+            project_data = build_row(selected_metrics, resources)
+            cache.save_project_data(project_id, project['last_activity_at'], project_data)
+            return project_data
+        except Exception as e:
+            logger.error(f'Error in getting {project["name"]} data: {e}')
+            return None
+
+
+async def crawl_projects(client: AsyncGitLabClient, projects: Iterable[Dict[str, Any]], cache: ProjectCache,
+                         force_refresh: bool = False,
+                         projects_metadata: Dict[int, Dict[str, Any]] | None = None,
+                         facts_path: str = '', metrics: str = '',
+                         max_projects: int | None = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Crawl every project concurrently and yield the rows in completion order. ``projects`` may be a lazy iterable
+    (e.g. a project listing being paged through): it is consumed in a background thread and each project is
+    crawled as soon as it arrives. Its metadata is looked up in ``projects_metadata`` at that moment.
+    At most ``max_projects`` projects (by default, the request concurrency of the client) are crawled at once;
+    the listing is not pulled further until one of them is done.
+    """
+    if projects_metadata is None:
+        projects_metadata = {}
+    if max_projects is None:
+        max_projects = client.max_concurrency
+    loop = asyncio.get_running_loop()
+    projects = iter(projects)
+    pending = set()
+    next_project, exhausted = None, False
+    # a single thread, so that a generator keeping thread-bound state (e.g. a SQLite connection) keeps working
+    with ThreadPoolExecutor(max_workers=1) as discovery:
+        while True:
+            if next_project is None and not exhausted and len(pending) < max_projects:
+                next_project = loop.run_in_executor(discovery, next, projects, None)
+            waiting = pending | ({next_project} if next_project is not None else set())
+            if not waiting:
+                break
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is next_project:
+                    project = task.result()
+                    next_project = None
+                    if project is None:
+                        exhausted = True
+                    else:
+                        pending.add(asyncio.create_task(crawl_project(
+                            client, project, cache, force_refresh, projects_metadata.get(project['id']), facts_path,
+                            metrics,
+                        )))
+                    continue
+                pending.discard(task)
+                project_data = task.result()
+                if project_data:
+                    yield project_data
+
+
+def run_crawl(gitlab_url: str, private_token: str, projects: Iterable[Dict[str, Any]], max_concurrency: int = 32,
+              cache_path: str = ':memory:', force_refresh: bool = False,
+              projects_metadata: Dict[int, Dict[str, Any]] | None = None, facts_path: str = '',
+              on_project_data: Callable[[Dict[str, Any]], None] | None = None,
+              http_cache: HttpCache | None = None, profile_dir: str = '', metrics: str = '') -> List[Dict[str, Any]]:
+    """
+    Synchronous entry point: crawl the projects (given as API attribute dicts) and return their rows,
+    or pass each row to ``on_project_data`` as soon as it is ready instead of collecting them.
+    """
+    transport = CachingTransport(http_cache) if http_cache is not None else None
+    recorder = CallRecorder(profile_dir) if profile_dir else None
+
+    async def crawl() -> List[Dict[str, Any]]:
+        rows, num_projects = [], 0
+        cache = ProjectCache(cache_path)
+        async with AsyncGitLabClient(gitlab_url, private_token, max_concurrency=max_concurrency,
+                                     transport=transport, recorder=recorder) as client:
+            async for project_data in crawl_projects(client, projects, cache, force_refresh, projects_metadata,
+                                                         facts_path, metrics):
+                num_projects += 1
+                if on_project_data is None:
+                    rows.append(project_data)
+                else:
+                    on_project_data(project_data)
+            logger.info(f'{num_projects} projects crawled with {client.num_requests} API requests')
+        cache.close()
+        return rows
+
+    return asyncio.run(crawl())
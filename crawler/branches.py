@@ -0,0 +1,136 @@
+from typing import Any, Dict, Iterable, List, Set
+
+from gitlab.v4.objects.projects import Project
+
+from crawler.snapshot import CommitSnapshot, iter_pages
+
+__all__ = (
+    'CommitGraph',
+    'count_commits_by_branch',
+    'count_commits_by_header',
+    'count_commits_by_branch_cheap',
+)
+
+
+class CommitGraph:
+    """
+    Parent graph of a repository built from commits that were fetched once (see ``CommitSnapshot``).
+
+    The commits of many branches are counted with a single walk of the history: every commit carries the set of
+    branch tips that reach it as a bitset, passed on from children to parents, so branches sharing most of their
+    history (and merges) cost no extra walk.
+    """
+
+    def __init__(self, commits: Iterable[Dict[str, Any]]):
+        self.parents: Dict[str, List[str]] = {commit['id']: commit.get('parent_ids') or [] for commit in commits}
+
+    def _known_parents(self, sha: str) -> List[str]:
+        # parents outside of the fetched history are ignored
+        return [parent for parent in self.parents[sha] if parent in self.parents]
+
+    def ancestors(self, sha: str) -> Set[str]:
+        """All the commits reachable from ``sha``, itself included."""
+        if sha not in self.parents:
+            return set()
+        visited = {sha}
+        stack = [sha]
+        while stack:
+            for parent in self._known_parents(stack.pop()):
+                if parent not in visited:
+                    visited.add(parent)
+                    stack.append(parent)
+        return visited
+
+    def count_reachable_many(self, shas: List[str]) -> List[int]:
+        """The number of commits reachable from each of ``shas`` (itself included), in one walk of the history."""
+        masks: Dict[str, int] = {}
+        for bit, sha in enumerate(shas):
+            if sha in self.parents:
+                masks[sha] = masks.get(sha, 0) | 1 << bit
+        # children before parents: a commit is visited once all the commits it is a parent of were
+        num_children = dict.fromkeys(self.parents, 0)
+        for sha in self.parents:
+            for parent in self._known_parents(sha):
+                num_children[parent] += 1
+        stack = [sha for sha, count in num_children.items() if count == 0]
+        commits_by_mask: Dict[int, int] = {}
+        while stack:
+            sha = stack.pop()
+            mask = masks.pop(sha, 0)
+            if mask:
+                commits_by_mask[mask] = commits_by_mask.get(mask, 0) + 1
+            for parent in self._known_parents(sha):
+                if mask:
+                    masks[parent] = masks.get(parent, 0) | mask
+                num_children[parent] -= 1
+                if num_children[parent] == 0:
+                    stack.append(parent)
+        # most commits share the same few sets of branches
+        counts = [0] * len(shas)
+        for mask, num_commits in commits_by_mask.items():
+            while mask:
+                lowest = mask & -mask
+                counts[lowest.bit_length() - 1] += num_commits
+                mask ^= lowest
+        return counts
+
+    def count_reachable(self, sha: str) -> int:
+        return self.count_reachable_many([sha])[0]
+
+    def branch_of(self, branches: List[Dict[str, Any]], default_branch: str | None = None) -> Dict[str, str]:
+        """
+        Attribute every commit reachable from a branch to one branch: the default branch first, then the other
+        branches in order, each one taking the commits no previous branch reaches. Every commit is visited once.
+        """
+        ordered = sorted(branches, key=lambda branch: branch['name'] != default_branch)
+        owners: Dict[str, str] = {}
+        for branch in ordered:
+            if branch['commit_id'] not in self.parents or branch['commit_id'] in owners:
+                continue
+            owners[branch['commit_id']] = branch['name']
+            stack = [branch['commit_id']]
+            while stack:
+                # the ancestors of an attributed commit are all attributed already
+                for parent in self._known_parents(stack.pop()):
+                    if parent not in owners:
+                        owners[parent] = branch['name']
+                        stack.append(parent)
+        return owners
+
+
+def count_commits_by_branch(snapshot: CommitSnapshot) -> Dict[str, int]:
+    """Number of commits of every branch, computed from the snapshot without any extra API call."""
+    counts = CommitGraph(snapshot.commits).count_reachable_many([branch['commit_id'] for branch in snapshot.branches])
+    return {branch['name']: count for branch, count in zip(snapshot.branches, counts)}
+
+
+def count_commits_by_header(project: Project, ref: str) -> int | None:
+    """Number of commits of ``ref`` read from the pagination headers of a one item page."""
+    return project.commits.list(iterator=True, per_page=1, ref_name=ref).total
+
+
+def count_commits_by_branch_cheap(project: Project, branch_names: List[str], base_branch: str) -> Dict[str, int]:
+    """
+    Number of commits of every branch without downloading the histories.
+
+    GitLab leaves out the total headers above 10,000 items; such branches are counted against
+    ``base_branch`` with the compare endpoint: ``count(base) + ahead - behind``.
+    """
+    branches_commits = {branch_name: count_commits_by_header(project, branch_name) for branch_name in branch_names}
+    if all(count is not None for count in branches_commits.values()):
+        return branches_commits
+
+    base_count = branches_commits.get(base_branch)
+    if base_count is None:
+        base_count = count_commits_by_header(project, base_branch)
+    if base_count is None:
+        base_count = sum(len(page) for page in iter_pages(project.commits.list, ref_name=base_branch))
+    if base_branch in branches_commits:
+        branches_commits[base_branch] = base_count
+
+    for branch_name, count in branches_commits.items():
+        if count is None:
+            ahead = len(project.repository_compare(base_branch, branch_name)['commits'])
+            behind = len(project.repository_compare(branch_name, base_branch)['commits'])
+            branches_commits[branch_name] = base_count + ahead - behind
+    return branches_commits
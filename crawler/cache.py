@@ -0,0 +1,187 @@
+import json
+import sqlite3
+from typing import Any, Callable, Dict, List
+
+from gitlab.v4.objects.projects import Project
+
+from crawler.snapshot import COMMIT_FIELDS, CommitSnapshot
+
+__all__ = (
+    'ProjectCache',
+    'fetch_incremental_snapshot',
+)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS projects (
+    project_id INTEGER PRIMARY KEY,
+    last_activity_at TEXT NOT NULL,
+    project_data TEXT
+);
+CREATE TABLE IF NOT EXISTS commits (
+    project_id INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    parent_ids TEXT NOT NULL,
+    author_name TEXT,
+    author_email TEXT,
+    created_at TEXT,
+    message TEXT,
+    PRIMARY KEY (project_id, id)
+);
+CREATE TABLE IF NOT EXISTS branches (
+    project_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    commit_id TEXT NOT NULL,
+    PRIMARY KEY (project_id, name)
+);
+CREATE TABLE IF NOT EXISTS resources (
+    project_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (project_id, kind)
+);
+CREATE TABLE IF NOT EXISTS ci_configs (
+    blob_id TEXT PRIMARY KEY,
+    config TEXT NOT NULL
+);
+'''
+
+
+class ProjectCache:
+    """
+    On-disk (SQLite) cache of everything fetched for a project, keyed by project id: the commits,
+    the branches, versioned resources such as file trees and languages, and the computed project row. Parsed CI
+    configurations are keyed by blob id instead, so identical files are parsed once.
+    Use ``':memory:'`` as path for a cache that lives only as long as the object.
+    """
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def load_project_data(self, project_id: int, last_activity_at: str) -> Dict[str, Any] | None:
+        """The cached row of the project, if the project had no activity since it was computed."""
+        row = self.connection.execute(
+            'SELECT project_data FROM projects WHERE project_id = ? AND last_activity_at = ?',
+            (project_id, last_activity_at),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def save_project_data(self, project_id: int, last_activity_at: str, project_data: Dict[str, Any]):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO projects (project_id, last_activity_at, project_data) VALUES (?, ?, ?)',
+                (project_id, last_activity_at, json.dumps(project_data)),
+            )
+
+    def load_snapshot(self, project_id: int) -> CommitSnapshot:
+        columns = ', '.join(COMMIT_FIELDS)
+        snapshot = CommitSnapshot()
+        for row in self.connection.execute(f'SELECT {columns} FROM commits WHERE project_id = ?', (project_id,)):
+            commit = dict(zip(COMMIT_FIELDS, row))
+            commit['parent_ids'] = json.loads(commit['parent_ids'])
+            snapshot.commits.append(commit)
+        for name, commit_id in self.connection.execute(
+                'SELECT name, commit_id FROM branches WHERE project_id = ?', (project_id,)):
+            snapshot.branches.append({'name': name, 'commit_id': commit_id})
+        return snapshot
+
+    def last_commit_at(self, project_id: int) -> str | None:
+        return self.connection.execute(
+            'SELECT MAX(created_at) FROM commits WHERE project_id = ?', (project_id,)
+        ).fetchone()[0]
+
+    def _insert_commits(self, project_id: int, commits: List[Dict[str, Any]]):
+        self.connection.executemany(
+            f'INSERT OR REPLACE INTO commits (project_id, {", ".join(COMMIT_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [
+                (project_id, *(json.dumps(commit[key]) if key == 'parent_ids' else commit[key] for key in COMMIT_FIELDS))
+                for commit in commits
+            ],
+        )
+
+    def save_commits(self, project_id: int, commits: List[Dict[str, Any]]):
+        """Add ``commits`` to the cached ones, leaving the branches as they are."""
+        with self.connection:
+            self._insert_commits(project_id, commits)
+
+    def save_snapshot(self, project_id: int, snapshot: CommitSnapshot, replace: bool = False):
+        """Store the commits of the snapshot (added to the cached ones unless ``replace``) and its branches."""
+        with self.connection:
+            if replace:
+                self.connection.execute('DELETE FROM commits WHERE project_id = ?', (project_id,))
+            self._insert_commits(project_id, snapshot.commits)
+            self.connection.execute('DELETE FROM branches WHERE project_id = ?', (project_id,))
+            self.connection.executemany(
+                'INSERT INTO branches (project_id, name, commit_id) VALUES (?, ?, ?)',
+                [(project_id, branch['name'], branch['commit_id']) for branch in snapshot.branches],
+            )
+
+    def load_resource(self, project_id: int, kind: str, version: str) -> Any:
+        row = self.connection.execute(
+            'SELECT value FROM resources WHERE project_id = ? AND kind = ? AND version = ?',
+            (project_id, kind, version),
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def save_resource(self, project_id: int, kind: str, version: str, value: Any):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO resources (project_id, kind, version, value) VALUES (?, ?, ?, ?)',
+                (project_id, kind, version, json.dumps(value)),
+            )
+
+    def load_ci_config(self, blob_id: str) -> Dict[str, Any] | None:
+        """The parsed CI configuration stored in the blob ``blob_id``, shared by every file with the same content."""
+        row = self.connection.execute('SELECT config FROM ci_configs WHERE blob_id = ?', (blob_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def save_ci_config(self, blob_id: str, config: Dict[str, Any]):
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO ci_configs (blob_id, config) VALUES (?, ?)',
+                                    (blob_id, json.dumps(config, default=str)))
+
+    def resource(self, project_id: int, kind: str, version: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached ``kind`` resource (e.g. ``'tree'`` or ``'languages'``) of the project if it was stored
+        for the same ``version`` (e.g. the commit the resource was read at), otherwise load and store it.
+        """
+        value = self.load_resource(project_id, kind, version)
+        if value is None:
+            value = loader()
+            self.save_resource(project_id, kind, version, value)
+        return value
+
+
+def fetch_incremental_snapshot(project: Project, cache: ProjectCache, force_refresh: bool = False) -> CommitSnapshot:
+    """
+    Fetch only the commits created since the newest cached one and merge them with the cached history.
+    Branches are always fetched again, and those whose tip is still unknown then (pushed since the last run with
+    older commits, e.g. rebased) get their own history fetched. With ``force_refresh`` the whole history is fetched
+    and replaces the cache.
+    """
+    since = None if force_refresh else cache.last_commit_at(project.id)
+    if since is None:
+        snapshot = CommitSnapshot.fetch(project)
+        cache.save_snapshot(project.id, snapshot, replace=True)
+        return snapshot
+
+    snapshot = CommitSnapshot.fetch(project, since=since)
+    cache.save_snapshot(project.id, snapshot)
+    cached = cache.load_snapshot(project.id)
+    pages_fetched = snapshot.pages_fetched
+    missing = cached.branches_without_history()
+    for branch_name in missing:
+        branch_snapshot = CommitSnapshot.fetch(project, with_branches=False, ref_name=branch_name)
+        cache.save_commits(project.id, branch_snapshot.commits)
+        pages_fetched += branch_snapshot.pages_fetched
+    if missing:
+        cached = cache.load_snapshot(project.id)
+    cached.pages_fetched = pages_fetched
+    return cached
@@ -0,0 +1,262 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Generator, List, Tuple
+
+import yaml
+from gitlab.exceptions import GitlabError, GitlabHeadError
+from gitlab.v4.objects.projects import Project
+
+from crawler.cache import ProjectCache
+from utils.basic_logger import simple_logger
+
+__all__ = (
+    'CI_CONFIG_PATH',
+    'CiFile',
+    'root_ci_file',
+    'ci_includes',
+    'merge_ci_configs',
+    'resolve_ci_config',
+    'parse_ci_config',
+    'summarize_ci_config',
+    'EMPTY_CI_SUMMARY',
+    'included_blob_ids',
+    'template_key',
+    'fetch_ci_summary',
+)
+
+logger = simple_logger(__name__)
+
+CI_CONFIG_PATH = '.gitlab-ci.yml'
+
+# top level keys that are not jobs
+GLOBAL_KEYWORDS = {'default', 'include', 'stages', 'variables', 'workflow', 'image', 'services', 'cache',
+                   'before_script', 'after_script', 'spec'}
+DEFAULT_STAGES = ['build', 'test', 'deploy']
+MAX_INCLUDES = 150
+
+EMPTY_CI_SUMMARY: Dict[str, Any] = {'stages': [], 'jobs': 0, 'images': [], 'unresolved_includes': 0}
+
+# blob ids of the files included from other projects (or GitLab templates), by GitLab URL and file, kept for the
+# lifetime of the process: hundreds of projects include the same few files, which are then looked up only once
+included_blob_ids: Dict[Tuple[str, 'CiFile'], str | None] = {}
+
+
+@dataclass(frozen=True)
+class CiFile:
+    """
+    A CI configuration file: ``path`` at ``ref`` of ``project`` (id or full path, ``HEAD`` being its default
+    branch), or the GitLab CI template named ``path`` when ``project`` is empty.
+    """
+    project: str
+    ref: str
+    path: str
+
+    @property
+    def is_template(self) -> bool:
+        return not self.project
+
+
+def root_ci_file(project: Dict[str, Any]) -> CiFile:
+    """The pipeline configuration of a project (API attributes), honouring a custom ``ci_config_path``."""
+    config_path = project.get('ci_config_path') or CI_CONFIG_PATH
+    if '@' in config_path:
+        # <path>@<group>/<project>[:<ref>]: the configuration is kept in another project
+        path, location = config_path.split('@', 1)
+        other_project, _, ref = location.partition(':')
+        return CiFile(other_project, ref or 'HEAD', path.lstrip('/'))
+    return CiFile(str(project['id']), project['default_branch'], config_path.lstrip('/'))
+
+
+def ci_includes(config: Dict[str, Any], file: CiFile) -> List[CiFile | None]:
+    """The files ``config`` (read from ``file``) includes, None for the ones that cannot be fetched (remote, ...)."""
+    include = config.get('include') or []
+    includes = []
+    for entry in include if isinstance(include, list) else [include]:
+        if isinstance(entry, str):
+            entry = {'remote': entry} if entry.startswith(('http://', 'https://')) else {'local': entry}
+        if not isinstance(entry, dict):
+            includes.append(None)
+        elif 'local' in entry:
+            local = str(entry['local'])
+            includes.append(None if '*' in local else CiFile(file.project, file.ref, local.lstrip('/')))
+        elif 'project' in entry:
+            paths = entry.get('file') or []
+            for path in paths if isinstance(paths, list) else [paths]:
+                includes.append(CiFile(str(entry['project']), str(entry.get('ref') or 'HEAD'), str(path).lstrip('/')))
+        elif 'template' in entry:
+            includes.append(CiFile('', '', str(entry['template'])))
+        else:
+            # remote and component includes
+            includes.append(None)
+    return includes
+
+
+def _deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def merge_ci_configs(configs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge configurations the way GitLab merges includes: later ones win, mappings are merged deeply."""
+    merged: Dict[str, Any] = {}
+    for config in configs:
+        merged = _deep_merge(merged, {key: value for key, value in config.items() if key != 'include'})
+    return merged
+
+
+def resolve_ci_config(root: CiFile) -> Generator[List[CiFile], List[Dict[str, Any] | None], Tuple[Dict | None, int]]:
+    """
+    Resolve the includes of the configuration in ``root``, level by level. The generator yields the files to fetch
+    and is sent their parsed configurations (None when missing) in the same order, so the fetching can be
+    synchronous or concurrent. It returns the merged configuration (None without ``root``) and the number of
+    includes that could not be resolved.
+    """
+    configs: Dict[CiFile, Dict[str, Any] | None] = {}
+    level = [root]
+    while level and len(configs) < MAX_INCLUDES:
+        fetched = yield level
+        configs.update(zip(level, fetched))
+        level = list({
+            include: None
+            for file, config in zip(level, fetched) if config is not None
+            for include in ci_includes(config, file) if include is not None and include not in configs
+        })
+    if configs[root] is None:
+        return None, 0
+
+    unresolved = 0
+    visiting = set()
+
+    def merged(file: CiFile) -> Dict[str, Any]:
+        nonlocal unresolved
+        visiting.add(file)
+        parts = []
+        for include in ci_includes(configs[file], file):
+            if include is None or configs.get(include) is None:
+                unresolved += 1
+            elif include not in visiting:
+                parts.append(merged(include))
+        visiting.discard(file)
+        return merge_ci_configs(parts + [configs[file]])
+
+    return merged(root), unresolved
+
+
+def parse_ci_config(content: str | bytes) -> Dict[str, Any]:
+    try:
+        documents = list(yaml.safe_load_all(content))
+    except yaml.YAMLError as e:
+        logger.warning(f'Invalid CI configuration: {e}')
+        return {}
+    # a header document (spec: inputs) may come before the configuration, which is the last document
+    configs = [document for document in documents if isinstance(document, dict)]
+    return configs[-1] if configs else {}
+
+
+def _image_name(image: Any) -> str | None:
+    if isinstance(image, dict):
+        image = image.get('name')
+    return str(image) if image else None
+
+
+def _job_image(config: Dict[str, Any], job: Dict[str, Any], depth: int = 0) -> str | None:
+    image = _image_name(job.get('image'))
+    if image or depth > 10:
+        return image
+    extends = job.get('extends') or []
+    # the last extended job wins
+    for parent in reversed(extends if isinstance(extends, list) else [extends]):
+        if isinstance(config.get(parent), dict):
+            image = _job_image(config, config[parent], depth + 1)
+            if image:
+                return image
+    return None
+
+
+def summarize_ci_config(config: Dict[str, Any] | None, unresolved_includes: int = 0) -> Dict[str, Any]:
+    """The declared stages, the number of jobs and the images used by the jobs of a merged configuration."""
+    if config is None:
+        return dict(EMPTY_CI_SUMMARY)
+    jobs = {name: job for name, job in config.items()
+            if isinstance(job, dict) and name not in GLOBAL_KEYWORDS and not name.startswith('.')}
+    default_image = _image_name((config.get('default') or {}).get('image')) or _image_name(config.get('image'))
+    images = {_job_image(config, job) or default_image for job in jobs.values()}
+    return {
+        'stages': [str(stage) for stage in config.get('stages') or (DEFAULT_STAGES if jobs else [])],
+        'jobs': len(jobs),
+        'images': sorted(image for image in images if image),
+        'unresolved_includes': unresolved_includes,
+    }
+
+
+def template_key(file: CiFile) -> str:
+    return file.path.removesuffix('.gitlab-ci.yml')
+
+
+def _blob_id(project: Project, file: CiFile) -> str | None:
+    """The blob id of the file, an empty string when the server does not tell it, None when there is no file."""
+    try:
+        return project.files.head(file.path, ref=file.ref).get('X-Gitlab-Blob-Id', '')
+    except GitlabHeadError as e:
+        if e.response_code != 404:
+            logger.warning(f'Cannot read {file}: {e}')
+        return None
+
+
+def _load_ci_file(project: Project, file: CiFile, cache: ProjectCache) -> Dict[str, Any] | None:
+    if file.is_template:
+        # templates have no blob id: they are downloaded once per process, and cached by name
+        gl = project.manager.gitlab
+        key, blob_id = (gl.url, file), f'template:{template_key(file)}'
+        config = cache.load_ci_config(blob_id) if key in included_blob_ids else None
+        if config is None:
+            config = parse_ci_config(gl.gitlabciymls.get(template_key(file)).content)
+            cache.save_ci_config(blob_id, config)
+            included_blob_ids[key] = blob_id
+        return config
+
+    if file.project == str(project.id):
+        target, blob_id = project, _blob_id(project, file)
+    else:
+        gl = project.manager.gitlab
+        target, key = gl.projects.get(file.project, lazy=True), (gl.url, file)
+        if key not in included_blob_ids:
+            included_blob_ids[key] = _blob_id(target, file)
+        blob_id = included_blob_ids[key]
+    if blob_id is None:
+        return None
+    config = cache.load_ci_config(blob_id) if blob_id else None
+    if config is None:
+        config = parse_ci_config(target.files.get(file_path=file.path, ref=file.ref).decode())
+        if blob_id:
+            cache.save_ci_config(blob_id, config)
+    return config
+
+
+def fetch_ci_summary(project: Project, cache: ProjectCache, root: CiFile | None = None) -> Dict[str, Any]:
+    """
+    Summary of the pipeline configuration of the project (``root``, by default the one of its default branch) with
+    every include resolved: the files are looked up by blob id with HEAD requests and only downloaded and parsed
+    when the cache does not know their content yet.
+    """
+    if root is None:
+        root = root_ci_file(project.attributes)
+    resolution = resolve_ci_config(root)
+    try:
+        files = next(resolution)
+        while True:
+            configs = []
+            for file in files:
+                try:
+                    configs.append(_load_ci_file(project, file, cache))
+                except GitlabError as e:
+                    logger.warning(f'Cannot read {file}: {e}')
+                    configs.append(None)
+            files = resolution.send(configs)
+    except StopIteration as stop:
+        config, unresolved = stop.value
+    return summarize_ci_config(config, unresolved)
@@ -0,0 +1,181 @@
+import os
+import json
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from crawler.facts import FactStore
+
+__all__ = (
+    'INDEX_ARRAYS',
+    'build_commit_index',
+    'CommitIndex',
+)
+
+DAY = 86400
+
+# the end of a window: a timestamp, a date string or None for now
+Moment = pd.Timestamp | str | None
+
+# one .npy file per column, all sorted by commit time
+INDEX_ARRAYS = ('timestamps', 'authors', 'projects', 'conventional')
+
+
+def build_commit_index(facts_path: str, index_path: str | None = None) -> str:
+    """
+    Build the commit index of the commit facts written during a crawl: commit times (epoch seconds), author and
+    project ids interned as small integers, and the conventional flag, as sorted ``.npy`` arrays next to a
+    ``vocab.json`` mapping the ids back to names. Returns the index directory (``<facts_path>/index`` by default).
+    """
+    index_path = index_path or os.path.join(facts_path, 'index')
+    facts = FactStore(facts_path).commits(columns=['project_id', 'project', 'group', 'author', 'date',
+                                                   'is_conventional'])
+    # typed even without any fact, so that an empty crawl gives an empty index
+    facts['date'] = pd.to_datetime(facts['date'], utc=True)
+    facts = facts.sort_values('date', kind='stable')
+    author_ids, authors = pd.factorize(facts['author'].fillna(''))
+    project_ids, project_keys = pd.factorize(facts['project_id'])
+    projects = facts.drop_duplicates('project_id').set_index('project_id').loc[project_keys]
+    arrays = {
+        'timestamps': ((facts['date'] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).to_numpy(np.int64),
+        'authors': author_ids.astype(np.int32),
+        'projects': project_ids.astype(np.int32),
+        'conventional': facts['is_conventional'].to_numpy(dtype=bool),
+    }
+    os.makedirs(index_path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(index_path, f'{name}.tmp.npy'), array)
+        os.replace(os.path.join(index_path, f'{name}.tmp.npy'), os.path.join(index_path, f'{name}.npy'))
+    vocab = {
+        'authors': [str(author) for author in authors],
+        'projects': [{'id': int(project_id), 'name': row['project'], 'group': row['group']}
+                     for project_id, row in projects.iterrows()],
+    }
+    with open(os.path.join(index_path, 'vocab.json'), 'w', encoding='utf-8') as file:
+        json.dump(vocab, file)
+    return index_path
+
+
+class CommitIndex:
+    """
+    Windowed activity queries over every crawled commit, answered from the arrays of ``build_commit_index`` without
+    any API call. The arrays are memory-mapped, so loading is instant whatever the number of commits, and a time
+    window is a slice of them found by binary search. Windows are the ``days`` before ``end`` (now by default).
+    """
+
+    def __init__(self, timestamps: np.ndarray, authors: np.ndarray, projects: np.ndarray, conventional: np.ndarray,
+                 vocab: Dict[str, List]):
+        self.timestamps = timestamps
+        self.authors = authors
+        self.projects = projects
+        self.conventional = conventional
+        self.author_names = pd.Index(vocab['authors'], name='author')
+        self.project_info = pd.DataFrame(vocab['projects'], columns=['id', 'name', 'group'])
+        self.project_ids = pd.Index(self.project_info['id'], name='Project ID')
+
+    @classmethod
+    def load(cls, index_path: str, mmap: bool = True) -> 'CommitIndex':
+        arrays = {name: np.load(os.path.join(index_path, f'{name}.npy'), mmap_mode='r' if mmap else None)
+                  for name in INDEX_ARRAYS}
+        with open(os.path.join(index_path, 'vocab.json'), encoding='utf-8') as file:
+            vocab = json.load(file)
+        return cls(vocab=vocab, **arrays)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @staticmethod
+    def _end_seconds(end: Moment) -> int:
+        return int((pd.Timestamp.now(tz='UTC') if end is None else pd.Timestamp(end)).timestamp())
+
+    def window(self, days: float, end: Moment = None) -> slice:
+        """The commits of the ``days`` days before ``end``, as a slice of the arrays."""
+        end_seconds = self._end_seconds(end)
+        start_seconds = end_seconds - int(days * DAY)
+        return slice(*np.searchsorted(self.timestamps, [start_seconds, end_seconds], side='right'))
+
+    def _per_project(self, values: np.ndarray, name: str) -> pd.Series:
+        return pd.Series(values, index=self.project_ids, name=name)
+
+    def commits(self, days: float, end: Moment = None) -> pd.Series:
+        window = self.window(days, end)
+        return self._per_project(np.bincount(self.projects[window], minlength=len(self.project_ids)), 'commits')
+
+    def commit_rate(self, days: float, end: Moment = None) -> pd.Series:
+        """Commits per day of every project."""
+        return (self.commits(days, end) / days).rename('commits_per_day')
+
+    def _author_counts(self, window: slice) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # commits of every (project, author) pair of the window
+        pairs = self.projects[window].astype(np.int64) * len(self.author_names) + self.authors[window]
+        keys, counts = np.unique(pairs, return_counts=True)
+        return keys // len(self.author_names), keys % len(self.author_names), counts
+
+    def active_developers(self, days: float, end: Moment = None) -> pd.Series:
+        """Number of distinct authors with at least one commit in the window, per project."""
+        projects, _, _ = self._author_counts(self.window(days, end))
+        return self._per_project(np.bincount(projects, minlength=len(self.project_ids)), 'active_developers')
+
+    def bus_factor(self, days: float, end: Moment = None, share: float = 0.5) -> pd.Series:
+        """Smallest number of authors who made ``share`` of the commits of the window, per project (0 if none)."""
+        projects, _, counts = self._author_counts(self.window(days, end))
+        # the authors of each project by decreasing number of commits
+        order = np.lexsort((-counts, projects))
+        projects, counts = projects[order], counts[order]
+        totals = np.bincount(projects, weights=counts, minlength=len(self.project_ids))
+        starts = np.searchsorted(projects, np.arange(len(self.project_ids)))
+        cumulative = np.cumsum(counts)
+        within_project = cumulative - np.concatenate(([0], cumulative))[starts][projects]
+        # the authors before the one reaching the share, plus that one
+        short = np.bincount(projects[within_project < share * totals[projects]], minlength=len(self.project_ids))
+        return self._per_project(np.where(totals > 0, short + 1, 0), 'bus_factor')
+
+    def developers(self, days: float, end: Moment = None) -> pd.DataFrame:
+        """Per author active in the window: commits, projects and conventional commit percentage."""
+        window = self.window(days, end)
+        authors = self.authors[window]
+        commits = np.bincount(authors, minlength=len(self.author_names))
+        conventional = np.bincount(authors, weights=self.conventional[window], minlength=len(self.author_names))
+        _, pair_authors, _ = self._author_counts(window)
+        projects = np.bincount(pair_authors, minlength=len(self.author_names))
+        table = pd.DataFrame({'commits': commits, 'projects': projects,
+                              'conventional_percentage': conventional / np.maximum(commits, 1) * 100},
+                             index=self.author_names)
+        return table[table['commits'] > 0].sort_values('commits', ascending=False)
+
+    def conventional_trend(self, days: float, end: Moment = None, period_days: int = 7,
+                           project_id: int | None = None) -> pd.DataFrame:
+        """
+        Commits and conventional commit percentage per period of ``period_days`` in the window, of every project or
+        of ``project_id`` only.
+        """
+        window = self.window(days, end)
+        timestamps, conventional = self.timestamps[window], self.conventional[window]
+        if project_id is not None:
+            selected = self.projects[window] == self.project_ids.get_loc(project_id)
+            timestamps, conventional = timestamps[selected], conventional[selected]
+        end_seconds = self._end_seconds(end)
+        num_periods = max(int(np.ceil(days / period_days)), 1)
+        # period 0 ends at ``end``: periods are counted backwards
+        periods = num_periods - 1 - (end_seconds - 1 - timestamps) // (period_days * DAY)
+        periods = np.clip(periods, 0, num_periods - 1)
+        commits = np.bincount(periods, minlength=num_periods)
+        conventional_commits = np.bincount(periods, weights=conventional, minlength=num_periods)
+        starts = pd.to_datetime(end_seconds - (num_periods - np.arange(num_periods)) * period_days * DAY, unit='s',
+                                utc=True)
+        return pd.DataFrame({'commits': commits,
+                             'conventional_percentage': conventional_commits / np.maximum(commits, 1) * 100},
+                            index=pd.Index(starts, name='period_start'))
+
+    def project_activity(self, windows: Iterable[int] = (30, 90, 365), end: Moment = None) -> pd.DataFrame:
+        """Commits, active developers and bus factor of every project over each window of days."""
+        columns = {}
+        for days in windows:
+            columns[f'Commits ({days}d)'] = self.commits(days, end)
+            columns[f'Active Developers ({days}d)'] = self.active_developers(days, end)
+            columns[f'Bus Factor ({days}d)'] = self.bus_factor(days, end)
+        table = pd.DataFrame(columns)
+        table.insert(0, 'Group Name', self.project_info['group'].to_numpy())
+        table.insert(0, 'Name', self.project_info['name'].to_numpy())
+        return table
@@ -0,0 +1,54 @@
+import re
+
+import pandas as pd
+
+__all__ = (
+    'CONVENTIONAL_TYPES',
+    'CONVENTIONAL_COMMIT_PATTERN',
+    'is_conventional_commit',
+    'classify_commits',
+    'conventional_commit_stats',
+)
+
+CONVENTIONAL_TYPES = ('feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'build', 'ci', 'chore', 'revert')
+CONVENTIONAL_COMMIT_PATTERN = re.compile(
+    rf'^(?P<type>{"|".join(CONVENTIONAL_TYPES)})(?P<scope>\(\S+\))?(?P<breaking>!)?: .{{1,}}'
+)
+
+
+def is_conventional_commit(message: str) -> bool:
+    return CONVENTIONAL_COMMIT_PATTERN.match(message) is not None
+
+
+def classify_commits(messages: pd.Series) -> pd.DataFrame:
+    """
+    Classify a column of commit messages in one vectorized pass: ``conventional`` (bool), ``type``
+    (e.g. ``'feat'``, missing when not conventional), ``scope`` and ``breaking`` (a ``!`` before the colon).
+    """
+    parts = messages.fillna('').astype(str).str.extract(CONVENTIONAL_COMMIT_PATTERN)
+    parts['conventional'] = parts['type'].notna()
+    parts['breaking'] = parts['breaking'].notna()
+    return parts
+
+
+def conventional_commit_stats(commits: pd.DataFrame, author_column: str = 'author_name',
+                              message_column: str = 'message') -> pd.DataFrame:
+    """
+    Per author (in order of first appearance): ``total`` commits, ``conventional`` commits, their ``percentage``,
+    ``breaking`` changes and one count column per conventional commit type.
+    """
+    classified = classify_commits(commits[message_column])
+    # commits without an author name are counted under an empty name rather than dropped
+    authors = commits[author_column].fillna('')
+    grouped = classified.groupby(authors, sort=False)
+    stats = pd.DataFrame({
+        'total': grouped.size(),
+        'conventional': grouped['conventional'].sum(),
+        'breaking': grouped['breaking'].sum(),
+    })
+    stats['percentage'] = stats['conventional'] / stats['total'] * 100
+    types = pd.crosstab(authors, classified['type']).reindex(columns=list(CONVENTIONAL_TYPES), fill_value=0)
+    stats = stats.join(types).fillna(0)
+    stats[list(CONVENTIONAL_TYPES)] = stats[list(CONVENTIONAL_TYPES)].astype(int)
+    stats.index.name = author_column
+    return stats
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Set, Tuple
+
+import gitlab
+from gitlab.v4.objects.projects import Project
+
+from crawler.graphql import fetch_projects_metadata
+from crawler.metrics import required_resources, select_metrics
+from crawler.snapshot import PER_PAGE
+
+__all__ = (
+    'ProjectFilter',
+    'parse_id_range',
+    'iter_projects',
+    'with_projects_metadata',
+)
+
+
+def parse_id_range(value: str) -> Tuple[int, int] | None:
+    """``'1000-1999'`` as ``(1000, 1999)``; either bound may be left empty to leave it open."""
+    if not value:
+        return None
+    low, _, high = value.partition('-')
+    return int(low) if low else 0, int(high) if high else 2 ** 63
+
+
+def _split(value: str) -> Tuple[str, ...]:
+    return tuple(item.strip().strip('/') for item in value.split(',') if item.strip())
+
+
+@dataclass
+class ProjectFilter:
+    """
+    Which projects to crawl. ``include_groups`` / ``exclude_groups`` are group full paths (subgroups included),
+    ``group_ids`` a range of namespace ids, e.g. ``'1000-1999'``: every project belongs to exactly one namespace, so
+    crawlers given disjoint ranges split an instance without overlap. ``simple`` lists the lighter representation
+    of the projects, which lacks e.g. the ``ci_config_path`` the CI metrics need.
+    """
+    last_activity_after: str = ''
+    include_archived: bool = False
+    include_groups: Tuple[str, ...] = ()
+    exclude_groups: Tuple[str, ...] = ()
+    group_ids: Tuple[int, int] | None = None
+    simple: bool = True
+
+    @classmethod
+    def from_settings(cls, settings) -> 'ProjectFilter':
+        return cls(
+            last_activity_after=settings.last_activity_after,
+            include_archived=settings.include_archived,
+            include_groups=_split(settings.include_groups),
+            exclude_groups=_split(settings.exclude_groups),
+            group_ids=parse_id_range(settings.group_ids),
+            simple='ci' not in required_resources(select_metrics(settings.metrics)),
+        )
+
+    def query_parameters(self) -> Dict[str, Any]:
+        parameters: Dict[str, Any] = {'simple': self.simple, 'order_by': 'id', 'sort': 'asc'}
+        if not self.include_archived:
+            parameters['archived'] = False
+        if self.last_activity_after:
+            parameters['last_activity_after'] = self.last_activity_after
+        return parameters
+
+    def accepts(self, project: Dict[str, Any]) -> bool:
+        namespace = project['namespace']
+        if any(_in_group(namespace['full_path'], group) for group in self.exclude_groups):
+            return False
+        if self.group_ids is not None and not self.group_ids[0] <= namespace['id'] <= self.group_ids[1]:
+            return False
+        return True
+
+
+def _in_group(full_path: str, group: str) -> bool:
+    return full_path == group or full_path.startswith(f'{group}/')
+
+
+def iter_projects(gl: gitlab.Gitlab, project_filter: ProjectFilter | None = None,
+                  per_page: int = PER_PAGE) -> Iterator[Project]:
+    """
+    Stream the projects to crawl, page by page, filtered on the server where the API allows it. The whole instance
+    is listed with keyset pagination (offset pagination slows down on deep pages); included groups are listed
+    through their own project endpoint instead.
+    """
+    project_filter = project_filter or ProjectFilter()
+    parameters = dict(project_filter.query_parameters(), iterator=True, per_page=per_page)
+    if not project_filter.include_groups:
+        listings = [gl.projects.list(pagination='keyset', **parameters)]
+    else:
+        listings = [
+            gl.groups.get(group, lazy=True).projects.list(include_subgroups=True, with_shared=False, **parameters)
+            for group in project_filter.include_groups
+        ]
+    seen: Set[int] = set()
+    for listing in listings:
+        for project in listing:
+            # nested included groups list the same projects twice
+            if project.id in seen or not project_filter.accepts(project.attributes):
+                continue
+            seen.add(project.id)
+            # group listings return `GroupProject`s, which have no repository managers
+            yield project if isinstance(project, Project) else Project(gl.projects, project.attributes)
+
+
+def with_projects_metadata(gl: gitlab.Gitlab, projects: Iterable[Project],
+                           batch_size: int = 50) -> Iterator[Tuple[Project, Dict[str, Any]]]:
+    """
+    Pair the projects with their GraphQL metadata (None when GraphQL did not answer for them), fetched for
+    ``batch_size`` projects at a time as they arrive.
+    """
+    projects = iter(projects)
+    while batch := list(islice(projects, batch_size)):
+        projects_metadata = fetch_projects_metadata(gl, batch, batch_size=batch_size)
+        for project in batch:
+            yield project, projects_metadata.get(project.id)
@@ -0,0 +1,125 @@
+import os
+import glob
+from typing import Any, Dict
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from crawler.branches import CommitGraph
+from crawler.conventional import classify_commits
+from crawler.snapshot import CommitSnapshot
+
+__all__ = (
+    'FACT_COLUMNS',
+    'commit_facts',
+    'write_commit_facts',
+    'build_rollups',
+    'FactStore',
+)
+
+FACT_COLUMNS = ('project_id', 'project', 'group', 'commit_id', 'author', 'author_email', 'date', 'branch',
+                'is_conventional', 'type', 'breaking')
+# the non-text columns, typed even when there is no fact
+_FACT_DTYPES = {'project_id': 'int64', 'date': 'datetime64[ns, UTC]', 'is_conventional': 'bool', 'breaking': 'bool'}
+
+
+def commit_facts(project: Dict[str, Any], snapshot: CommitSnapshot) -> pd.DataFrame:
+    """
+    One row per commit of the project. ``author`` is the local part of the author email, like the developers of
+    the report; ``branch`` is the branch the commit is attributed to (see ``CommitGraph.branch_of``).
+    """
+    commits = snapshot.to_frame()
+    classified = classify_commits(commits['message'])
+    owners = CommitGraph(snapshot.commits).branch_of(snapshot.branches, project.get('default_branch'))
+    return pd.DataFrame({
+        'project_id': project['id'],
+        'project': project['name'],
+        'group': project['namespace']['name'],
+        'commit_id': commits['id'],
+        'author': commits['author_email'].str.split('@').str[0],
+        'author_email': commits['author_email'],
+        'date': pd.to_datetime(commits['created_at'], utc=True, format='ISO8601'),
+        'branch': commits['id'].map(owners),
+        'is_conventional': classified['conventional'],
+        'type': classified['type'],
+        'breaking': classified['breaking'],
+    }, columns=list(FACT_COLUMNS))
+
+
+def write_commit_facts(facts_path: str, project: Dict[str, Any], snapshot: CommitSnapshot):
+    """Write the facts of a project to its own file, replacing the ones of a previous run."""
+    directory = os.path.join(facts_path, 'commits')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'project-{project["id"]}.parquet')
+    commit_facts(project, snapshot).to_parquet(f'{path}.tmp', index=False)
+    os.replace(f'{path}.tmp', path)
+
+
+def _rollup(grouped) -> pd.DataFrame:
+    rollup = grouped.agg(
+        commits=('commit_id', 'size'),
+        conventional=('is_conventional', 'sum'),
+        projects=('project_id', 'nunique'),
+        developers=('author', 'nunique'),
+        first=('date', 'min'),
+        last=('date', 'max'),
+    )
+    rollup['conventional_percentage'] = rollup['conventional'] / rollup['commits'] * 100
+    return rollup
+
+
+def build_rollups(facts_path: str):
+    """Precompute the per-developer, per-group and per-week rollups of the commit facts (empty if there is none)."""
+    facts = FactStore(facts_path).commits()
+    os.makedirs(facts_path, exist_ok=True)
+    _rollup(facts.groupby('author')).drop(columns='developers').to_parquet(os.path.join(facts_path, 'developers.parquet'))
+    _rollup(facts.groupby('group')).to_parquet(os.path.join(facts_path, 'groups.parquet'))
+    weeks = facts['date'].dt.tz_localize(None).dt.to_period('W').dt.start_time.rename('week')
+    weekly = facts.groupby([weeks, 'group', 'author']).agg(
+        commits=('commit_id', 'size'),
+        conventional=('is_conventional', 'sum'),
+    )
+    weekly.reset_index().to_parquet(os.path.join(facts_path, 'weekly.parquet'), index=False)
+
+
+class FactStore:
+    """Read access to the commit facts written during a crawl and to their rollups."""
+
+    def __init__(self, facts_path: str):
+        self.facts_path = facts_path
+
+    def commits(self, columns: list | None = None, **filters) -> pd.DataFrame:
+        """The commit facts, optionally restricted to ``columns`` and to rows equal to ``filters``, e.g. ``group='team'``."""
+        files = sorted(glob.glob(os.path.join(self.facts_path, 'commits', '*.parquet')))
+        if not files:
+            columns = columns or list(FACT_COLUMNS)
+            return pd.DataFrame(columns=columns).astype({column: dtype for column, dtype in _FACT_DTYPES.items()
+                                                         if column in columns})
+        expression = None
+        for column, value in filters.items():
+            condition = ds.field(column) == value
+            expression = condition if expression is None else expression & condition
+        return ds.dataset(files, format='parquet').to_table(columns=columns, filter=expression).to_pandas()
+
+    def _read(self, name: str) -> pd.DataFrame:
+        return pd.read_parquet(os.path.join(self.facts_path, f'{name}.parquet'))
+
+    def developers(self) -> pd.DataFrame:
+        """Per developer: commits, conventional commits and percentage, projects, first and last commit date."""
+        return self._read('developers')
+
+    def groups(self) -> pd.DataFrame:
+        """Per group: commits, conventional commits and percentage, projects, developers, first and last commit date."""
+        return self._read('groups')
+
+    def weekly(self, group: str | None = None, author: str | None = None) -> pd.DataFrame:
+        """Commits and conventional commits per week, summed over the groups and authors not selected."""
+        weekly = self._read('weekly')
+        if group is not None:
+            weekly = weekly[weekly['group'] == group]
+        if author is not None:
+            weekly = weekly[weekly['author'] == author]
+        return weekly.groupby('week')[['commits', 'conventional']].sum()
+
+    def top_developers(self, count: int = 20) -> pd.DataFrame:
+        return self.developers().sort_values('commits', ascending=False).head(count)
@@ -0,0 +1,92 @@
+from typing import Any, Dict, List
+
+import gitlab
+from gitlab.v4.objects.projects import Project
+
+from crawler.tree import MARKERS
+from utils.basic_logger import simple_logger
+
+__all__ = (
+    'MARKER_PATHS',
+    'GraphQLError',
+    'fetch_projects_metadata',
+)
+
+logger = simple_logger(__name__)
+
+# the root files the marker scan would probe with HEAD requests (see ``MarkerRule.probe_paths``)
+MARKER_PATHS = tuple(dict.fromkeys(path for rule in MARKERS.values() for path in rule.probe_paths))
+
+PROJECTS_METADATA_QUERY = '''
+query ($fullPaths: [String!], $markerPaths: [String!]!, $first: Int) {
+  projects(fullPaths: $fullPaths, first: $first) {
+    nodes {
+      id
+      fullPath
+      languages { name share }
+      repository {
+        rootRef
+        blobs(paths: $markerPaths) { nodes { path } }
+      }
+    }
+  }
+}
+'''
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def _post_graphql(gl: gitlab.Gitlab, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    response = gl.session.post(
+        f'{gl.url}/api/graphql',
+        json={'query': query, 'variables': variables},
+        headers={'Authorization': f'Bearer {gl.private_token}'},
+        timeout=gl.timeout,
+    )
+    if response.status_code != 200:
+        raise GraphQLError(f'GraphQL request failed with status {response.status_code}')
+    payload = response.json()
+    if not payload.get('data'):
+        raise GraphQLError(str(payload.get('errors')))
+    return payload['data']
+
+
+def _graphql_metadata(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata of a project node; fields GraphQL could not resolve are left out, for the worker to fetch."""
+    metadata = {}
+    if node.get('languages') is not None:
+        metadata['languages'] = {language['name']: language['share'] for language in node['languages']}
+    repository = node.get('repository')
+    if repository is not None and repository.get('blobs') is not None:
+        metadata['default_branch'] = repository['rootRef']
+        found = {blob['path'] for blob in repository['blobs']['nodes']}
+        metadata['probes'] = {path: path in found for path in MARKER_PATHS}
+    return metadata
+
+
+def fetch_projects_metadata(gl: gitlab.Gitlab, projects: List[Project], batch_size: int = 50) -> Dict[int, Dict[str, Any]]:
+    """
+    Languages, default branch and existence of the marker files (``probes``: path to whether it exists on the
+    default branch) of every project, fetched with one GraphQL query per ``batch_size`` projects. Projects GraphQL
+    does not answer for (every project, when GraphQL is unavailable) are left out, and fields it cannot resolve are
+    missing: the workers fetch what is missing themselves, so that no REST call delays the listing.
+    """
+    projects_metadata = {}
+    for start in range(0, len(projects), batch_size):
+        batch = projects[start:start + batch_size]
+        try:
+            data = _post_graphql(gl, PROJECTS_METADATA_QUERY, {
+                'fullPaths': [project.path_with_namespace for project in batch],
+                'markerPaths': list(MARKER_PATHS),
+                'first': len(batch),
+            })
+        except Exception as e:
+            logger.warning(f'GraphQL unavailable, the metadata is fetched by the workers: {e}')
+            continue
+        nodes = {node['fullPath']: node for node in data['projects']['nodes']}
+        for project in batch:
+            if project.path_with_namespace in nodes:
+                projects_metadata[project.id] = _graphql_metadata(nodes[project.path_with_namespace])
+    return projects_metadata
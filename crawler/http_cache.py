@@ -0,0 +1,320 @@
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from utils.basic_logger import simple_logger
+
+__all__ = (
+    'DEFAULT_TTLS',
+    'CachedResponse',
+    'HttpCache',
+    'CachingAdapter',
+    'CachingTransport',
+    'install_http_cache',
+)
+
+logger = simple_logger(__name__)
+
+# Endpoints worth caching and how many seconds a stored response is used without asking the server; once expired it
+# is revalidated with a conditional request. Anything else (e.g. commit lists) is never cached.
+DEFAULT_TTLS: Dict[str, float] = {
+    r'/languages$': 24 * 3600,
+    r'/hooks$': 3600,
+    r'/repository/branches$': 0,
+    r'/repository/tree$': 0,
+    r'/repository/files/[^/]+$': 0,
+}
+
+# the stored body is already decoded, and these describe the encoded one
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    outcome TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+'''
+
+OUTCOMES = ('hit', 'revalidated', 'miss')
+
+
+@dataclass
+class CachedResponse:
+    key: str
+    headers: Dict[str, str]
+    body: bytes
+    stored_at: float
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if 'etag' in self.headers:
+            headers['If-None-Match'] = self.headers['etag']
+        if 'last-modified' in self.headers:
+            headers['If-Modified-Since'] = self.headers['last-modified']
+        return headers
+
+
+class HttpCache:
+    """
+    On-disk (SQLite) cache of GET responses, shared by every process of a run. Responses younger than the TTL of
+    their endpoint are served without a request; older ones are revalidated with ``If-None-Match`` /
+    ``If-Modified-Since`` and a ``304 Not Modified`` counts as a hit. The least recently used responses are evicted
+    to keep the bodies under ``max_bytes``. Hits, revalidations and misses are counted in the cache itself, so the
+    stats cover every worker.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 2 ** 20, ttls: Mapping[str, float] | None = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls: List[Tuple[re.Pattern, float]] = [
+            (re.compile(pattern), ttl) for pattern, ttl in (DEFAULT_TTLS if ttls is None else ttls).items()
+        ]
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(_SCHEMA)
+        self.connection.executemany('INSERT OR IGNORE INTO stats (outcome, count, bytes) VALUES (?, 0, 0)',
+                                    [(outcome,) for outcome in OUTCOMES])
+        # the running number and size of the stored responses, so that eviction does not sum the whole table
+        self.connection.execute("INSERT OR IGNORE INTO stats (outcome, count, bytes) "
+                                "SELECT 'stored', COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def ttl(self, path: str) -> float | None:
+        """The TTL of the endpoint at ``path``, or None if its responses are not cached."""
+        for pattern, ttl in self.ttls:
+            if pattern.search(path):
+                return ttl
+        return None
+
+    @staticmethod
+    def key(url: str, token: str | None) -> str:
+        # responses depend on who asks
+        return hashlib.sha256(f'{token or ""} {url}'.encode()).hexdigest()
+
+    def lookup(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT headers, body, stored_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(key, json.loads(row[0]), row[1], row[2])
+
+    def is_fresh(self, cached: CachedResponse, ttl: float) -> bool:
+        return time.time() - cached.stored_at < ttl
+
+    def hit(self, cached: CachedResponse, revalidated: bool = False):
+        now = time.time()
+        with self._lock, self.connection:
+            if revalidated:
+                self.connection.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?',
+                                        (now, now, cached.key))
+            else:
+                self.connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, cached.key))
+            self._count('revalidated' if revalidated else 'hit', len(cached.body))
+
+    def store(self, key: str, url: str, headers: Mapping[str, str], body: bytes):
+        headers = {name.lower(): value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS}
+        now = time.time()
+        with self._lock, self.connection:
+            self._count('miss', len(body))
+            if len(body) > self.max_bytes:
+                return
+            replaced = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses (key, url, headers, body, size, stored_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, url, json.dumps(headers), body, len(body), now, now),
+            )
+            if replaced is None:
+                self._stored(1, len(body))
+            else:
+                self._stored(0, len(body) - replaced[0])
+            self._evict()
+
+    def miss(self, size: int):
+        with self._lock, self.connection:
+            self._count('miss', size)
+
+    def _count(self, outcome: str, size: int):
+        self.connection.execute('UPDATE stats SET count = count + 1, bytes = bytes + ? WHERE outcome = ?',
+                                (size, outcome))
+
+    def _stored(self, count: int, size: int):
+        self.connection.execute("UPDATE stats SET count = count + ?, bytes = bytes + ? WHERE outcome = 'stored'",
+                                (count, size))
+
+    def stored_bytes(self) -> int:
+        """The size of the stored bodies, kept under ``max_bytes``."""
+        with self._lock:
+            return self.connection.execute("SELECT bytes FROM stats WHERE outcome = 'stored'").fetchone()[0]
+
+    def _evict(self):
+        total = self.connection.execute("SELECT bytes FROM stats WHERE outcome = 'stored'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # the least recently used responses, read from the index until enough bytes are freed
+        evicted: List[Tuple[str]] = []
+        freed = 0
+        for key, size in self.connection.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            if total - freed <= self.max_bytes:
+                break
+            evicted.append((key,))
+            freed += size
+        self.connection.executemany('DELETE FROM responses WHERE key = ?', evicted)
+        self._stored(-len(evicted), -freed)
+        logger.debug(f'{len(evicted)} cached responses evicted')
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            rows = self.connection.execute('SELECT outcome, count, bytes FROM stats WHERE outcome != ?',
+                                           ('stored',)).fetchall()
+        return {outcome: {'count': count, 'bytes': size} for outcome, count, size in rows}
+
+    def log_stats(self, since: Dict[str, Dict[str, int]] | None = None):
+        """Log the hit rate and the bytes saved, counted from the ``since`` stats if given."""
+        stats = self.stats()
+        since = since or {}
+        counts = {outcome: stats[outcome]['count'] - since.get(outcome, {}).get('count', 0) for outcome in OUTCOMES}
+        saved = sum(stats[outcome]['bytes'] - since.get(outcome, {}).get('bytes', 0)
+                    for outcome in ('hit', 'revalidated'))
+        total = sum(counts.values())
+        hit_rate = (counts['hit'] + counts['revalidated']) / total if total else 0.0
+        logger.info(f'HTTP cache: {total} cacheable requests, {hit_rate:.1%} hit rate ({counts["hit"]} fresh, '
+                    f'{counts["revalidated"]} revalidated), {saved / 2 ** 20:.1f} MiB not downloaded')
+
+
+def _url_path(url: str) -> str:
+    return requests.utils.urlparse(url).path
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    A ``requests`` transport adapter answering GET requests from an ``HttpCache``. The cache is opened lazily from
+    its path, so the adapter (and a ``gitlab.Gitlab`` using it) can be pickled to worker processes.
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ['cache_path', 'max_bytes', 'ttls']
+
+    def __init__(self, cache_path: str, max_bytes: int = 256 * 2 ** 20, ttls: Mapping[str, float] | None = None,
+                 **kwargs):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        super().__init__(**kwargs)
+
+    @property
+    def cache(self) -> HttpCache:
+        if getattr(self, '_cache', None) is None:
+            self._cache = HttpCache(self.cache_path, self.max_bytes, self.ttls)
+        return self._cache
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, **kwargs) -> requests.Response:
+        ttl = self.cache.ttl(_url_path(request.url)) if request.method == 'GET' and not stream else None
+        if ttl is None:
+            return super().send(request, stream=stream, **kwargs)
+        key = self.cache.key(request.url, request.headers.get('PRIVATE-TOKEN') or request.headers.get('Authorization'))
+        cached = self.cache.lookup(key)
+        if cached is not None:
+            if self.cache.is_fresh(cached, ttl):
+                self.cache.hit(cached)
+                return self._build_cached_response(request, cached, 'hit')
+            request.headers.update(cached.conditional_headers())
+        response = super().send(request, stream=stream, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self.cache.hit(cached, revalidated=True)
+            return self._build_cached_response(request, cached, 'revalidated')
+        if response.status_code == 200:
+            self.cache.store(key, request.url, response.headers, response.content)
+        else:
+            self.cache.miss(len(response.content))
+        return response
+
+    @staticmethod
+    def _build_cached_response(request: requests.PreparedRequest, cached: CachedResponse,
+                               outcome: str) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(cached.headers, **{'X-Cache': outcome})
+        response._content = cached.body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        super().close()
+        if getattr(self, '_cache', None) is not None:
+            self._cache.close()
+            self._cache = None
+
+
+class CachingTransport(httpx.AsyncBaseTransport):
+    """The same cache for the ``httpx`` client of the async engine, wrapped around another transport."""
+
+    def __init__(self, cache: HttpCache, transport: httpx.AsyncBaseTransport | None = None):
+        self.cache = cache
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        ttl = self.cache.ttl(request.url.path) if request.method == 'GET' else None
+        if ttl is None:
+            return await self._transport.handle_async_request(request)
+        key = self.cache.key(str(request.url), request.headers.get('PRIVATE-TOKEN'))
+        cached = self.cache.lookup(key)
+        if cached is not None:
+            if self.cache.is_fresh(cached, ttl):
+                self.cache.hit(cached)
+                return httpx.Response(200, headers=dict(cached.headers, **{'x-cache': 'hit'}), content=cached.body,
+                                      request=request)
+            request.headers.update(cached.conditional_headers())
+        response = await self._transport.handle_async_request(request)
+        body = await response.aread()
+        if response.status_code == 304 and cached is not None:
+            self.cache.hit(cached, revalidated=True)
+            return httpx.Response(200, headers=dict(cached.headers, **{'x-cache': 'revalidated'}), content=cached.body,
+                                  request=request)
+        if response.status_code == 200:
+            self.cache.store(key, str(request.url), response.headers, body)
+        else:
+            self.cache.miss(len(body))
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() not in _DROPPED_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def install_http_cache(gl, cache_path: str, max_bytes: int = 256 * 2 ** 20,
+                       ttls: Mapping[str, float] | None = None) -> CachingAdapter:
+    """Route the GET requests of the ``gitlab.Gitlab`` client ``gl`` through the cache at ``cache_path``."""
+    adapter = CachingAdapter(cache_path, max_bytes=max_bytes, ttls=ttls)
+    gl.session.mount('http://', adapter)
+    gl.session.mount('https://', adapter)
+    return adapter
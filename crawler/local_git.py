@@ -0,0 +1,181 @@
+import os
+import base64
+import subprocess
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+from gitlab.exceptions import GitlabGetError, GitlabHeadError
+from gitlab.v4.objects.projects import Project
+
+__all__ = (
+    'git',
+    'sync_mirror',
+    'LocalProject',
+)
+
+_FIELD_SEPARATOR, _RECORD_SEPARATOR = '\x1f', '\x1e'
+_LOG_FORMAT = _FIELD_SEPARATOR.join(('%H', '%P', '%an', '%ae', '%cI', '%B')) + _RECORD_SEPARATOR
+
+
+def git(repository: str, *args: str, config: Tuple[str, ...] = (), text: bool = True) -> str | bytes:
+    command = ['git']
+    for option in config:
+        command += ['-c', option]
+    command += ['-C', repository, *args]
+    return subprocess.run(command, check=True, capture_output=True, text=text).stdout
+
+
+def _auth_config(project: Project | None) -> Tuple[str, ...]:
+    """The git options authenticating with the token of the project's client, if any."""
+    gl = getattr(getattr(project, 'manager', None), 'gitlab', None)
+    token = getattr(gl, 'private_token', None)
+    if not token:
+        return ()
+    # the token is sent as a header so that it is never written in the mirror configuration
+    credentials = base64.b64encode(f'oauth2:{token}'.encode()).decode()
+    return (f'http.extraHeader=Authorization: Basic {credentials}',)
+
+
+def sync_mirror(project: Project, mirror_dir: str, clone_url: str | None = None) -> str:
+    """
+    Keep a blobless bare mirror of the project under ``mirror_dir``: cloned on the first call and updated with an
+    incremental fetch afterwards, so reruns only transfer new objects. Returns the path of the mirror.
+    """
+    clone_url = clone_url or project.http_url_to_repo
+    path = os.path.join(mirror_dir, f'{project.id}.git')
+    config = _auth_config(project)
+    if os.path.isdir(path):
+        git(path, 'fetch', '--prune', '--tags', 'origin', '+refs/heads/*:refs/heads/*', config=config)
+    else:
+        os.makedirs(mirror_dir, exist_ok=True)
+        git(mirror_dir, 'clone', '--bare', '--filter=blob:none', clone_url, path, config=config)
+    return path
+
+
+class _CountedList(list):
+    """A list carrying the total number of items, like the pagination headers of a python-gitlab list."""
+
+    def __init__(self, items: List[Any], total: int):
+        super().__init__(items)
+        self.total = total
+
+
+class _LocalListManager:
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def list(self, iterator: bool = False, **kwargs) -> List[Any]:
+        # same keyword handling as python-gitlab: `get_all` pages, an `all` left over is a query parameter
+        get_all = kwargs.pop('get_all', None)
+        if get_all is None:
+            get_all = kwargs.pop('all', None)
+        kwargs.update(kwargs.pop('query_parameters', {}))
+        page, per_page = kwargs.pop('page', 1), kwargs.pop('per_page', 20)
+        kwargs.pop('pagination', None)
+        items = self._loader(**kwargs)
+        if iterator:
+            return _CountedList(items, len(items))
+        if get_all:
+            return items
+        return items[(page - 1) * per_page:page * per_page]
+
+
+class _LocalFile:
+
+    def __init__(self, content: bytes):
+        self._content = content
+
+    def decode(self) -> bytes:
+        return self._content
+
+
+class LocalProject:
+    """
+    A python-gitlab ``Project`` look-alike answering commits, branches, tree, compare and file requests from a local
+    repository (e.g. a mirror kept by ``sync_mirror``), so that every metric function runs unchanged on git objects.
+    Anything else (name, namespace, languages, hooks, ...) is delegated to the ``remote`` project when given.
+    File contents missing from a blobless mirror are fetched on demand with the credentials of the ``remote`` client.
+    """
+
+    def __init__(self, path: str, remote: Project | None = None):
+        self.path = path
+        self.remote = remote
+        self._config = _auth_config(remote)
+        self.commits = _LocalListManager(self._commits)
+        self.branches = _LocalListManager(self._branches)
+        self.files = SimpleNamespace(get=self._file, head=self._file_head)
+        self._commit_lists: Dict[Tuple, List[SimpleNamespace]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        remote = self.__dict__.get('remote')
+        if remote is None:
+            raise AttributeError(name)
+        return getattr(remote, name)
+
+    def _commits(self, all: bool | None = None, ref_name: str | None = None, since: str | None = None,
+                 **kwargs) -> List[SimpleNamespace]:
+        # listed once per filter set and sliced into pages afterwards
+        key = (bool(all), ref_name, since)
+        if key not in self._commit_lists:
+            args = ['log', f'--format={_LOG_FORMAT}']
+            if since:
+                args.append(f'--since={since}')
+            args += ['--all'] if all else [ref_name or 'HEAD']
+            commits = []
+            for record in git(self.path, *args).split(_RECORD_SEPARATOR):
+                record = record.strip('\n')
+                if not record:
+                    continue
+                sha, parents, author_name, author_email, created_at, message = record.split(_FIELD_SEPARATOR)
+                attributes = {
+                    'id': sha,
+                    'parent_ids': parents.split(),
+                    'author_name': author_name,
+                    'author_email': author_email,
+                    'created_at': created_at,
+                    'message': message,
+                }
+                commits.append(SimpleNamespace(attributes=attributes, **attributes))
+            self._commit_lists[key] = commits
+        return self._commit_lists[key]
+
+    def _branches(self, **kwargs) -> List[SimpleNamespace]:
+        output = git(self.path, 'for-each-ref', '--format=%(refname:short) %(objectname)', 'refs/heads/')
+        branches = []
+        for line in output.splitlines():
+            name, sha = line.rsplit(' ', 1)
+            branches.append(SimpleNamespace(name=name, commit={'id': sha}, attributes={'name': name, 'commit': {'id': sha}}))
+        return branches
+
+    def repository_tree(self, path: str = '', ref: str = '', recursive: bool = False, **kwargs) -> List[Dict[str, Any]]:
+        args = ['ls-tree', '-t'] + (['-r'] if recursive else []) + [ref or 'HEAD']
+        if path:
+            args += ['--', f'{path.rstrip("/")}/']
+        entries = []
+        for line in git(self.path, *args).splitlines():
+            info, entry_path = line.split('\t', 1)
+            mode, entry_type, sha = info.split()
+            entries.append({'id': sha, 'name': entry_path.rsplit('/', 1)[-1], 'type': entry_type,
+                            'path': entry_path, 'mode': mode})
+        return entries
+
+    def repository_compare(self, from_: str, to: str, **kwargs) -> Dict[str, Any]:
+        shas = git(self.path, 'rev-list', f'{from_}..{to}').split()
+        return {'commits': [{'id': sha} for sha in shas]}
+
+    def _file(self, file_path: str, ref: str) -> _LocalFile:
+        try:
+            # the blob may be fetched from the remote here, hence the credentials
+            content = git(self.path, 'show', f'{ref}:{file_path}', config=self._config, text=False)
+        except subprocess.CalledProcessError as e:
+            # reported like the API would, so that callers handling GitlabError skip the file
+            raise GitlabGetError(e.stderr.decode(errors='replace').strip(), response_code=404) from e
+        return _LocalFile(content)
+
+    def _file_head(self, file_path: str, ref: str) -> Dict[str, str]:
+        result = subprocess.run(['git', '-C', self.path, 'rev-parse', '--verify', '-q', f'{ref}:{file_path}'],
+                                capture_output=True, text=True)
+        if result.returncode:
+            raise GitlabHeadError('404 File Not Found', response_code=404)
+        return {'X-Gitlab-Blob-Id': result.stdout.strip()}
@@ -0,0 +1,160 @@
+from functools import cached_property
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from crawler.branches import count_commits_by_branch
+from crawler.ci import EMPTY_CI_SUMMARY
+from crawler.snapshot import CommitSnapshot
+
+__all__ = (
+    'RESOURCES',
+    'ProjectResources',
+    'Metric',
+    'METRICS',
+    'KEY_COLUMNS',
+    'PRESETS',
+    'register_metric',
+    'select_metrics',
+    'required_resources',
+    'resource_versions',
+    'build_row',
+)
+
+# what the metrics are computed from, besides the project attributes: each one costs its own API requests
+RESOURCES = ('commits', 'branches', 'tree', 'languages', 'hooks', 'ci')
+
+
+@dataclass
+class ProjectResources:
+    """
+    Everything fetched for a project, shared by all its metrics. Only the resources some selected metric requires
+    are fetched; the others keep their empty defaults.
+    """
+    project: Dict[str, Any]
+    snapshot: CommitSnapshot = field(default_factory=CommitSnapshot)
+    markers: Dict[str, bool] = field(default_factory=dict)
+    languages: Dict[str, float] = field(default_factory=dict)
+    num_hooks: int = 0
+    ci: Dict[str, Any] = field(default_factory=lambda: dict(EMPTY_CI_SUMMARY))
+
+    @cached_property
+    def num_commit_per_branch(self) -> Dict[str, int]:
+        return count_commits_by_branch(self.snapshot)
+
+    @property
+    def most_committed_branch(self) -> str:
+        return max(self.num_commit_per_branch, key=self.num_commit_per_branch.get)
+
+    def marker(self, name: str) -> str:
+        return 'yes' if self.markers[name] else 'no'
+
+
+@dataclass(frozen=True)
+class Metric:
+    column: str
+    requires: FrozenSet[str]
+    compute: Callable[[ProjectResources], Any]
+
+
+METRICS: Dict[str, Metric] = {}
+
+
+def register_metric(column: str, requires: Iterable[str] = ()) -> Callable:
+    """
+    Register the decorated function as the metric computing ``column`` from the ``requires`` resources (see
+    ``RESOURCES``). Registering an existing column replaces its metric and keeps its place in the report.
+    """
+    requires = frozenset(requires)
+    unknown = requires - set(RESOURCES)
+    if unknown:
+        raise ValueError(f'Unknown resources {sorted(unknown)} for metric {column!r}')
+
+    def register(compute: Callable[[ProjectResources], Any]) -> Callable[[ProjectResources], Any]:
+        METRICS[column] = Metric(column, requires, compute)
+        return compute
+
+    return register
+
+
+register_metric('Project ID')(lambda resources: resources.project['id'])
+register_metric('Name')(lambda resources: resources.project['name'])
+register_metric('Group Name')(lambda resources: resources.project['namespace']['name'])
+register_metric('Link')(lambda resources: resources.project['web_url'])
+register_metric('Creation Date')(lambda resources: resources.project['created_at'].split('T')[0])
+register_metric('Last Commit Date')(lambda resources: resources.project['last_activity_at'].split('T')[0])
+register_metric('Number of Commits', requires=['commits'])(lambda resources: resources.snapshot.total_commits)
+register_metric('Number of Branches', requires=['branches'])(lambda resources: len(resources.snapshot.branches))
+register_metric('Commits per Branch', requires=['commits', 'branches'])(
+    lambda resources: resources.num_commit_per_branch)
+register_metric('Conventional Commits Status', requires=['commits'])(
+    lambda resources: resources.snapshot.conventional_commit_percentage())
+register_metric('Default Branch')(lambda resources: resources.project['default_branch'])
+register_metric('Most Committed Branch', requires=['commits', 'branches'])(
+    lambda resources: resources.most_committed_branch)
+register_metric('Main Developers', requires=['commits'])(lambda resources: resources.snapshot.developer_counts())
+register_metric('Has Docker', requires=['tree'])(lambda resources: resources.marker('docker'))
+register_metric('Has docker-compose', requires=['tree'])(lambda resources: resources.marker('docker-compose'))
+register_metric('Languages', requires=['languages'])(lambda resources: resources.languages)
+register_metric('Has CI / CD', requires=['tree'])(lambda resources: resources.marker('ci'))
+register_metric('Has Docker compose', requires=['tree'])(lambda resources: resources.marker('root-docker-compose'))
+register_metric('Has Tests', requires=['tree'])(lambda resources: resources.marker('tests'))
+register_metric('Number of connected CI/CD Servers', requires=['hooks'])(lambda resources: resources.num_hooks)
+register_metric('CI Stages', requires=['ci'])(lambda resources: resources.ci['stages'])
+register_metric('CI Jobs', requires=['ci'])(lambda resources: resources.ci['jobs'])
+register_metric('CI Images', requires=['ci'])(lambda resources: resources.ci['images'])
+# not computed yet: register a metric for this column to fill it
+register_metric('Technologies')(lambda resources: '')
+
+# always part of the report: the report is resumed by project id and split into sheets by group
+KEY_COLUMNS = ('Project ID', 'Name', 'Group Name')
+
+PRESETS: Dict[str, List[str]] = {
+    'inventory': ['Link', 'Creation Date', 'Last Commit Date', 'Default Branch', 'Has Docker', 'Has docker-compose',
+                  'Has CI / CD', 'Has Docker compose', 'Has Tests'],
+}
+
+
+def select_metrics(selection: str | Iterable[str] = '') -> List[Metric]:
+    """
+    The metrics of a ``--metrics`` selection: comma separated column names (case-insensitive) or preset names
+    (see ``PRESETS``), in report order. An empty selection (or ``all``) selects every metric.
+    """
+    if isinstance(selection, str):
+        selection = [name.strip() for name in selection.split(',') if name.strip()]
+    selection = list(selection)
+    if not selection or any(name.lower() == 'all' for name in selection):
+        return list(METRICS.values())
+    columns = {column.lower(): column for column in METRICS}
+    selected: Set[str] = set(KEY_COLUMNS)
+    for name in selection:
+        if name.lower() in PRESETS:
+            selected.update(PRESETS[name.lower()])
+        elif name.lower() in columns:
+            selected.add(columns[name.lower()])
+        else:
+            raise ValueError(f'Unknown metric {name!r}, expected one of {list(METRICS) + list(PRESETS)}')
+    return [metric for column, metric in METRICS.items() if column in selected]
+
+
+def required_resources(metrics: Iterable[Metric]) -> Set[str]:
+    return set().union(*(metric.requires for metric in metrics))
+
+
+def resource_versions(resources: ProjectResources, required: Set[str]) -> Tuple[str, str, str]:
+    """
+    The ref whose tree is scanned for markers, and the versions the markers and the languages are cached under. The
+    tree is the one of the most committed branch when the history is fetched anyway, of the default branch otherwise.
+    """
+    project = resources.project
+    tree_ref = project['default_branch']
+    if 'tree' in required and {'commits', 'branches'} <= required:
+        tree_ref = resources.most_committed_branch
+    branch_tips = {branch['name']: branch['commit_id'] for branch in resources.snapshot.branches}
+    # without the branches, any push to the project changes its last activity
+    return (tree_ref, branch_tips.get(tree_ref) or project['last_activity_at'],
+            branch_tips.get(project['default_branch']) or project['last_activity_at'])
+
+
+def build_row(metrics: Iterable[Metric], resources: ProjectResources) -> Dict[str, Any]:
+    """The report row of a project, with one column per metric."""
+    return {metric.column: metric.compute(resources) for metric in metrics}
@@ -0,0 +1,83 @@
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import gitlab
+
+from crawler.http_cache import install_http_cache
+from crawler.profiler import install_profiler
+
+__all__ = (
+    'BACKENDS',
+    'ClientSettings',
+    'create_client',
+    'init_worker',
+    'worker_client',
+    'open_worker_pool',
+)
+
+# the process and thread backends run in a worker pool, the async one in a single event loop
+BACKENDS = ('process', 'thread', 'async')
+
+_worker = threading.local()
+
+
+@dataclass(frozen=True)
+class ClientSettings:
+    """Everything a worker needs to build its own GitLab client: small and cheap to send to a process."""
+    gitlab_url: str
+    private_token: str
+    http_cache_path: str = ''
+    http_cache_max_bytes: int = 256 * 2 ** 20
+    profile_dir: str = ''
+
+    @classmethod
+    def from_settings(cls, settings) -> 'ClientSettings':
+        return cls(
+            gitlab_url=settings.gitlab_url,
+            private_token=settings.access_token,
+            http_cache_path=settings.http_cache_path,
+            http_cache_max_bytes=settings.http_cache_size_mb * 2 ** 20,
+            profile_dir=settings.profile_dir,
+        )
+
+
+def create_client(client_settings: ClientSettings, reset_profile: bool = False) -> gitlab.Gitlab:
+    """
+    A ``gitlab.Gitlab`` client with the HTTP cache and the profiler installed. Its session keeps its connections
+    alive, so every request after the first one to a host skips the TCP and TLS handshakes.
+    """
+    gl = gitlab.Gitlab(client_settings.gitlab_url, private_token=client_settings.private_token)
+    if client_settings.http_cache_path:
+        install_http_cache(gl, client_settings.http_cache_path, max_bytes=client_settings.http_cache_max_bytes)
+    if client_settings.profile_dir:
+        install_profiler(gl, client_settings.profile_dir, reset=reset_profile)
+    return gl
+
+
+def init_worker(client_settings: ClientSettings):
+    """Pool initializer: the client of the worker, reused by every task it runs."""
+    _worker.client = create_client(client_settings)
+
+
+def worker_client() -> gitlab.Gitlab:
+    client = getattr(_worker, 'client', None)
+    if client is None:
+        raise RuntimeError('worker_client() is only available in the workers of open_worker_pool()')
+    return client
+
+
+def open_worker_pool(backend: str, client_settings: ClientSettings, max_workers: int = 8) -> Executor:
+    """
+    A pool of ``max_workers`` processes or threads, each holding one long-lived client (see ``worker_client``), so
+    that tasks only carry project attributes instead of pickled ``Project`` objects with their client and session.
+    """
+    if backend == 'process':
+        # spawned rather than forked: the workers must not inherit the open SQLite connections (HTTP and project
+        # caches) of the main process, and their client only needs the settings anyway
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_worker, initargs=(client_settings,))
+    if backend == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(client_settings,))
+    raise ValueError(f'Unknown worker pool backend {backend!r}, expected one of {BACKENDS[:2]}')
@@ -0,0 +1,185 @@
+import os
+import re
+import glob
+import json
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from utils.basic_logger import simple_logger
+
+__all__ = (
+    'endpoint_template',
+    'metric',
+    'project_scope',
+    'CallRecorder',
+    'install_profiler',
+    'load_calls',
+    'summarize_calls',
+    'write_chrome_trace',
+    'report_profile',
+)
+
+logger = simple_logger(__name__)
+
+_project: ContextVar[str] = ContextVar('project', default='')
+_metric: ContextVar[str] = ContextVar('metric', default='')
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_TEMPLATE_RULES = (
+    (re.compile(r'/repository/files/[^/]+'), '/repository/files/:file'),
+    (re.compile(r'/(projects|groups|users|hooks)/[^/]+'), r'/\1/:id'),
+    (re.compile(r'/[0-9a-f]{40}(?=/|$)'), '/:sha'),
+)
+
+
+def endpoint_template(path: str) -> str:
+    """The endpoint of a path or URL, e.g. ``/projects/:id/repository/files/:file``, with ids and names replaced."""
+    path = urlsplit(path).path
+    path = path.split('/api/v4', 1)[-1]
+    for pattern, replacement in _TEMPLATE_RULES:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+@contextmanager
+def metric(name: str) -> Iterator[None]:
+    """Attribute the API calls made inside (also usable as a decorator) to the metric ``name``."""
+    token = _metric.set(name)
+    try:
+        yield
+    finally:
+        _metric.reset(token)
+
+
+@contextmanager
+def project_scope(name: str) -> Iterator[None]:
+    """Attribute the API calls made inside to the project ``name``."""
+    token = _project.set(name)
+    try:
+        yield
+    finally:
+        _project.reset(token)
+
+
+class CallRecorder:
+    """
+    Records every GitLab API call, with the project and metric it was made for, as one JSON line in a file of
+    ``profile_dir`` per process, so that calls made in worker processes are collected as well. Works as a
+    ``requests`` response hook and is called directly by the async client.
+    """
+
+    def __init__(self, profile_dir: str):
+        self.profile_dir = profile_dir
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'profile_dir': self.profile_dir}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(state['profile_dir'])
+
+    def record(self, method: str, url: str, status: int, num_bytes: int, start: float, duration: float,
+               cache: str = ''):
+        call = {
+            'project': _project.get(),
+            'metric': _metric.get(),
+            'method': method,
+            'endpoint': endpoint_template(url),
+            'status': status,
+            'bytes': num_bytes,
+            'start': start,
+            'duration': duration,
+            'retry': status in RETRY_STATUSES,
+            'cache': cache,
+            'pid': os.getpid(),
+            'thread': threading.get_ident(),
+        }
+        with self._lock:
+            if self._file is None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                self._file = open(os.path.join(self.profile_dir, f'calls-{os.getpid()}.jsonl'), 'a', encoding='utf-8')
+            self._file.write(json.dumps(call) + '\n')
+            self._file.flush()
+
+    def __call__(self, response, *args, **kwargs):
+        duration = response.elapsed.total_seconds()
+        self.record(response.request.method, response.request.url, response.status_code, len(response.content),
+                    time.time() - duration, duration, cache=response.headers.get('X-Cache', ''))
+        return response
+
+
+def install_profiler(gl, profile_dir: str, reset: bool = True) -> CallRecorder:
+    """Record the calls of the ``gitlab.Gitlab`` client ``gl``, dropping the calls of a previous run if ``reset``."""
+    for path in glob.glob(os.path.join(profile_dir, 'calls-*.jsonl')) if reset else ():
+        os.remove(path)
+    recorder = CallRecorder(profile_dir)
+    gl.session.hooks['response'].append(recorder)
+    return recorder
+
+
+def load_calls(profile_dir: str) -> pd.DataFrame:
+    rows = []
+    for path in sorted(glob.glob(os.path.join(profile_dir, 'calls-*.jsonl'))):
+        with open(path, encoding='utf-8') as file:
+            rows.extend(json.loads(line) for line in file if line.strip())
+    calls = pd.DataFrame(rows, columns=['project', 'metric', 'method', 'endpoint', 'status', 'bytes', 'start',
+                                        'duration', 'retry', 'cache', 'pid', 'thread'])
+    calls['metric'] = calls['metric'].replace('', '(other)')
+    return calls
+
+
+def _breakdown(calls: pd.DataFrame, by: str) -> pd.DataFrame:
+    table = calls.groupby(by).agg(
+        calls=('duration', 'size'),
+        retries=('retry', 'sum'),
+        bytes=('bytes', 'sum'),
+        seconds=('duration', 'sum'),
+        mean_ms=('duration', 'mean'),
+        p95_ms=('duration', lambda durations: durations.quantile(0.95)),
+    )
+    table[['mean_ms', 'p95_ms']] *= 1000
+    table['share_of_calls'] = table['calls'] / table['calls'].sum()
+    table['share_of_time'] = table['seconds'] / table['seconds'].sum()
+    return table.sort_values('seconds', ascending=False)
+
+
+def summarize_calls(calls: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """The calls broken down by endpoint template, by metric and by project, most time consuming first."""
+    return {by: _breakdown(calls, by) for by in ('endpoint', 'metric', 'project')}
+
+
+def write_chrome_trace(calls: pd.DataFrame, trace_path: str):
+    """Write the calls as a Chrome trace (``chrome://tracing``, Perfetto): one lane per process and thread."""
+    events = [
+        {
+            'name': call.endpoint,
+            'cat': call.metric,
+            'ph': 'X',
+            'ts': call.start * 1e6,
+            'dur': call.duration * 1e6,
+            'pid': call.pid,
+            'tid': call.thread,
+            'args': {'project': call.project, 'status': call.status, 'bytes': call.bytes, 'cache': call.cache},
+        }
+        for call in calls.itertuples()
+    ]
+    with open(trace_path, 'w', encoding='utf-8') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+def report_profile(profile_dir: str, top: int = 10):
+    """Log the summary tables of the calls recorded in ``profile_dir`` and write ``trace.json`` next to them."""
+    calls = load_calls(profile_dir)
+    if calls.empty:
+        return
+    for by, table in summarize_calls(calls).items():
+        logger.info(f'API calls by {by}:\n{table.head(top).to_string(float_format="{:.2f}".format)}')
+    write_chrome_trace(calls, os.path.join(profile_dir, 'trace.json'))
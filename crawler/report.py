@@ -0,0 +1,186 @@
+import os
+import json
+import glob
+from typing import Any, Dict, Iterator, List, Set
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+__all__ = (
+    'REPORT_SCHEMA',
+    'ReportSink',
+    'JsonlSink',
+    'ParquetSink',
+    'open_report_sink',
+    'read_report',
+    'export_excel',
+)
+
+REPORT_SCHEMA = pa.schema([
+    ('Project ID', pa.int64()),
+    ('Name', pa.string()),
+    ('Group Name', pa.string()),
+    ('Link', pa.string()),
+    ('Creation Date', pa.string()),
+    ('Last Commit Date', pa.string()),
+    ('Number of Commits', pa.int64()),
+    ('Number of Branches', pa.int64()),
+    ('Commits per Branch', pa.map_(pa.string(), pa.int64())),
+    ('Conventional Commits Status', pa.map_(pa.string(), pa.float64())),
+    ('Default Branch', pa.string()),
+    ('Most Committed Branch', pa.string()),
+    ('Main Developers', pa.map_(pa.string(), pa.int64())),
+    ('Has Docker', pa.string()),
+    ('Has docker-compose', pa.string()),
+    ('Languages', pa.map_(pa.string(), pa.float64())),
+    ('Has CI / CD', pa.string()),
+    ('Has Docker compose', pa.string()),
+    ('Has Tests', pa.string()),
+    ('Number of connected CI/CD Servers', pa.int64()),
+    ('CI Stages', pa.list_(pa.string())),
+    ('CI Jobs', pa.int64()),
+    ('CI Images', pa.list_(pa.string())),
+    ('Technologies', pa.string()),
+])
+
+
+class ReportSink:
+    """
+    Destination of the report rows, written project by project as soon as each one is crawled, so memory does not
+    grow with the number of projects and a crash keeps what was written. With ``resume`` the rows already written
+    are kept and ``done_project_ids`` tells which projects can be skipped; otherwise the report starts empty.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.resume = resume
+
+    def __enter__(self) -> 'ReportSink':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def done_project_ids(self) -> Set[int]:
+        raise NotImplementedError
+
+    def write(self, project_data: Dict[str, Any]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonlSink(ReportSink):
+    """One JSON object per line, flushed after every row; nested fields stay JSON objects."""
+
+    def __init__(self, path: str, resume: bool = False):
+        super().__init__(path, resume)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def done_project_ids(self) -> Set[int]:
+        return {row['Project ID'] for row in _read_jsonl(self.path) if row.get('Project ID') is not None}
+
+    def write(self, project_data: Dict[str, Any]):
+        self._file.write(json.dumps(project_data) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink(ReportSink):
+    """
+    A directory of Parquet part files with ``REPORT_SCHEMA``: nested fields are typed maps instead of strings.
+    Rows are buffered and a new part file is written every ``batch_size`` rows.
+    """
+
+    def __init__(self, path: str, resume: bool = False, batch_size: int = 100):
+        super().__init__(path, resume)
+        self.batch_size = batch_size
+        self._rows: List[Dict[str, Any]] = []
+        os.makedirs(path, exist_ok=True)
+        if not resume:
+            for part in self._parts():
+                os.remove(part)
+        self._next_part = len(self._parts())
+
+    def _parts(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def done_project_ids(self) -> Set[int]:
+        return {
+            project_id
+            for part in self._parts()
+            for project_id in pq.read_table(part, columns=['Project ID']).column('Project ID').to_pylist()
+            if project_id is not None
+        }
+
+    def write(self, project_data: Dict[str, Any]):
+        self._rows.append(project_data)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        # only the selected metrics (see crawler.metrics) are written; columns of other metrics get an inferred type
+        columns = list(self._rows[0])
+        schema = pa.schema([REPORT_SCHEMA.field(column) for column in columns if column in REPORT_SCHEMA.names])
+        table = pa.Table.from_pylist(self._rows, schema=schema)
+        for column in columns:
+            if column not in REPORT_SCHEMA.names:
+                table = table.append_column(column, pa.array([row.get(column) for row in self._rows]))
+        part = os.path.join(self.path, f'part-{self._next_part:05d}.parquet')
+        # written under a temporary name first, so a crash never leaves a truncated part behind
+        pq.write_table(table, f'{part}.tmp')
+        os.replace(f'{part}.tmp', part)
+        self._next_part += 1
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def open_report_sink(path: str, resume: bool = False) -> ReportSink:
+    """A JSONL sink for ``.jsonl`` paths, a Parquet dataset directory otherwise."""
+    if path.endswith('.jsonl'):
+        return JsonlSink(path, resume=resume)
+    return ParquetSink(path, resume=resume)
+
+
+def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_report(path: str) -> pd.DataFrame:
+    """Load a report written by a sink, with nested fields as dicts."""
+    if path.endswith('.jsonl'):
+        return pd.DataFrame(list(_read_jsonl(path)))
+    parts = sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+    if not parts:
+        return pd.DataFrame(columns=REPORT_SCHEMA.names)
+    tables = [pq.read_table(part) for part in parts]
+    return pa.concat_tables(tables, promote_options='default').to_pandas(maps_as_pydicts='strict')
+
+
+def _excel_cell(value: Any) -> Any:
+    # list fields (read back from Parquet as arrays) are written as comma-separated values
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return ', '.join(map(str, value))
+    return value
+
+
+def export_excel(report: pd.DataFrame, excel_path: str):
+    """The original workbook: one sheet per group."""
+    report = report.map(_excel_cell)
+    with pd.ExcelWriter(excel_path) as writer:
+        for sheet_name, records in report.groupby('Group Name', sort=False):
+            records.to_excel(writer, sheet_name=sheet_name, index=False)
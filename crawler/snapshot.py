@@ -0,0 +1,93 @@
+from datetime import datetime
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List
+
+import pandas as pd
+from gitlab.v4.objects.projects import Project
+
+from crawler.conventional import conventional_commit_stats
+
+__all__ = (
+    'PER_PAGE',
+    'COMMIT_FIELDS',
+    'iter_pages',
+    'parse_commit_date',
+    'CommitSnapshot',
+)
+
+PER_PAGE = 100
+COMMIT_FIELDS = ('id', 'parent_ids', 'author_name', 'author_email', 'created_at', 'message')
+
+
+def iter_pages(list_method: Callable[..., List[Any]], per_page: int = PER_PAGE, **kwargs) -> Iterator[List[Any]]:
+    """
+    Yield the result of a python-gitlab ``list`` call one page (one API request) at a time.
+
+    ``get_all=False`` is passed explicitly so that an ``all`` keyword is sent to the server as a
+    query parameter (e.g. every ref for the commits endpoint) instead of being read as "get all pages".
+    """
+    page = 1
+    while True:
+        items = list_method(get_all=False, page=page, per_page=per_page, **kwargs)
+        yield items
+        if len(items) < per_page:
+            return
+        page += 1
+
+
+def parse_commit_date(created_at: str) -> datetime:
+    return datetime.strptime(created_at.split('T')[0], '%Y-%m-%d')
+
+
+@dataclass
+class CommitSnapshot:
+    """
+    The commit history (of every ref) and the branches of a project, fetched once and shared by all
+    the per-project metrics. Commits and branches are kept as plain dicts so a snapshot can be pickled.
+    """
+    commits: List[Dict[str, Any]] = field(default_factory=list)
+    branches: List[Dict[str, Any]] = field(default_factory=list)
+    pages_fetched: int = 0
+
+    @classmethod
+    def fetch(cls, project: Project, with_branches: bool = True, since: str | None = None,
+              per_page: int = PER_PAGE, with_commits: bool = True, ref_name: str | None = None) -> 'CommitSnapshot':
+        """The commits of every ref (of ``ref_name`` only, if given), optionally ``since`` a date, and the branches."""
+        snapshot = cls()
+        filters = {'since': since} if since else {}
+        filters.update({'ref_name': ref_name} if ref_name else {'all': True})
+        if with_commits:
+            for page in iter_pages(project.commits.list, per_page=per_page, **filters):
+                snapshot.commits.extend({key: commit.attributes.get(key) for key in COMMIT_FIELDS} for commit in page)
+                snapshot.pages_fetched += 1
+        if with_branches:
+            for page in iter_pages(project.branches.list, per_page=per_page):
+                snapshot.branches.extend({'name': branch.name, 'commit_id': branch.commit['id']} for branch in page)
+                snapshot.pages_fetched += 1
+        return snapshot
+
+    @property
+    def total_commits(self) -> int:
+        return len(self.commits)
+
+    @property
+    def branch_names(self) -> List[str]:
+        return [branch['name'] for branch in self.branches]
+
+    def branches_without_history(self) -> List[str]:
+        """The branches whose tip is not among the commits, e.g. pushed with commits older than an incremental fetch."""
+        commit_ids = {commit['id'] for commit in self.commits}
+        return [branch['name'] for branch in self.branches if branch['commit_id'] not in commit_ids]
+
+    def developer_counts(self) -> Dict[str, int]:
+        return dict(Counter(commit['author_email'].split('@')[0] for commit in self.commits))
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.commits, columns=list(COMMIT_FIELDS))
+
+    def conventional_commit_stats(self) -> pd.DataFrame:
+        return conventional_commit_stats(self.to_frame())
+
+    def conventional_commit_percentage(self) -> Dict[str, float]:
+        return self.conventional_commit_stats()['percentage'].to_dict()
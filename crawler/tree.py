@@ -0,0 +1,155 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+from gitlab.exceptions import GitlabHeadError
+from gitlab.v4.objects.projects import Project
+
+from crawler.snapshot import PER_PAGE
+
+__all__ = (
+    'MarkerRule',
+    'MARKERS',
+    'iter_tree',
+    'iter_file_paths',
+    'MarkerScan',
+    'probe_file',
+    'scan_tree_markers',
+)
+
+
+@dataclass(frozen=True)
+class MarkerRule:
+    """
+    A tree contains the marker when it has an entry of type ``kind`` (``blob`` or ``tree``) whose path, or name
+    when the rule matches ``anywhere``, matches one of the glob ``patterns``. ``probes`` are root paths whose
+    existence, checked with a HEAD request on the files API, proves the marker is there; a root rule made of plain
+    case-sensitive paths is probed on these paths, and then decided without walking the tree.
+    """
+    patterns: Tuple[str, ...]
+    kind: str = 'blob'
+    anywhere: bool = False
+    ignore_case: bool = False
+    probes: Tuple[str, ...] = ()
+
+    @property
+    def exact(self) -> bool:
+        """Whether the probes alone decide the rule, present or absent."""
+        return (self.kind == 'blob' and not self.anywhere and not self.ignore_case
+                and not any(char in pattern for pattern in self.patterns for char in '*?'))
+
+    @property
+    def probe_paths(self) -> Tuple[str, ...]:
+        return self.patterns if self.exact else self.probes
+
+    def regex(self) -> str:
+        globs = '|'.join(re.escape(pattern).replace(r'\*', '[^/]*').replace(r'\?', '[^/]')
+                         for pattern in self.patterns)
+        path = f'(?i:{globs})' if self.ignore_case else f'(?:{globs})'
+        return f'{self.kind}:{"(?:[^/]*/)*" if self.anywhere else ""}{path}$'
+
+
+# what the report looks for in a file tree, by name
+MARKERS: Dict[str, MarkerRule] = {
+    'docker': MarkerRule(('*dockerfile*',), anywhere=True, ignore_case=True, probes=('Dockerfile',)),
+    'docker-compose': MarkerRule(('*docker-compose*',), anywhere=True, probes=('docker-compose.yml',)),
+    'ci': MarkerRule(('.gitlab-ci.yml',)),
+    'root-docker-compose': MarkerRule(('docker-compose.yml',)),
+    'tests': MarkerRule(('test', 'tests'), kind='tree', anywhere=True, ignore_case=True),
+}
+
+
+def iter_tree(project: Project, ref: str, path: str = '', recursive: bool = True) -> Iterator[Dict[str, Any]]:
+    """Stream the entries of the repository tree, fetched page by page with keyset pagination."""
+    yield from project.repository_tree(path=path, ref=ref, recursive=recursive, iterator=True,
+                                       pagination='keyset', per_page=PER_PAGE)
+
+
+def iter_file_paths(project: Project, ref: str, path: str = '') -> Iterator[str]:
+    for entry in iter_tree(project, ref, path):
+        if entry['type'] == 'blob':
+            yield entry['path']
+
+
+class MarkerScan:
+    """
+    Decides the markers of a tree from probes and a stream of tree entries, which are matched against every rule at
+    once by a single compiled pattern, and tells when every marker is decided so the walk can stop.
+    """
+
+    def __init__(self, markers: Dict[str, MarkerRule] = MARKERS):
+        self.markers = markers
+        self.found = {name: False for name in markers}
+        self.pending: Set[str] = set(markers)
+        self._missing: Set[str] = set()
+        # one optional lookahead per rule: the groups of a match are the rules an entry matches
+        self._names = list(markers)
+        self._matcher = re.compile(''.join(f'(?=({rule.regex()}))?' for rule in markers.values()))
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+    def probe_paths(self) -> List[str]:
+        """The root paths worth a HEAD request: those that can still decide a pending marker."""
+        paths = {path: None for name in self.markers if name in self.pending
+                 for path in self.markers[name].probe_paths}
+        return list(paths)
+
+    def probed(self, path: str, exists: bool):
+        """Record the answer of a probe on ``path``."""
+        if not exists:
+            self._missing.add(path)
+        for name in list(self.pending):
+            rule = self.markers[name]
+            if exists and path in rule.probe_paths:
+                self.found[name] = True
+                self.pending.discard(name)
+            elif not exists and rule.exact and set(rule.patterns) <= self._missing:
+                self.pending.discard(name)
+
+    def feed(self, entries: Iterable[Dict[str, Any]]) -> bool:
+        """Check ``entries`` against the pending markers, and return whether every marker is decided."""
+        for entry in entries:
+            if self.done:
+                break
+            match = self._matcher.match(f'{entry["type"]}:{entry["path"]}')
+            for name, group in zip(self._names, match.groups()):
+                if group is not None and name in self.pending:
+                    self.found[name] = True
+                    self.pending.discard(name)
+        return self.done
+
+    def finish(self) -> Dict[str, bool]:
+        """The markers once the whole tree was fed: the ones not found are absent."""
+        self.pending.clear()
+        return self.found
+
+
+def probe_file(project: Project, path: str, ref: str) -> bool | None:
+    """Whether the file exists at ``ref``, or None when the files API cannot tell."""
+    try:
+        project.files.head(path, ref=ref)
+        return True
+    except GitlabHeadError as e:
+        return False if e.response_code == 404 else None
+
+
+def scan_tree_markers(project: Project, ref: str, probe: bool = True, markers: Dict[str, MarkerRule] = MARKERS,
+                      probes: Dict[str, bool] | None = None) -> Dict[str, bool]:
+    """
+    The markers of the tree of ``ref``: decided by probing known root paths first, then by one streaming walk of the
+    tree that stops as soon as every remaining marker is found. ``probes`` are answers already known at ``ref``
+    (path to whether it exists, e.g. from GraphQL), which need no request.
+    """
+    scan = MarkerScan(markers)
+    probes = probes or {}
+    for path in scan.probe_paths() if probe else ():
+        exists = probes[path] if path in probes else probe_file(project, path, ref)
+        if exists is not None:
+            scan.probed(path, exists)
+    if not scan.done:
+        for entry in iter_tree(project, ref):
+            if scan.feed([entry]):
+                break
+    return scan.finish()
@@ -1,156 +1,247 @@
-import re
-import yaml
-import gitlab
-import pandas as pd
-from tqdm import tqdm
-from typing import List, Dict
-from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed, ProcessPoolExecutor
+import os
+import queue
+import threading
+
+from typing import Callable, Dict, Iterable, Iterator, List, Set
+from concurrent.futures import Future
 
 from gitlab.v4.objects.projects import Project
 
 from config import Settings
+from crawler.snapshot import CommitSnapshot
+from crawler.cache import ProjectCache, fetch_incremental_snapshot
+from crawler.async_crawl import run_crawl
+from crawler.discovery import ProjectFilter, iter_projects, with_projects_metadata
+from crawler.local_git import LocalProject, sync_mirror
+from crawler.tree import MARKERS, iter_file_paths, scan_tree_markers
+from crawler.branches import count_commits_by_branch, count_commits_by_branch_cheap
+from crawler.ci import CI_CONFIG_PATH, CiFile, fetch_ci_summary
+from crawler.metrics import ProjectResources, build_row, required_resources, resource_versions, select_metrics
+from crawler.facts import build_rollups, write_commit_facts
+from crawler.commit_index import build_commit_index
+from crawler.http_cache import HttpCache
+from crawler.pool import BACKENDS, ClientSettings, create_client, open_worker_pool, worker_client
+from crawler.profiler import metric, project_scope, report_profile
+from crawler.report import export_excel, open_report_sink, read_report
 from utils.basic_logger import simple_logger
 
 logger = simple_logger(__name__)
 
 
 def get_project_file_paths(project: Project, branch_name: str, path: str = '') -> List[str]:
-    file_paths = []
-    items = project.repository_tree(path=path, all=True, recursive=False, ref=branch_name)
-    for item in items:
-        if item['type'] == 'blob':  # 'blob' indicates a file
-            file_paths.append(item['path'])
-        elif item['type'] == 'tree':  # 'tree' indicates a directory
-            file_paths.extend(get_project_file_paths(project, branch_name, item['path']))
-    return file_paths
-
-
-def is_conventional_commit(message: str) -> bool:
-    pattern = r'^(feat|fix|docs|style|refactor|perf|test|build|ci|chore|revert)(\(\S+\))?: .{1,}'
-    return re.match(pattern, message) is not None
+    return list(iter_file_paths(project, branch_name, path))
 
 
 # Function to calculate the percentage of conventional commits by each user for a given project
-def calculate_conventional_commit_percentage(project: Project) -> Dict[str, float]:
-    # Get commits from the project
-    commits = project.commits.list(all=True)
-
-    # Initialize dictionaries to store counts
-    total_commits_by_user = {}
-    conventional_commits_by_user = {}
-
-    # Check each commit message and count
-    for commit in commits:
-        author = commit.author_name
-        total_commits_by_user[author] = total_commits_by_user.get(author, 0) + 1
-        if is_conventional_commit(commit.message):
-            conventional_commits_by_user[author] = conventional_commits_by_user.get(author, 0) + 1
-
-    # Calculate percentages
-    percentage_conventional_by_user = {}
-    for user, total_commits in total_commits_by_user.items():
-        conventional_commits = conventional_commits_by_user.get(user, 0)
-        percentage = (conventional_commits / total_commits) * 100
-        percentage_conventional_by_user[user] = percentage
-
-    return percentage_conventional_by_user
-
-
-def get_num_commits_by_branch(project: Project) -> Dict[str, int]:
-    branches_commits = {}
-    branches = project.branches.list(all=True)
-    for branch in branches:
-        commits = project.commits.list(all=True, query_parameters={'ref_name': branch.name})
-        branches_commits[branch.name] = len(commits)
-    return branches_commits
-
-
-def get_ci_cd_stages(project: Project, branch_name='main') -> List[str] | None:
-    try:
-        # Get the file content
-        file_content = project.files.get(file_path='.gitlab-ci.yml', ref=branch_name)
-        # Decode the file content
-        file_data = yaml.safe_load(file_content.decode())
-        # Return the list of stages
-        return file_data.get('stages', [])
-    except Exception as e:
-        print(f"Error getting CI/CD stages: {e}")
-        return None
-
-
-def has_tests(project: Project) -> bool:
-    items = project.repository_tree(all=True)
-    for item in items:
-        if item['type'] == 'tree' and item['name'].lower() == 'tests':
-            return True
-    return False
-
-
-def process_project(project: Project) -> Dict[str, str] | None:
-    try:
-        main_developers = dict(Counter([x.author_email.split('@')[0] for x in project.commits.list(get_all=True, all=True)]))
-        num_commit_per_branch = get_num_commits_by_branch(project)
-        most_committed_branch = max(num_commit_per_branch, key=num_commit_per_branch.get)
-        project_files = get_project_file_paths(project, branch_name=most_committed_branch)
-        project_data = {
-            'Name': project.name,
-            'Group Name': project.namespace['name'],
-            'Link': project.web_url,
-            'Creation Date': project.created_at.split('T')[0],
-            'Last Commit Date': project.last_activity_at.split('T')[0],
-            'Number of Commits': len(project.commits.list(get_all=True, all=True)),
-            'Number of Branches': len(project.branches.list(get_all=True, all=True)),
-            'Commits per Branch': num_commit_per_branch,
-            'Conventional Commits Status': calculate_conventional_commit_percentage(project),
-            'Default Branch': project.default_branch,
-            'Most Committed Branch': most_committed_branch,
-            'Main Developers': main_developers,
-            'Has Docker': 'yes' if sum([1 for file in project_files if 'dockerfile' in file]) else 'no',
-            'Has docker-compose': 'yes' if sum([1 for file in project_files if 'docker-compose' in file]) else 'no',
-            'Languages': get_language_percentages(project),
-            'Has CI / CD': 'yes' if '.gitlab-ci.yml' in project_files else 'no',
-            'Has Docker compose': 'yes' if 'docker-compose.yml' in project_files else 'no',
-            'Has Tests': 'yes' if has_tests(project) else 'no',
-            'Number of connected CI/CD Servers': len(project.hooks.list()),
-            'Technologies': ''
-        }
-        return project_data
-    except Exception as e:
-        logger.error(f'Error in getting {project.name} data: {e}')
-        return None
-
-
+def calculate_conventional_commit_percentage(project: Project, snapshot: CommitSnapshot | None = None) -> Dict[str, float]:
+    if snapshot is None:
+        snapshot = CommitSnapshot.fetch(project, with_branches=False)
+    return snapshot.conventional_commit_percentage()
+
+
+@metric('get_num_commits_by_branch')
+def get_num_commits_by_branch(project: Project, snapshot: CommitSnapshot | None = None) -> Dict[str, int]:
+    if snapshot is None:
+        # only the counts are needed, so they are read from the API instead of listing the histories
+        branch_names = [branch.name for branch in project.branches.list(all=True)]
+        return count_commits_by_branch_cheap(project, branch_names, project.default_branch)
+    return count_commits_by_branch(snapshot)
+
+
+def get_ci_cd_stages(project: Project, branch_name: str = '') -> List[str] | None:
+    """The stages of the pipeline of ``branch_name`` (the default branch by default), includes resolved."""
+    root = CiFile(str(project.id), branch_name or project.default_branch, CI_CONFIG_PATH)
+    summary = fetch_ci_summary(project, ProjectCache(':memory:'), root)
+    return summary['stages'] or None
+
+
+def has_tests(project: Project, branch_name: str = '') -> bool:
+    return scan_tree_markers(project, branch_name, markers={'tests': MARKERS['tests']})['tests']
+
+
+def process_project(project: Project, cache_path: str = ':memory:', force_refresh: bool = False,
+                    metadata: Dict | None = None, mirror_dir: str = '', facts_path: str = '',
+                    metrics: str = '') -> Dict[str, str] | None:
+    """The report row of the project, with the columns of the ``metrics`` selection (see ``select_metrics``)."""
+    with project_scope(project.path_with_namespace):
+        cache = None
+        try:
+            selected_metrics = select_metrics(metrics)
+            required = required_resources(selected_metrics)
+            if mirror_dir and required & {'commits', 'branches', 'tree'}:
+                # commits, branches and trees are read from a local mirror instead of the API
+                with metric('sync_mirror'):
+                    project = LocalProject(sync_mirror(project, mirror_dir), remote=project)
+            cache = ProjectCache(cache_path)
+            resources = ProjectResources(project.attributes)
+            if 'commits' in required:
+                with metric('fetch_incremental_snapshot'):
+                    resources.snapshot = fetch_incremental_snapshot(project, cache, force_refresh=force_refresh)
+                logger.info(f'{project.name}: fetched {resources.snapshot.pages_fetched} API pages of commits and '
+                            f'branches')
+                if facts_path:
+                    write_commit_facts(facts_path, project.attributes, resources.snapshot)
+            elif 'branches' in required:
+                with metric('fetch_incremental_snapshot'):
+                    resources.snapshot = CommitSnapshot.fetch(project, with_commits=False)
+            tree_ref, markers_version, languages_version = resource_versions(resources, required)
+            # fetched beforehand for a batch of projects, see fetch_projects_metadata
+            metadata = metadata or {}
+            if 'tree' in required:
+                # the marker files GraphQL looked for on the default branch need no HEAD request
+                probes = metadata.get('probes') if metadata.get('default_branch') == tree_ref else None
+                with metric('scan_tree_markers'):
+                    resources.markers = cache.resource(project.id, 'markers', markers_version,
+                                                       lambda: scan_tree_markers(project, tree_ref, probes=probes))
+            if 'languages' in required and 'languages' not in metadata:
+                resources.languages = cache.resource(project.id, 'languages', languages_version,
+                                                     lambda: get_language_percentages(project))
+            elif 'languages' in required:
+                resources.languages = metadata['languages']
+            if 'hooks' in required:
+                with metric('hooks'):
+                    resources.num_hooks = len(project.hooks.list())
+            if 'ci' in required:
+                with metric('ci_config'):
+                    resources.ci = fetch_ci_summary(project, cache)
+            project_data = build_row(selected_metrics, resources)
+            cache.save_project_data(project.id, project.last_activity_at, project_data)
+            return project_data
+        except Exception as e:
+            logger.error(f'Error in getting {project.name} data: {e}')
+            return None
+        finally:
+            # pool workers live for the whole run: no connection is left open behind a failed project
+            if cache is not None:
+                cache.close()
+
+
+def process_project_attributes(attributes: Dict, **kwargs) -> Dict[str, str] | None:
+    """``process_project`` in a pool worker, on a project rebuilt from its API attributes with the worker's client."""
+    return process_project(Project(worker_client().projects, attributes), **kwargs)
+
+
+@metric('get_language_percentages')
 def get_language_percentages(project: Project) -> Dict[str, float]:
     percentages = project.languages()
     return percentages
 
 
+def iter_outdated_projects(projects: Iterable[Project], cache_path: str, on_cached: Callable[[Dict], None],
+                           done_project_ids: Set[int] = frozenset(), force_refresh: bool = False,
+                           columns: Iterable[str] = ()) -> Iterator[Project]:
+    """
+    The projects that need to be crawled. Projects in ``done_project_ids`` are skipped, and the cached rows of those
+    without any activity since the last run (and computed with every column in ``columns``) are passed to
+    ``on_cached`` instead.
+    """
+    columns = list(columns)
+    num_done, num_cached, num_outdated = 0, 0, 0
+    for project in projects:
+        if project.id in done_project_ids:
+            num_done += 1
+            continue
+        project_data = None
+        if not force_refresh:
+            # no connection stays open while the projects are yielded: the process pool may fork meanwhile, and
+            # a SQLite connection must not be inherited by a forked process
+            cache = ProjectCache(cache_path)
+            project_data = cache.load_project_data(project.id, project.last_activity_at)
+            cache.close()
+        if project_data and all(column in project_data for column in columns):
+            num_cached += 1
+            on_cached({column: project_data[column] for column in columns} if columns else project_data)
+        else:
+            num_outdated += 1
+            yield project
+    logger.info(f'{num_done} projects already in the report, {num_cached} unchanged since the last run, '
+                f'{num_outdated} processed')
+
+
 if __name__ == '__main__':
     settings = Settings()
-    gl = gitlab.Gitlab(settings.gitlab_url, private_token=settings.access_token)
-    projects = gl.projects.list(all=True)
-    grouped_projects = {}
-    for project in projects:
-        group_name = project.namespace['name']
-        if group_name not in grouped_projects:
-            grouped_projects[group_name] = []
-
-    with ProcessPoolExecutor(max_workers=8) as executor:  # Adjust max_workers as needed
-        future_to_project = {executor.submit(process_project, project): project for project in projects}
-        for future in as_completed(future_to_project):
-            project = future_to_project[future]
+    if settings.engine not in BACKENDS:
+        raise ValueError(f'Unknown engine {settings.engine!r}, expected one of {BACKENDS}')
+    selected_metrics = select_metrics(settings.metrics)
+    columns = [selected_metric.column for selected_metric in selected_metrics]
+    client_settings = ClientSettings.from_settings(settings)
+    # the workers build their own clients from the same settings
+    gl = create_client(client_settings, reset_profile=True)
+    http_cache = None
+    if settings.http_cache_path:
+        http_cache = HttpCache(settings.http_cache_path, max_bytes=client_settings.http_cache_max_bytes)
+        http_cache_stats = http_cache.stats()
+    sink = open_report_sink(settings.report_path, resume=settings.resume)
+    sink_lock = threading.Lock()
+
+    def write_row(project_data: Dict):
+        # the async engine lists the projects in a background thread
+        with sink_lock:
+            sink.write(project_data)
+
+    # projects are streamed from the listing to the workers as they arrive
+    projects = iter_outdated_projects(iter_projects(gl, ProjectFilter.from_settings(settings)), settings.cache_path,
+                                      on_cached=write_row,
+                                      done_project_ids=sink.done_project_ids() if settings.resume else set(),
+                                      force_refresh=settings.force_refresh, columns=columns)
+    if settings.graphql:
+        projects_with_metadata = with_projects_metadata(gl, projects)
+    else:
+        projects_with_metadata = ((project, None) for project in projects)
+
+    # the local mirror mode runs in the process pool
+    if settings.engine == 'async' and not settings.mirror_dir:
+        projects_metadata = {}
+
+        def project_attributes() -> Iterator[Dict]:
+            for project, metadata in projects_with_metadata:
+                if metadata is not None:
+                    projects_metadata[project.id] = metadata
+                yield project.attributes
+
+        run_crawl(settings.gitlab_url, settings.access_token, project_attributes(),
+                  max_concurrency=settings.max_concurrency, cache_path=settings.cache_path,
+                  force_refresh=settings.force_refresh, projects_metadata=projects_metadata,
+                  facts_path=settings.facts_path, on_project_data=write_row, http_cache=http_cache,
+                  profile_dir=settings.profile_dir, metrics=settings.metrics)
+    else:
+        def write_result(future: Future, project: Project):
             try:
                 project_data = future.result()
                 if project_data:
-                    # Process the data (e.g., append it to a DataFrame or list)
-                    grouped_projects[project_data['Group Name']].append(project_data)
+                    write_row(project_data)
             except Exception as e:
                 logger.error(f'Error processing project {project.name}: {e}')
 
-    with pd.ExcelWriter('./gitlab_projects.xlsx') as writer:
-        for sheet_name, records in grouped_projects.items():
-            df = pd.DataFrame(records)
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-
+        finished = queue.SimpleQueue()
+        backend = 'process' if settings.engine == 'async' else settings.engine
+        with open_worker_pool(backend, client_settings, max_workers=settings.workers) as executor:
+            num_pending = 0
+            for project, metadata in projects_with_metadata:
+                # only the attributes are sent: the workers rebuild the project on their own client
+                future = executor.submit(process_project_attributes, project.attributes,
+                                         cache_path=settings.cache_path, force_refresh=settings.force_refresh,
+                                         metadata=metadata, mirror_dir=settings.mirror_dir,
+                                         facts_path=settings.facts_path, metrics=settings.metrics)
+                future.add_done_callback(lambda future, project=project: finished.put((future, project)))
+                num_pending += 1
+                # the rows of the finished projects are written while the listing goes on
+                while not finished.empty():
+                    write_result(*finished.get())
+                    num_pending -= 1
+            for _ in range(num_pending):
+                write_result(*finished.get())
+    sink.close()
+    if http_cache is not None:
+        http_cache.log_stats(since=http_cache_stats)
+        http_cache.close()
+    if settings.profile_dir:
+        report_profile(settings.profile_dir)
+
+    # without commits in the selection no fact is written, but those of previous runs are still rolled up
+    crawled_commits = 'commits' in required_resources(selected_metrics)
+    if settings.facts_path and (crawled_commits or os.path.isdir(os.path.join(settings.facts_path, 'commits'))):
+        build_rollups(settings.facts_path)
+        build_commit_index(settings.facts_path)
+    if settings.excel_path:
+        export_excel(read_report(settings.report_path), settings.excel_path)
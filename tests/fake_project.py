@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+
+class FakeListManager:
+    """Paginated stand-in for a python-gitlab list manager that records every requested page."""
+
+    def __init__(self, items: List[Any]):
+        self.items = items
+        self.requests: List[Dict[str, Any]] = []
+
+    def list(self, get_all: bool = None, all: bool = None, page: int = 1, per_page: int = 20, **kwargs):
+        self.requests.append(dict(kwargs, all=all, page=page, per_page=per_page))
+        items = self.items
+        if 'since' in kwargs:
+            items = [item for item in items if item.attributes['created_at'] >= kwargs['since']]
+        if get_all or (get_all is None and all):
+            return list(items)
+        return items[(page - 1) * per_page:page * per_page]
+
+
+def make_commit(sha: str, parents: List[str], author: str = 'dev', message: str = 'feat: change',
+                created_at: str = '2024-01-01T10:00:00.000+00:00') -> SimpleNamespace:
+    attributes = {
+        'id': sha,
+        'parent_ids': parents,
+        'author_name': author,
+        'author_email': f'{author}@example.com',
+        'created_at': created_at,
+        'message': message,
+    }
+    return SimpleNamespace(attributes=attributes, **attributes)
+
+
+def make_branch(name: str, sha: str) -> SimpleNamespace:
+    return SimpleNamespace(name=name, commit={'id': sha}, attributes={'name': name, 'commit': {'id': sha}})
+
+
+class FakeProject:
+
+    def __init__(self, commits: List[SimpleNamespace], branches: List[SimpleNamespace], **attributes):
+        self.commits = FakeListManager(commits)
+        self.branches = FakeListManager(branches)
+        self.attributes = attributes
+        for key, value in attributes.items():
+            setattr(self, key, value)
@@ -0,0 +1,101 @@
+import asyncio
+import unittest
+from unittest import mock
+from datetime import datetime, timezone
+
+from crawler.activity import ActivityStore, scan_activity, time_windows
+from crawler.async_client import AsyncGitLabClient
+from benchmarks.stub import GitLabStub, linear_commits, sample_project
+
+
+def scan(stub, store, window_days=365):
+    async def run():
+        async with AsyncGitLabClient(stub.url, 'token', max_concurrency=4) as client:
+            await scan_activity(client, [project.attributes(stub.url) for project in stub.projects.values()], store,
+                                window_days=window_days)
+    asyncio.run(run())
+
+
+class TestActivity(unittest.TestCase):
+
+    def test_time_windows(self):
+        end = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        windows = time_windows('2024-01-01T00:00:00+00:00', end, 30)
+        self.assertEqual(len(windows), 2)
+        self.assertEqual(windows[0], ('2024-01-01T00:00:00+00:00', '2024-01-31T00:00:00+00:00'))
+        self.assertEqual(windows[-1], ('2024-01-31T00:00:00+00:00', None))
+
+    def test_scan_is_incremental(self):
+        project = sample_project()
+        with GitLabStub([project]) as stub:
+            store = ActivityStore(':memory:')
+            scan(stub, store, window_days=200)
+            table = store.table().set_index('author')
+            self.assertEqual(table.loc['alice@example.com', 'commits'], 120)
+            self.assertEqual(table.loc['bob@example.com', 'commits'], 15)
+            self.assertEqual(str(table.loc['bob@example.com', 'last'].date()), '2024-01-01')
+
+            project.commits.append(dict(linear_commits(1, author='bob')[0], id='late',
+                                        created_at='2024-02-01T00:00:00.000+00:00'))
+            stub.requests.clear()
+            scan(stub, store, window_days=200)
+            table = store.table().set_index('author')
+
+        self.assertEqual(table.loc['bob@example.com', 'commits'], 16)
+        self.assertEqual(str(table.loc['bob@example.com', 'last'].date()), '2024-02-01')
+        self.assertEqual(table.loc['alice@example.com', 'commits'], 120)
+        self.assertEqual(table.loc['alice@example.com', 'active_projects'], 1)
+
+    def test_watermark_across_timezones(self):
+        project = sample_project()
+        project.commits = [dict(commit, created_at='2024-01-02T09:00:00.000+09:00') for commit in project.commits]
+        with GitLabStub([project]) as stub:
+            store = ActivityStore(':memory:')
+            scan(stub, store)
+            self.assertEqual(store.watermark(project.id), '2024-01-02T00:00:00+00:00')
+            # three hours later than the watermark, although its local time reads earlier
+            project.commits.append(dict(linear_commits(1, author='carol')[0], id='later',
+                                        created_at='2024-01-02T03:00:00.000+00:00'))
+            scan(stub, store)
+
+        table = store.table().set_index('author')
+        self.assertEqual(table.loc['carol@example.com', 'commits'], 1)
+        self.assertEqual(store.watermark(project.id), '2024-01-02T03:00:00+00:00')
+
+    def test_identities_are_merged(self):
+        first, second = sample_project(1, 'api'), sample_project(2, 'web')
+        for commit in second.commits:
+            if commit['author_name'] == 'alice':
+                commit['author_email'] = 'alice@work.example.com'
+        with GitLabStub([first, second]) as stub:
+            store = ActivityStore(':memory:')
+            scan(stub, store)
+
+        self.assertEqual(len(store.table()), 3)
+        merged = store.table(merge_identities=True).set_index('name')
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(merged.loc['alice', 'commits'], 240)
+        self.assertEqual(merged.loc['alice', 'active_projects'], 2)
+        self.assertEqual(sorted(merged.loc['alice', 'emails']), ['alice@example.com', 'alice@work.example.com'])
+
+    def test_projects_are_scanned_a_few_at_a_time(self):
+        in_flight, most_in_flight = 0, 0
+
+        async def scan_project_activity(client, project, store, window_days):
+            nonlocal in_flight, most_in_flight
+            in_flight += 1
+            most_in_flight = max(most_in_flight, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+
+        async def run():
+            async with AsyncGitLabClient('http://gitlab.invalid', 'token', max_concurrency=4) as client:
+                await scan_activity(client, ({'id': i, 'name': f'p{i}'} for i in range(50)), ActivityStore(':memory:'))
+
+        with mock.patch('crawler.activity.scan_project_activity', scan_project_activity):
+            asyncio.run(run())
+        self.assertEqual(most_in_flight, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import gitlab
+
+from gitfile import process_project
+from crawler.async_client import AsyncGitLabClient
+from crawler.async_crawl import crawl_projects, run_crawl
+from crawler.cache import ProjectCache
+from benchmarks.stub import GitLabStub, sample_project
+
+
+class TestAsyncCrawl(unittest.TestCase):
+
+    def test_rows_match_the_process_engine(self):
+        projects = [sample_project(1, 'api'), sample_project(2, 'web', group='front')]
+        with GitLabStub(projects) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            expected = {project.name: process_project(gl.projects.get(project.id)) for project in projects}
+            rows = run_crawl(stub.url, 'token', [project.attributes(stub.url) for project in projects])
+
+        self.assertEqual({row['Name']: row for row in rows}, expected)
+        self.assertEqual(expected['api']['Commits per Branch'], {'main': 120, 'feature': 76})
+        self.assertEqual(expected['api']['Has CI / CD'], 'yes')
+
+    def test_projects_are_crawled_as_they_arrive(self):
+        projects = [sample_project(1, 'api'), sample_project(2, 'web', group='front')]
+        with GitLabStub(projects) as stub:
+            listed = []
+
+            def listing():
+                for project in projects:
+                    listed.append(project.id)
+                    yield project.attributes(stub.url)
+
+            rows = run_crawl(stub.url, 'token', listing(), projects_metadata={})
+
+        self.assertEqual(listed, [1, 2])
+        self.assertEqual(sorted(row['Name'] for row in rows), ['api', 'web'])
+
+    def test_root_markers_are_probed(self):
+        project = sample_project()
+        with GitLabStub([project]) as stub:
+            rows = run_crawl(stub.url, 'token', [project.attributes(stub.url)], metrics='Has CI / CD,Has Docker')
+
+        self.assertEqual((rows[0]['Has CI / CD'], rows[0]['Has Docker']), ('yes', 'yes'))
+        # the root markers are probed, and the first tree page finds the tests directory
+        self.assertEqual(sorted(path.rsplit('/', 1)[-1] for path in stub.requests),
+                         ['.gitlab-ci.yml', 'Dockerfile', 'docker-compose.yml', 'tree'])
+
+    def test_rate_limited_requests_are_retried(self):
+        project = sample_project()
+        with GitLabStub([project]) as stub:
+            stub.rate_limited_requests = 3
+
+            async def crawl():
+                async with AsyncGitLabClient(stub.url, 'token', max_concurrency=4, base_delay=0.01) as client:
+                    rows = [row async for row in crawl_projects(client, [project.attributes(stub.url)],
+                                                                ProjectCache(':memory:'))]
+                    return rows, client.num_requests
+
+            rows, num_requests = asyncio.run(crawl())
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(num_requests, len(stub.requests))
+        self.assertEqual(rows[0]['Number of Commits'], 135)
+
+    def test_projects_are_crawled_a_few_at_a_time(self):
+        listed, in_flight, most_in_flight = [], 0, 0
+
+        def listing():
+            for i in range(50):
+                listed.append(i)
+                yield {'id': i}
+
+        async def crawl_project(client, project, *args):
+            nonlocal in_flight, most_in_flight
+            in_flight += 1
+            most_in_flight = max(most_in_flight, in_flight)
+            # the listing is not pulled further while the bound is reached
+            self.assertLessEqual(len(listed), project['id'] + 4)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+            return {'Name': str(project['id'])}
+
+        async def crawl():
+            async with AsyncGitLabClient('http://gitlab.invalid', 'token', max_concurrency=4) as client:
+                return [row async for row in crawl_projects(client, listing(), ProjectCache(':memory:'))]
+
+        with mock.patch('crawler.async_crawl.crawl_project', crawl_project):
+            rows = asyncio.run(crawl())
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(most_in_flight, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
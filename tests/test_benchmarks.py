@@ -0,0 +1,27 @@
+import unittest
+
+from benchmarks.fake_gitlab import OrgShape, synthetic_org
+from benchmarks.run import run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_synthetic_org(self):
+        shape = OrgShape(groups=2, projects_per_group=3, branches=3, commits_per_branch=10, tree_depth=2,
+                         files_per_directory=2)
+        projects = synthetic_org(shape)
+        self.assertEqual(len(projects), 6)
+        self.assertEqual(len(projects[0].commits), 30)
+        self.assertEqual(len(projects[0].branches), 3)
+        self.assertIn('src/package_1/module_1.py', projects[0].files)
+
+    def test_scenarios_run_under_rate_limits(self):
+        shape = OrgShape(groups=1, projects_per_group=2, branches=2, commits_per_branch=10, tree_depth=1)
+        results = run_benchmarks(shape, ['async_engine', 'users_activity'], rate_limit=5, workers=2)
+        self.assertEqual([result.projects for result in results], [2, 2])
+        self.assertTrue(all(result.api_calls > 0 and result.peak_rss_mb > 0 for result in results))
+        self.assertGreater(sum(result.rate_limited for result in results), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
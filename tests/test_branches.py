@@ -0,0 +1,98 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+from crawler.branches import CommitGraph, count_commits_by_branch, count_commits_by_branch_cheap
+from crawler.snapshot import CommitSnapshot
+
+
+def random_history(num_commits: int = 300, seed: int = 7):
+    rng = random.Random(seed)
+    commits = []
+    for i in range(num_commits):
+        parents = [f'c{i - 1}' if rng.random() < 0.9 else f'c{rng.randrange(max(0, i - 20), i)}'] if i else []
+        if i > 2 and rng.random() < 0.1:
+            parents.append(f'c{rng.randrange(i)}')
+        commits.append({'id': f'c{i}', 'parent_ids': list(dict.fromkeys(parents))})
+    return commits
+
+
+class FakeCommitList:
+
+    def __init__(self, total):
+        self.total = total
+
+
+class FakeCheapProject:
+    """Answers header counts and compare requests from a known set of reachable commits per branch."""
+
+    def __init__(self, reachable, header_limit):
+        self.reachable = reachable
+        self.header_limit = header_limit
+        self.commits = SimpleNamespace(list=self._list_commits)
+        self.compared = []
+
+    def _list_commits(self, iterator=False, per_page=20, ref_name=None, get_all=None, page=1):
+        commits = sorted(self.reachable[ref_name])
+        if iterator:
+            return FakeCommitList(len(commits) if len(commits) <= self.header_limit else None)
+        return commits[(page - 1) * per_page:page * per_page]
+
+    def repository_compare(self, from_, to):
+        self.compared.append((from_, to))
+        return {'commits': sorted(self.reachable[to] - self.reachable[from_])}
+
+
+class TestCommitGraph(unittest.TestCase):
+
+    def test_counts_match_brute_force(self):
+        commits = random_history()
+        graph = CommitGraph(commits)
+        for sha in ('c299', 'c150', 'c3', 'c0'):
+            self.assertEqual(graph.count_reachable(sha), len(CommitGraph(commits).ancestors(sha)))
+
+    def test_many_tips_in_one_walk(self):
+        commits = random_history()
+        tips = [f'c{i}' for i in range(0, 300, 7)] + ['c299', 'c299', 'unknown']
+        graph = CommitGraph(commits)
+        self.assertEqual(graph.count_reachable_many(tips), [len(graph.ancestors(sha)) for sha in tips])
+
+    def test_unknown_commit_and_missing_parents(self):
+        graph = CommitGraph([{'id': 'b', 'parent_ids': ['a']}, {'id': 'c', 'parent_ids': ['b']}])
+        self.assertEqual(graph.count_reachable('c'), 2)
+        self.assertEqual(graph.count_reachable('x'), 0)
+
+    def test_count_commits_by_branch(self):
+        commits = random_history()
+        snapshot = CommitSnapshot(commits=commits, branches=[
+            {'name': 'main', 'commit_id': 'c299'},
+            {'name': 'feature', 'commit_id': 'c120'},
+        ])
+        graph = CommitGraph(commits)
+        self.assertEqual(count_commits_by_branch(snapshot), {
+            'main': len(graph.ancestors('c299')),
+            'feature': len(graph.ancestors('c120')),
+        })
+
+
+class TestCheapCounting(unittest.TestCase):
+
+    def setUp(self):
+        graph = CommitGraph(random_history())
+        self.reachable = {'main': graph.ancestors('c299'), 'feature': graph.ancestors('c250'),
+                          'old': graph.ancestors('c40')}
+        self.expected = {name: len(commits) for name, commits in self.reachable.items()}
+
+    def test_header_counts(self):
+        project = FakeCheapProject(self.reachable, header_limit=10_000)
+        self.assertEqual(count_commits_by_branch_cheap(project, list(self.reachable), 'main'), self.expected)
+        self.assertEqual(project.compared, [])
+
+    def test_compare_fallback_without_headers(self):
+        project = FakeCheapProject(self.reachable, header_limit=50)
+        self.assertEqual(count_commits_by_branch_cheap(project, list(self.reachable), 'main'), self.expected)
+        self.assertIn(('main', 'feature'), project.compared)
+
+
+if __name__ == '__main__':
+    unittest.main()
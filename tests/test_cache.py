@@ -0,0 +1,113 @@
+import os
+import tempfile
+import asyncio
+import unittest
+from unittest import mock
+
+import gitlab
+
+from crawler.async_client import AsyncGitLabClient
+from crawler.async_crawl import _fetch_incremental_snapshot
+from crawler.branches import count_commits_by_branch
+from gitfile import process_project
+from crawler.cache import ProjectCache, fetch_incremental_snapshot
+from fake_project import FakeProject, make_branch, make_commit
+from benchmarks.stub import GitLabStub, linear_commits, sample_project
+
+
+def build_project(num_commits: int) -> FakeProject:
+    commits = [
+        make_commit(f'c{i}', [f'c{i - 1}'] if i else [], created_at=f'2024-01-01T10:{i:02d}:00.000+00:00')
+        for i in range(num_commits)
+    ]
+    return FakeProject(commits, [make_branch('main', f'c{num_commits - 1}')], id=1, name='demo')
+
+
+class TestProjectCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_rerun_fetches_only_new_commits(self):
+        cache = ProjectCache(self.path)
+        snapshot = fetch_incremental_snapshot(build_project(30), cache)
+        self.assertEqual(snapshot.total_commits, 30)
+        cache.close()
+
+        project = build_project(35)
+        cache = ProjectCache(self.path)
+        snapshot = fetch_incremental_snapshot(project, cache)
+        self.assertEqual(snapshot.total_commits, 35)
+        self.assertEqual(snapshot.branches, [{'name': 'main', 'commit_id': 'c34'}])
+        self.assertEqual(project.commits.requests[0]['since'], '2024-01-01T10:29:00.000+00:00')
+        self.assertEqual(snapshot.pages_fetched, 2)
+
+    def test_force_refresh_replaces_history(self):
+        cache = ProjectCache(self.path)
+        fetch_incremental_snapshot(build_project(30), cache)
+        project = build_project(10)
+        snapshot = fetch_incremental_snapshot(project, cache, force_refresh=True)
+        self.assertNotIn('since', project.commits.requests[0])
+        self.assertEqual(cache.load_snapshot(1).total_commits, 10)
+        self.assertEqual(snapshot.total_commits, 10)
+
+    def test_branch_pushed_with_older_commits(self):
+        project = sample_project(1)
+        with GitLabStub([project]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            fetch_incremental_snapshot(gl.projects.get(1), ProjectCache(self.path))
+            # a branch pushed after the first run, with commits dated before its newest commit
+            late = linear_commits(5, author='carol', parent=project.commits[10]['id'])
+            project.commits += late
+            project.branches['late'] = late[-1]['id']
+
+            snapshot = fetch_incremental_snapshot(gl.projects.get(1), ProjectCache(self.path))
+            expected = fetch_incremental_snapshot(gl.projects.get(1), ProjectCache(':memory:'), force_refresh=True)
+
+            async def fetch_async():
+                async with AsyncGitLabClient(stub.url, 'token') as client:
+                    return await _fetch_incremental_snapshot(client, 1, ProjectCache(self.path), False)
+
+            project.commits += linear_commits(3, author='dave', parent=project.commits[20]['id'])
+            project.branches['later'] = project.commits[-1]['id']
+            async_snapshot = asyncio.run(fetch_async())
+            async_expected = fetch_incremental_snapshot(gl.projects.get(1), ProjectCache(':memory:'),
+                                                        force_refresh=True)
+
+        self.assertEqual(count_commits_by_branch(snapshot)['late'], 16)
+        self.assertEqual(count_commits_by_branch(snapshot), count_commits_by_branch(expected))
+        self.assertEqual(snapshot.total_commits, expected.total_commits)
+        self.assertEqual(count_commits_by_branch(async_snapshot), count_commits_by_branch(async_expected))
+        self.assertEqual(async_snapshot.total_commits, 143)
+
+    def test_cache_is_closed_when_a_project_fails(self):
+        project = FakeProject([], [], id=1, name='demo', path_with_namespace='team/demo')
+        project.commits.list = mock.Mock(side_effect=RuntimeError('boom'))
+        with mock.patch.object(ProjectCache, 'close', autospec=True) as close:
+            self.assertIsNone(process_project(project, cache_path=self.path))
+        close.assert_called_once()
+
+    def test_project_data_is_keyed_by_last_activity(self):
+        cache = ProjectCache(self.path)
+        cache.save_project_data(1, '2024-01-01T00:00:00Z', {'Name': 'demo', 'Main Developers': {'dev': 3}})
+        self.assertEqual(cache.load_project_data(1, '2024-01-01T00:00:00Z'),
+                         {'Name': 'demo', 'Main Developers': {'dev': 3}})
+        self.assertIsNone(cache.load_project_data(1, '2024-02-01T00:00:00Z'))
+
+    def test_resource_is_reloaded_for_a_new_version(self):
+        cache = ProjectCache(':memory:')
+        calls = []
+        loader = lambda: calls.append(1) or ['Dockerfile']
+        self.assertEqual(cache.resource(1, 'tree', 'sha1', loader), ['Dockerfile'])
+        self.assertEqual(cache.resource(1, 'tree', 'sha1', loader), ['Dockerfile'])
+        self.assertEqual(len(calls), 1)
+        cache.resource(1, 'tree', 'sha2', loader)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+
+import gitlab
+
+from gitfile import process_project
+from crawler.async_crawl import run_crawl
+from crawler.cache import ProjectCache
+from crawler.discovery import ProjectFilter, iter_projects
+from crawler.ci import (CiFile, ci_includes, fetch_ci_summary, parse_ci_config, resolve_ci_config, root_ci_file,
+                        summarize_ci_config)
+from benchmarks.stub import GitLabStub, sample_project
+
+PIPELINE = '''
+include:
+  - local: ci/build.yml
+  - project: platform/templates
+    file: docker.yml
+  - template: Security/SAST.gitlab-ci.yml
+  - remote: https://example.com/ci.yml
+stages: [build, test, publish]
+unit:
+  extends: .python
+  script: pytest
+'''
+BUILD = '''
+.python:
+  image: python:3.12
+build:
+  stage: build
+  image: {name: 'node:20'}
+'''
+DOCKER = '''
+default:
+  image: docker:27
+publish:
+  stage: publish
+'''
+SAST = 'sast:\n  stage: test\n  image: sast:latest\n'
+
+
+class TestCiConfig(unittest.TestCase):
+
+    def test_includes(self):
+        file = CiFile('1', 'main', '.gitlab-ci.yml')
+        self.assertEqual(ci_includes({'include': 'ci/a.yml'}, file), [CiFile('1', 'main', 'ci/a.yml')])
+        self.assertEqual(ci_includes({'include': [{'project': 'a/b', 'file': ['/x.yml', 'y.yml'], 'ref': 'v1'},
+                                                  {'local': 'ci/*.yml'}, 'https://example.com/ci.yml']}, file),
+                         [CiFile('a/b', 'v1', 'x.yml'), CiFile('a/b', 'v1', 'y.yml'), None, None])
+        self.assertEqual(root_ci_file({'id': 1, 'default_branch': 'dev', 'ci_config_path': 'ci.yml@a/b:v2'}),
+                         CiFile('a/b', 'v2', 'ci.yml'))
+        self.assertEqual(root_ci_file({'id': 1, 'default_branch': 'dev'}), CiFile('1', 'dev', '.gitlab-ci.yml'))
+
+    def test_header_document(self):
+        content = 'spec:\n  inputs:\n    stage: {default: build}\n---\nstages: [build]\njob:\n  script: make\n'
+        self.assertEqual(parse_ci_config(content), {'stages': ['build'], 'job': {'script': 'make'}})
+        self.assertEqual(parse_ci_config('stages: [build]\n'), {'stages': ['build']})
+        self.assertEqual(parse_ci_config('stages: [build\n'), {})
+        self.assertEqual(parse_ci_config(''), {})
+
+    def test_resolution_and_summary(self):
+        root = CiFile('1', 'main', '.gitlab-ci.yml')
+        files = {root: {'include': ['a.yml', 'b.yml'], 'test': {'script': 'x'}},
+                 CiFile('1', 'main', 'a.yml'): {'include': 'b.yml', 'default': {'image': 'alpine'}},
+                 CiFile('1', 'main', 'b.yml'): None}
+        resolution = resolve_ci_config(root)
+        levels = [next(resolution)]
+        try:
+            while True:
+                levels.append(resolution.send([files[file] for file in levels[-1]]))
+        except StopIteration as stop:
+            config, unresolved = stop.value
+        self.assertEqual(levels, [[root], [CiFile('1', 'main', 'a.yml'), CiFile('1', 'main', 'b.yml')]])
+        self.assertEqual(unresolved, 2)
+        self.assertEqual(summarize_ci_config(config, unresolved),
+                         {'stages': ['build', 'test', 'deploy'], 'jobs': 1, 'images': ['alpine'],
+                          'unresolved_includes': 2})
+        self.assertEqual(summarize_ci_config(None)['jobs'], 0)
+
+
+class TestCiAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.directory.name, 'cache.sqlite')
+        self.projects = [sample_project(1, 'api'), sample_project(2, 'web'), sample_project(3, 'templates', 'platform')]
+        for project in self.projects[:2]:
+            project.files.update({'.gitlab-ci.yml': PIPELINE, 'ci/build.yml': BUILD})
+        self.projects[2].files['docker.yml'] = DOCKER
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_includes_are_resolved_once(self):
+        with GitLabStub(self.projects) as stub:
+            stub.ci_templates['Security/SAST'] = SAST
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            cache = ProjectCache(self.cache_path)
+            summaries = [fetch_ci_summary(gl.projects.get(project_id), cache) for project_id in (1, 2)]
+            requests = list(stub.requests)
+            num_configs = cache.connection.execute('SELECT COUNT(*) FROM ci_configs').fetchone()[0]
+
+        self.assertEqual(summaries[0], summaries[1])
+        self.assertEqual(summaries[0], {'stages': ['build', 'test', 'publish'], 'jobs': 4,
+                                        'images': ['docker:27', 'node:20', 'python:3.12', 'sast:latest'],
+                                        'unresolved_includes': 1})
+        # both projects have the same files: each distinct content is downloaded and parsed once
+        self.assertEqual(num_configs, 4)
+        self.assertEqual(sum(path.endswith('/repository/files/docker.yml') for path in requests), 2)
+        self.assertEqual(sum('/templates/' in path for path in requests), 1)
+
+    def test_engines_agree(self):
+        selection = 'CI Stages,CI Jobs,CI Images'
+        with GitLabStub(self.projects) as stub:
+            stub.ci_templates['Security/SAST'] = SAST
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            expected = {project.name: process_project(gl.projects.get(project.id), metrics=selection)
+                        for project in self.projects}
+            rows = run_crawl(stub.url, 'token', [project.attributes(stub.url) for project in self.projects],
+                             metrics=selection)
+
+        self.assertEqual({row['Name']: row for row in rows}, expected)
+        self.assertEqual(expected['api']['CI Jobs'], 4)
+        self.assertEqual(expected['templates']['CI Stages'], ['build', 'test'])
+
+    def test_custom_config_path_is_listed(self):
+        self.projects[0].ci_config_path = 'ci/build.yml'
+        with GitLabStub(self.projects[:1]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            # the simple representation has no ci_config_path, so the root file would be .gitlab-ci.yml
+            simple, = iter_projects(gl, ProjectFilter())
+            self.assertNotIn('ci_config_path', simple.attributes)
+            project, = iter_projects(gl, ProjectFilter(simple=False))
+            summary = fetch_ci_summary(project, ProjectCache(':memory:'))
+        self.assertEqual(summary['jobs'], 1)
+        self.assertEqual(summary['images'], ['node:20'])
+
+
+if __name__ == '__main__':
+    unittest.main()
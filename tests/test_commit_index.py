@@ -0,0 +1,109 @@
+import os
+import time
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from crawler.commit_index import CommitIndex, build_commit_index
+from crawler.facts import FACT_COLUMNS
+
+END = pd.Timestamp('2024-07-01', tz='UTC')
+
+
+def write_facts(facts_path: str, facts: pd.DataFrame):
+    os.makedirs(os.path.join(facts_path, 'commits'), exist_ok=True)
+    for project_id, project_facts in facts.groupby('project_id'):
+        project_facts.to_parquet(os.path.join(facts_path, 'commits', f'project-{project_id}.parquet'), index=False)
+
+
+def random_facts(num_commits: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    project_ids = rng.integers(1, 6, num_commits)
+    return pd.DataFrame({
+        'project_id': project_ids,
+        'project': [f'project-{project_id}' for project_id in project_ids],
+        'group': ['team' if project_id % 2 else 'front' for project_id in project_ids],
+        'commit_id': [f'c{index}' for index in range(num_commits)],
+        'author': [f'dev{author}' for author in rng.zipf(1.6, num_commits) % 12],
+        'author_email': '',
+        'date': END - pd.to_timedelta(rng.integers(0, 400 * 86400, num_commits), unit='s'),
+        'branch': 'main',
+        'is_conventional': rng.random(num_commits) < 0.4,
+        'type': None,
+        'breaking': False,
+    }, columns=list(FACT_COLUMNS))
+
+
+class TestCommitIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.facts = random_facts(5000)
+        write_facts(self.directory.name, self.facts)
+        self.index = CommitIndex.load(build_commit_index(self.directory.name))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def in_window(self, days: int) -> pd.DataFrame:
+        return self.facts[(self.facts['date'] > END - pd.Timedelta(days=days)) & (self.facts['date'] <= END)]
+
+    def test_windowed_counts_match_pandas(self):
+        self.assertEqual(len(self.index), len(self.facts))
+        for days in (30, 90, 365):
+            window = self.in_window(days)
+            commits = self.index.commits(days, END)
+            self.assertEqual(commits.to_dict(), window.groupby('project_id').size().reindex(commits.index,
+                                                                                          fill_value=0).to_dict())
+            developers = self.index.active_developers(days, END)
+            self.assertEqual(developers.to_dict(), window.groupby('project_id')['author'].nunique().to_dict())
+            self.assertAlmostEqual(self.index.commit_rate(days, END).sum(), len(window) / days)
+
+    def test_bus_factor(self):
+        window = self.in_window(90)
+        for project_id, project_facts in window.groupby('project_id'):
+            counts = project_facts['author'].value_counts().to_numpy()
+            expected = int(np.argmax(np.cumsum(counts) >= counts.sum() / 2)) + 1
+            self.assertEqual(self.index.bus_factor(90, END)[project_id], expected)
+        self.assertEqual(self.index.bus_factor(1, END - pd.Timedelta(days=500)).sum(), 0)
+
+    def test_developers_and_conventional_trend(self):
+        window = self.in_window(365)
+        developers = self.index.developers(365, END)
+        self.assertEqual(developers['commits'].to_dict(), window['author'].value_counts().to_dict())
+        self.assertEqual(developers.loc['dev1', 'projects'],
+                         window.loc[window['author'] == 'dev1', 'project_id'].nunique())
+
+        trend = self.index.conventional_trend(28, END, period_days=7, project_id=3)
+        self.assertEqual(len(trend), 4)
+        project = self.in_window(28)
+        project = project[project['project_id'] == 3]
+        self.assertEqual(trend['commits'].sum(), len(project))
+        last_week = project[project['date'] > END - pd.Timedelta(days=7)]
+        self.assertAlmostEqual(trend['conventional_percentage'].iloc[-1], last_week['is_conventional'].mean() * 100)
+
+        activity = self.index.project_activity((30, 365), END)
+        self.assertEqual(activity.loc[3, 'Name'], 'project-3')
+        self.assertEqual(activity.loc[3, 'Commits (365d)'], len(window[window['project_id'] == 3]))
+
+    def test_loading_is_memory_mapped(self):
+        start = time.perf_counter()
+        index = CommitIndex.load(os.path.join(self.directory.name, 'index'))
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertIsInstance(index.timestamps, np.memmap)
+        self.assertTrue(np.all(np.diff(index.timestamps) >= 0))
+
+    def test_empty_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            index = CommitIndex.load(build_commit_index(directory), mmap=False)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.timestamps.dtype, np.int64)
+        self.assertTrue(index.commits(30, END).empty)
+        self.assertTrue(index.project_activity((30,), END).empty)
+        self.assertEqual(index.conventional_trend(14, END)['commits'].tolist(), [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+import pandas as pd
+
+from crawler.conventional import classify_commits, conventional_commit_stats, is_conventional_commit
+
+
+class TestConventionalCommits(unittest.TestCase):
+
+    def setUp(self):
+        self.commits = pd.DataFrame({
+            'author_name': ['alice', 'bob', 'alice', 'alice', 'bob', 'carol'],
+            'message': ['feat(api): add endpoint', 'wip', 'fix!: drop python 3.8', 'docs: readme\n\nbody',
+                        'feature: not a type', None],
+        })
+
+    def test_classification_matches_the_single_message_check(self):
+        classified = classify_commits(self.commits['message'])
+        expected = [isinstance(message, str) and is_conventional_commit(message) for message in self.commits['message']]
+        self.assertEqual(classified['conventional'].tolist(), expected)
+        self.assertEqual(classified['breaking'].tolist(), [False, False, True, False, False, False])
+        self.assertEqual(classified['type'].fillna('').tolist(), ['feat', '', 'fix', 'docs', '', ''])
+
+    def test_stats_per_author(self):
+        stats = conventional_commit_stats(self.commits)
+        self.assertEqual(stats.index.tolist(), ['alice', 'bob', 'carol'])
+        self.assertEqual(stats['percentage'].to_dict(), {'alice': 100.0, 'bob': 0.0, 'carol': 0.0})
+        self.assertEqual(stats.loc['alice', ['total', 'breaking', 'feat', 'fix', 'docs', 'chore']].tolist(),
+                         [3, 1, 1, 1, 1, 0])
+
+    def test_commits_without_author_are_counted(self):
+        self.commits.loc[1, 'author_name'] = None
+        stats = conventional_commit_stats(self.commits)
+        self.assertEqual(stats['total'].to_dict(), {'alice': 3, '': 1, 'bob': 1, 'carol': 1})
+        self.assertEqual(stats['total'].sum(), len(self.commits))
+
+    def test_empty_history(self):
+        stats = conventional_commit_stats(pd.DataFrame({'author_name': [], 'message': []}))
+        self.assertEqual(stats['percentage'].to_dict(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from types import SimpleNamespace
+
+import gitlab
+from gitlab.v4.objects.projects import Project
+
+from crawler.discovery import ProjectFilter, iter_projects, parse_id_range
+from benchmarks.stub import GitLabStub, sample_project
+
+
+def stub_projects():
+    projects = [
+        sample_project(1, 'api', group='team'),
+        sample_project(2, 'web', group='team/front'),
+        sample_project(1001, 'old', group='team'),
+        sample_project(2001, 'ops', group='infra'),
+        sample_project(3001, 'stale', group='infra'),
+    ]
+    projects[2].archived = True
+    projects[4].last_activity_at = '2023-01-01T00:00:00.000Z'
+    return projects
+
+
+class TestDiscovery(unittest.TestCase):
+
+    def discover(self, project_filter):
+        with GitLabStub(stub_projects()) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            projects = list(iter_projects(gl, project_filter, per_page=2))
+        self.assertTrue(all(isinstance(project, Project) for project in projects))
+        return [project.name for project in projects]
+
+    def test_parse_id_range(self):
+        self.assertIsNone(parse_id_range(''))
+        self.assertEqual(parse_id_range('10-20'), (10, 20))
+        self.assertEqual(parse_id_range('10-')[0], 10)
+
+    def test_server_side_filters(self):
+        self.assertEqual(self.discover(ProjectFilter()), ['api', 'web', 'ops', 'stale'])
+        self.assertEqual(self.discover(ProjectFilter(include_archived=True, last_activity_after='2023-06-01')),
+                         ['api', 'web', 'old', 'ops'])
+
+    def test_group_filters(self):
+        self.assertEqual(self.discover(ProjectFilter(include_groups=('team', 'team/front'))), ['api', 'web'])
+        self.assertEqual(self.discover(ProjectFilter(exclude_groups=('team/front', 'infra'))), ['api'])
+
+    def test_shards_split_the_projects(self):
+        shards = [self.discover(ProjectFilter(group_ids=parse_id_range(value))) for value in ('-1', '2-')]
+        self.assertEqual(shards, [['api', 'web'], ['ops', 'stale']])
+
+    def test_projects_are_streamed(self):
+        with GitLabStub(stub_projects()) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            projects = iter_projects(gl, per_page=2)
+            self.assertEqual([next(projects).name, next(projects).name], ['api', 'web'])
+            self.assertEqual(stub.requests, ['/api/v4/projects'])
+            self.assertEqual(len(list(projects)), 2)
+            self.assertEqual(len(stub.requests), 2)
+
+    def test_full_representation_for_ci_metrics(self):
+        settings = SimpleNamespace(last_activity_after='', include_archived=False, include_groups='',
+                                   exclude_groups='', group_ids='', metrics='inventory')
+        self.assertTrue(ProjectFilter.from_settings(settings).query_parameters()['simple'])
+        settings.metrics = 'CI Stages'
+        self.assertFalse(ProjectFilter.from_settings(settings).query_parameters()['simple'])
+
+
+if __name__ == '__main__':
+    unittest.main()
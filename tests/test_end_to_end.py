@@ -0,0 +1,57 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+import subprocess
+
+from benchmarks.stub import GitLabStub, sample_project
+
+GITFILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gitfile.py')
+
+
+class TestEndToEnd(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_gitfile(self, stub: GitLabStub, *args: str) -> subprocess.CompletedProcess:
+        env = dict(os.environ, ACCESS_TOKEN='token', GITLAB_URL=stub.url)
+        process = subprocess.run([sys.executable, GITFILE, *args], cwd=self.directory.name, env=env,
+                                 capture_output=True, text=True, timeout=300)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        return process
+
+    def cached_rows(self, table: str) -> int:
+        connection = sqlite3.connect(os.path.join(self.directory.name, 'gitlab_cache.sqlite'))
+        try:
+            return connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_second_run_is_served_from_the_cache(self):
+        with GitLabStub([sample_project(1, 'api'), sample_project(2, 'web')]) as stub:
+            first = self.run_gitfile(stub, '--workers', '2')
+            self.assertIn('0 unchanged since the last run, 2 processed', first.stderr + first.stdout)
+            # the rows and histories written by the pool workers are in the cache
+            self.assertEqual(self.cached_rows('projects'), 2)
+            self.assertEqual(self.cached_rows('commits'), 2 * len(stub.projects[1].commits))
+
+            stub.requests.clear()
+            second = self.run_gitfile(stub, '--workers', '2')
+            self.assertIn('2 unchanged since the last run, 0 processed', second.stderr + second.stdout)
+            self.assertFalse(any(path.endswith('/repository/commits') for path in stub.requests))
+
+    def test_selection_without_commits(self):
+        with GitLabStub([sample_project(1, 'api')]) as stub:
+            self.run_gitfile(stub, '--metrics', 'inventory')
+        # no commit fact to roll up, and the workbook is still written
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'gitlab_facts')))
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, 'gitlab_projects.xlsx')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import tempfile
+import unittest
+
+import gitlab
+
+from gitfile import process_project
+from crawler.branches import CommitGraph
+from crawler.facts import FactStore, build_rollups
+from benchmarks.stub import GitLabStub, sample_project
+
+
+class TestCommitFacts(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        with GitLabStub([sample_project(1, 'api'), sample_project(2, 'web', group='front')]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            self.rows = [process_project(project, facts_path=self.directory.name)
+                         for project in gl.projects.list(get_all=True)]
+        build_rollups(self.directory.name)
+        self.store = FactStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_fact_table(self):
+        facts = self.store.commits()
+        self.assertEqual(len(facts), sum(row['Number of Commits'] for row in self.rows))
+        api = self.store.commits(project_id=1)
+        self.assertEqual(api['branch'].value_counts().to_dict(), {'main': 120, 'feature': 15})
+        self.assertEqual(api.loc[api['is_conventional'], 'type'].unique().tolist(), ['feat'])
+
+    def test_rollups_match_the_report(self):
+        developers = self.store.developers()
+        for author in ('alice', 'bob'):
+            self.assertEqual(developers.loc[author, 'commits'],
+                             sum(row['Main Developers'][author] for row in self.rows))
+        self.assertEqual(developers.loc['alice', 'projects'], 2)
+        groups = self.store.groups()
+        self.assertEqual(groups.loc['front', 'commits'], 135)
+        self.assertEqual(self.store.weekly(group='team')['commits'].sum(), 135)
+        self.assertEqual(self.store.top_developers(1).index.tolist(), ['alice'])
+
+    def test_branch_attribution_visits_every_commit_once(self):
+        commits = [{'id': 'a', 'parent_ids': []}, {'id': 'b', 'parent_ids': ['a']},
+                   {'id': 'c', 'parent_ids': ['a']}, {'id': 'd', 'parent_ids': ['b', 'c']}]
+        branches = [{'name': 'topic', 'commit_id': 'c'}, {'name': 'main', 'commit_id': 'd'}]
+        self.assertEqual(CommitGraph(commits).branch_of(branches, 'main'),
+                         {'a': 'main', 'b': 'main', 'c': 'main', 'd': 'main'})
+        self.assertEqual(CommitGraph(commits).branch_of(branches[:1] + [{'name': 'main', 'commit_id': 'b'}], 'main'),
+                         {'a': 'main', 'b': 'main', 'c': 'topic'})
+
+    def test_rollups_without_facts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            build_rollups(directory)
+            store = FactStore(directory)
+            self.assertTrue(store.developers().empty)
+            self.assertEqual(store.weekly()['commits'].sum(), 0)
+            self.assertEqual(str(store.commits()['date'].dtype), 'datetime64[ns, UTC]')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import gitlab
+
+from gitfile import process_project
+from crawler.async_crawl import run_crawl
+from crawler.graphql import MARKER_PATHS, fetch_projects_metadata
+from benchmarks.stub import GitLabStub, sample_project
+
+
+class TestProjectsMetadata(unittest.TestCase):
+
+    def setUp(self):
+        self.projects = [sample_project(1, 'api'), sample_project(2, 'web', group='front')]
+        del self.projects[1].files['docker-compose.yml']
+
+    def fetch(self, graphql_enabled: bool):
+        with GitLabStub(self.projects) as stub:
+            stub.graphql_enabled = graphql_enabled
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            projects = gl.projects.list(get_all=True)
+            stub.requests.clear()
+            return fetch_projects_metadata(gl, projects, batch_size=10), list(stub.requests)
+
+    def test_one_query_for_a_batch_of_projects(self):
+        metadata, requests = self.fetch(graphql_enabled=True)
+        self.assertEqual(requests, ['/api/graphql'])
+        self.assertEqual(metadata[1]['languages'], {'Python': 97.5, 'Dockerfile': 2.5})
+        self.assertEqual(metadata[1]['default_branch'], 'main')
+        self.assertEqual(sorted(MARKER_PATHS), ['.gitlab-ci.yml', 'Dockerfile', 'docker-compose.yml'])
+        self.assertEqual(metadata[2]['probes'], {'Dockerfile': True, 'docker-compose.yml': False,
+                                                 '.gitlab-ci.yml': True})
+
+    def test_no_rest_fallback_while_listing(self):
+        # the workers fetch the metadata themselves instead
+        metadata, requests = self.fetch(graphql_enabled=False)
+        self.assertEqual(metadata, {})
+        self.assertEqual(requests, ['/api/graphql'])
+
+    def test_process_project_uses_the_metadata(self):
+        with GitLabStub(self.projects) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            for project_id in (1, 2):
+                project = gl.projects.get(project_id)
+                expected = process_project(project)
+                metadata = fetch_projects_metadata(gl, [project])
+                stub.requests.clear()
+                self.assertEqual(process_project(project, metadata=metadata[project_id]), expected)
+                self.assertNotIn(f'/api/v4/projects/{project_id}/languages', stub.requests)
+                # the marker files GraphQL looked for are not probed again (the CI metric still reads its file)
+                self.assertFalse(any(path.endswith(('/files/Dockerfile', '/files/docker-compose.yml'))
+                                     for path in stub.requests))
+
+    def test_async_engine_uses_the_metadata(self):
+        with GitLabStub(self.projects) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            projects = gl.projects.list(get_all=True)
+            expected = [process_project(project) for project in projects]
+            metadata = fetch_projects_metadata(gl, projects)
+            stub.requests.clear()
+            rows = run_crawl(stub.url, 'token', [project.attributes for project in projects],
+                             projects_metadata=metadata)
+            self.assertNotIn('/api/v4/projects/1/languages', stub.requests)
+            self.assertFalse(any(path.endswith('/files/Dockerfile') for path in stub.requests))
+        self.assertEqual(sorted(rows, key=lambda row: row['Project ID']), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import pickle
+import asyncio
+import tempfile
+import unittest
+
+import gitlab
+
+from gitfile import process_project
+from crawler.async_client import AsyncGitLabClient
+from crawler.http_cache import CachingTransport, HttpCache, install_http_cache
+from benchmarks.stub import GitLabStub, sample_project
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'http.sqlite')
+
+    def test_fresh_and_revalidated_hits(self):
+        with GitLabStub([sample_project()]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            install_http_cache(gl, self.path)
+            project = gl.projects.get(1)
+            languages = [project.languages() for _ in range(2)]
+            branches = [[branch.name for branch in project.branches.list(all=True)] for _ in range(2)]
+            requests = list(stub.requests)
+            not_modified = stub.not_modified
+
+        self.assertEqual(languages[0], languages[1])
+        self.assertEqual(branches[0], branches[1])
+        # languages are served from the cache, branches are revalidated
+        self.assertEqual(requests.count('/api/v4/projects/1/languages'), 1)
+        self.assertEqual(requests.count('/api/v4/projects/1/repository/branches'), 2)
+        self.assertEqual(not_modified, 1)
+        stats = HttpCache(self.path).stats()
+        self.assertEqual({outcome: stats[outcome]['count'] for outcome in stats},
+                         {'hit': 1, 'revalidated': 1, 'miss': 2})
+
+    def test_least_recently_used_responses_are_evicted(self):
+        cache = HttpCache(self.path, max_bytes=25)
+        for key in ('a', 'b'):
+            cache.store(key, key, {'ETag': key}, b'x' * 10)
+        cache.hit(cache.lookup('a'))
+        cache.store('c', 'c', {}, b'x' * 10)
+        self.assertIsNotNone(cache.lookup('a'))
+        self.assertIsNone(cache.lookup('b'))
+        self.assertEqual(cache.lookup('a').conditional_headers(), {'If-None-Match': 'a'})
+        # the running total follows replacements and evictions
+        cache.store('a', 'a', {}, b'x' * 5)
+        self.assertEqual(cache.stored_bytes(), 15)
+        cache.close()
+        self.assertEqual(HttpCache(self.path).stored_bytes(), 15)
+
+    def test_client_is_picklable(self):
+        with GitLabStub([sample_project()]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            install_http_cache(gl, self.path)
+            gl.projects.get(1, lazy=True).languages()
+            project = pickle.loads(pickle.dumps(gl.projects.get(1)))
+            project.languages()
+            self.assertEqual(stub.requests.count('/api/v4/projects/1/languages'), 1)
+
+    def test_rows_are_unchanged(self):
+        with GitLabStub([sample_project()]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            expected = process_project(gl.projects.get(1))
+            install_http_cache(gl, self.path)
+            rows = [process_project(gl.projects.get(1)) for _ in range(2)]
+            self.assertGreater(stub.not_modified, 0)
+        self.assertEqual(rows, [expected, expected])
+
+    def test_async_transport(self):
+        with GitLabStub([sample_project()]) as stub:
+
+            async def fetch():
+                cache = HttpCache(self.path)
+                async with AsyncGitLabClient(stub.url, 'token', transport=CachingTransport(cache)) as client:
+                    return [await client.list('/projects/1/repository/branches') for _ in range(2)]
+
+            branches = asyncio.run(fetch())
+            self.assertEqual(stub.not_modified, 1)
+        self.assertEqual(branches[0], branches[1])
+        self.assertEqual(len(branches[0]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
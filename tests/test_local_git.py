@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+import subprocess
+
+from gitlab.exceptions import GitlabGetError
+
+from gitfile import (calculate_conventional_commit_percentage, get_ci_cd_stages, get_num_commits_by_branch,
+                     get_project_file_paths, has_tests)
+from crawler.ci import CiFile, fetch_ci_summary
+from crawler.cache import ProjectCache
+from crawler.local_git import LocalProject, git, sync_mirror
+from crawler.snapshot import CommitSnapshot
+
+GIT_ENV = {
+    'GIT_AUTHOR_NAME': 'alice', 'GIT_AUTHOR_EMAIL': 'alice@example.com',
+    'GIT_COMMITTER_NAME': 'alice', 'GIT_COMMITTER_EMAIL': 'alice@example.com',
+}
+
+
+def commit(repository: str, path: str, message: str, content: str = ''):
+    os.makedirs(os.path.dirname(os.path.join(repository, path)) or repository, exist_ok=True)
+    with open(os.path.join(repository, path), 'w') as file:
+        file.write(content or message)
+    subprocess.run(['git', '-C', repository, 'add', path], check=True, env=dict(os.environ, **GIT_ENV))
+    subprocess.run(['git', '-C', repository, 'commit', '-q', '-m', message], check=True,
+                   env=dict(os.environ, **GIT_ENV))
+
+
+class FakeRemote:
+    id = 7
+    name = 'demo'
+    default_branch = 'main'
+
+
+class TestLocalProject(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.origin = os.path.join(self.directory.name, 'origin')
+        os.makedirs(self.origin)
+        git(self.origin, 'init', '-q', '-b', 'main')
+        commit(self.origin, '.gitlab-ci.yml', 'ci: add pipeline', 'stages:\n  - build\n  - test\n')
+        commit(self.origin, 'tests/test_app.py', 'test: add tests')
+        commit(self.origin, 'src/app.py', 'wip')
+        git(self.origin, 'checkout', '-q', '-b', 'feature')
+        commit(self.origin, 'src/feature.py', 'feat: feature')
+        git(self.origin, 'checkout', '-q', 'main')
+        self.mirror_dir = os.path.join(self.directory.name, 'mirrors')
+        self.project = LocalProject(sync_mirror(FakeRemote(), self.mirror_dir, clone_url=self.origin), FakeRemote())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_metric_functions(self):
+        self.assertEqual(get_num_commits_by_branch(self.project), {'feature': 4, 'main': 3})
+        snapshot = CommitSnapshot.fetch(self.project)
+        self.assertEqual(snapshot.total_commits, 4)
+        self.assertEqual(get_num_commits_by_branch(self.project, snapshot), {'feature': 4, 'main': 3})
+        self.assertEqual(calculate_conventional_commit_percentage(self.project, snapshot), {'alice': 75.0})
+        self.assertEqual(sorted(get_project_file_paths(self.project, 'feature')),
+                         ['.gitlab-ci.yml', 'src/app.py', 'src/feature.py', 'tests/test_app.py'])
+        self.assertTrue(has_tests(self.project, 'main'))
+        self.assertEqual(get_ci_cd_stages(self.project), ['build', 'test'])
+        self.assertEqual(self.project.name, 'demo')
+
+    def test_mirror_is_updated_incrementally(self):
+        commit(self.origin, 'src/more.py', 'fix: more')
+        path = sync_mirror(FakeRemote(), self.mirror_dir, clone_url=self.origin)
+        self.assertEqual(get_num_commits_by_branch(LocalProject(path, FakeRemote()))['main'], 4)
+
+    def test_unreachable_blob(self):
+        # a truly blobless mirror (local paths ignore the filter), whose remote then disappears
+        git(self.origin, 'config', 'uploadpack.allowFilter', 'true')
+        path = sync_mirror(FakeRemote(), os.path.join(self.directory.name, 'blobless'),
+                           clone_url=f'file://{self.origin}')
+        os.rename(self.origin, f'{self.origin}.moved')
+        project = LocalProject(path, FakeRemote())
+        with self.assertRaises(GitlabGetError):
+            project.files.get(file_path='.gitlab-ci.yml', ref='main')
+        summary = fetch_ci_summary(project, ProjectCache(':memory:'), CiFile('7', 'main', '.gitlab-ci.yml'))
+        self.assertEqual(summary['stages'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+import gitlab
+
+from gitfile import iter_outdated_projects, process_project
+from crawler.async_crawl import run_crawl
+from crawler.metrics import METRICS, KEY_COLUMNS, register_metric, required_resources, select_metrics
+from benchmarks.stub import GitLabStub, sample_project
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.directory.name, 'cache.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_selection(self):
+        self.assertEqual([metric.column for metric in select_metrics('')], list(METRICS))
+        self.assertEqual([metric.column for metric in select_metrics('ALL')], list(METRICS))
+        self.assertEqual([metric.column for metric in select_metrics('languages, number of commits')],
+                         [*KEY_COLUMNS, 'Number of Commits', 'Languages'])
+        self.assertEqual(required_resources(select_metrics('inventory')), {'tree'})
+        with self.assertRaises(ValueError):
+            select_metrics('Number of Stars')
+
+    def test_inventory_does_not_fetch_the_history(self):
+        project = sample_project()
+        with GitLabStub([project]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            row = process_project(gl.projects.get(project.id), metrics='inventory')
+            requests = list(stub.requests)
+
+        self.assertEqual(list(row), [metric.column for metric in select_metrics('inventory')])
+        self.assertEqual(row['Has CI / CD'], 'yes')
+        self.assertFalse([path for path in requests if '/repository/commits' in path
+                          or '/repository/branches' in path or path.endswith(('/languages', '/hooks'))])
+
+    def test_engines_agree_on_a_selection(self):
+        projects = [sample_project(1, 'api'), sample_project(2, 'web', group='front')]
+        selection = 'Number of Branches,Has Tests,Languages'
+        with GitLabStub(projects) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            expected = {project.name: process_project(gl.projects.get(project.id), metrics=selection)
+                        for project in projects}
+            rows = run_crawl(stub.url, 'token', [project.attributes(stub.url) for project in projects],
+                             metrics=selection)
+
+        self.assertEqual({row['Name']: row for row in rows}, expected)
+        self.assertEqual(expected['api']['Number of Branches'], 2)
+
+    def test_cached_rows_need_every_selected_column(self):
+        project = sample_project()
+        with GitLabStub([project]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            process_project(gl.projects.get(project.id), cache_path=self.cache_path, metrics='inventory')
+            projects = [gl.projects.get(project.id)]
+            cached = []
+            outdated = list(iter_outdated_projects(projects, self.cache_path, cached.append,
+                                                   columns=['Project ID', 'Number of Commits']))
+            self.assertEqual(len(outdated), 1)
+            outdated = list(iter_outdated_projects(projects, self.cache_path, cached.append,
+                                                   columns=['Project ID', 'Has Tests']))
+
+        self.assertEqual(outdated, [])
+        self.assertEqual(cached, [{'Project ID': project.id, 'Has Tests': 'yes'}])
+
+    def test_registered_metric_plugs_in(self):
+        previous = METRICS['Technologies']
+        try:
+            register_metric('Technologies', requires=['languages'])(
+                lambda resources: ', '.join(sorted(resources.languages)))
+            project = sample_project()
+            with GitLabStub([project]) as stub:
+                gl = gitlab.Gitlab(stub.url, private_token='token')
+                row = process_project(gl.projects.get(project.id), metrics='Technologies')
+        finally:
+            METRICS['Technologies'] = previous
+
+        self.assertEqual(row['Technologies'], ', '.join(sorted(project.languages)))
+
+
+if __name__ == '__main__':
+    unittest.main()
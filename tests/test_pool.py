@@ -0,0 +1,41 @@
+import unittest
+
+import gitlab
+
+from gitfile import process_project, process_project_attributes
+from crawler.pool import ClientSettings, open_worker_pool, worker_client
+from benchmarks.stub import GitLabStub, sample_project
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def check_backend(self, backend: str):
+        projects = [sample_project(project_id, f'project-{project_id}') for project_id in range(1, 7)]
+        with GitLabStub(projects) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            listed = [gl.projects.get(project.id) for project in projects]
+            expected = [process_project(project) for project in listed]
+            stub.connections = 0
+            with open_worker_pool(backend, ClientSettings(stub.url, 'token'), max_workers=2) as executor:
+                rows = list(executor.map(process_project_attributes, [project.attributes for project in listed]))
+            num_connections = stub.connections
+
+        self.assertEqual(rows, expected)
+        # one keep-alive connection per worker, whatever the number of projects
+        self.assertLessEqual(num_connections, 2)
+
+    def test_process_backend(self):
+        self.check_backend('process')
+
+    def test_thread_backend(self):
+        self.check_backend('thread')
+
+    def test_client_only_in_workers(self):
+        with self.assertRaises(RuntimeError):
+            worker_client()
+        with self.assertRaises(ValueError):
+            open_worker_pool('async', ClientSettings('http://localhost', 'token'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import json
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import gitlab
+
+from gitfile import process_project
+from crawler.async_crawl import run_crawl
+from crawler.profiler import endpoint_template, install_profiler, load_calls, report_profile, summarize_calls
+from benchmarks.stub import GitLabStub, sample_project
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.profile_dir = directory.name
+
+    def test_endpoint_template(self):
+        self.assertEqual(endpoint_template('http://gitlab/api/v4/projects/7/repository/files/.gitlab-ci.yml?ref=a'),
+                         '/projects/:id/repository/files/:file')
+        self.assertEqual(endpoint_template('/projects/team%2Fapi/repository/commits'), '/projects/:id/repository/commits')
+
+    def test_calls_are_attributed_to_projects_and_metrics(self):
+        with GitLabStub([sample_project(), sample_project(2, 'web')]) as stub:
+            gl = gitlab.Gitlab(stub.url, private_token='token')
+            install_profiler(gl, self.profile_dir)
+            project = gl.projects.get(1)
+            process_project(project)
+            # the client travels to the worker processes along with the project
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                executor.submit(process_project, gl.projects.get(2)).result()
+            num_requests = len(stub.requests)
+
+        calls = load_calls(self.profile_dir)
+        self.assertEqual(len(calls), num_requests)
+        self.assertEqual(calls['pid'].nunique(), 2)
+        tables = summarize_calls(calls)
+        self.assertEqual(set(tables['project'].index), {'', 'team/demo', 'team/web'})
+        self.assertEqual(set(tables['metric'].index), {'(other)', 'fetch_incremental_snapshot', 'scan_tree_markers',
+                                                       'get_language_percentages', 'hooks', 'ci_config'})
+        self.assertIn('/projects/:id/repository/commits', tables['endpoint'].index)
+        self.assertAlmostEqual(tables['metric']['share_of_calls'].sum(), 1.0)
+
+        report_profile(self.profile_dir)
+        with open(os.path.join(self.profile_dir, 'trace.json')) as file:
+            trace = json.load(file)
+        self.assertEqual(len(trace['traceEvents']), num_requests)
+
+    def test_async_engine(self):
+        with GitLabStub([sample_project()]) as stub:
+            run_crawl(stub.url, 'token', [sample_project().attributes(stub.url)], profile_dir=self.profile_dir)
+            num_requests = len(stub.requests)
+        calls = load_calls(self.profile_dir)
+        self.assertEqual(len(calls), num_requests)
+        self.assertEqual(set(calls['project']), {'team/demo'})
+        self.assertEqual(set(calls['metric']), {'fetch_incremental_snapshot', 'scan_tree_markers',
+                                                'get_language_percentages', 'hooks', 'ci_config'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,7 @@ from utils.pydantic_advanced_settings import CustomizedSettings
 class TestSettings(CustomizedSettings):
     example_setting: str = 'default_value'
     another_setting: int = 42
+    flag_setting: bool = False
 
 
 # Unit tests for TestSettings
@@ -25,6 +26,11 @@ class TestCustomizedSettings(unittest.TestCase):
         settings = TestSettings()
         self.assertEqual(settings.example_setting, 'cli_value')
 
+    @patch('sys.argv', ['script_name', '--flag_setting'])
+    def test_command_line_boolean_flag(self):
+        settings = TestSettings()
+        self.assertTrue(settings.flag_setting)
+
     # ... Additional tests
 
     def test_incomplete_json_file(self):
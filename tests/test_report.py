@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from crawler.report import JsonlSink, ParquetSink, export_excel, open_report_sink, read_report
+
+
+def project_data(project_id: int, group: str = 'team'):
+    return {
+        'Project ID': project_id,
+        'Name': f'project-{project_id}',
+        'Group Name': group,
+        'Number of Commits': 10 * project_id,
+        'Commits per Branch': {'main': 10 * project_id, 'dev': 3},
+        'Main Developers': {'alice': 7},
+        'Languages': {'Python': 100.0},
+        'Has Docker': 'yes',
+    }
+
+
+class TestReportSinks(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def check_sink(self, path: str):
+        with open_report_sink(path) as sink:
+            sink.write(project_data(1))
+            sink.write(project_data(2, group='other'))
+
+        with open_report_sink(path, resume=True) as sink:
+            self.assertEqual(sink.done_project_ids(), {1, 2})
+            sink.write(project_data(3))
+
+        report = read_report(path)
+        self.assertEqual(sorted(report['Project ID']), [1, 2, 3])
+        row = report[report['Project ID'] == 2].iloc[0]
+        self.assertEqual(row['Commits per Branch'], {'main': 20, 'dev': 3})
+        self.assertEqual(row['Languages'], {'Python': 100.0})
+
+        with open_report_sink(path) as sink:
+            self.assertEqual(len(read_report(path)), 0)
+
+    def test_jsonl(self):
+        self.assertIsInstance(open_report_sink(self.path('report.jsonl')), JsonlSink)
+        self.check_sink(self.path('report.jsonl'))
+
+    def test_parquet(self):
+        self.assertIsInstance(open_report_sink(self.path('report.parquet')), ParquetSink)
+        self.check_sink(self.path('report.parquet'))
+
+    def test_parquet_parts_are_written_while_crawling(self):
+        sink = ParquetSink(self.path('report.parquet'), batch_size=2)
+        for project_id in range(5):
+            sink.write(project_data(project_id))
+        self.assertEqual(sink.done_project_ids(), {0, 1, 2, 3})
+        sink.close()
+        self.assertEqual(len(read_report(self.path('report.parquet'))), 5)
+
+    def test_parquet_keeps_only_the_selected_columns(self):
+        with open_report_sink(self.path('report.parquet')) as sink:
+            sink.write({'Project ID': 1, 'Name': 'api', 'Group Name': 'team', 'Has Tests': 'yes', 'Stars': 4})
+        report = read_report(self.path('report.parquet'))
+        self.assertEqual(list(report.columns), ['Project ID', 'Name', 'Group Name', 'Has Tests', 'Stars'])
+        self.assertEqual(report['Stars'].tolist(), [4])
+
+    def test_excel_export_has_one_sheet_per_group(self):
+        path = self.path('report.jsonl')
+        with open_report_sink(path) as sink:
+            for project_id, group in ((1, 'team'), (2, 'other'), (3, 'team')):
+                sink.write(project_data(project_id, group))
+        export_excel(read_report(path), self.path('report.xlsx'))
+        sheets = pd.read_excel(self.path('report.xlsx'), sheet_name=None)
+        self.assertEqual(list(sheets), ['team', 'other'])
+        self.assertEqual(sheets['team']['Name'].tolist(), ['project-1', 'project-3'])
+
+    def test_excel_export_of_list_fields(self):
+        for path in (self.path('report.jsonl'), self.path('report.parquet')):
+            with open_report_sink(path) as sink:
+                sink.write(dict(project_data(1), **{'CI Stages': ['build', 'test'], 'CI Images': []}))
+            export_excel(read_report(path), self.path('report.xlsx'))
+            sheet = pd.read_excel(self.path('report.xlsx'), keep_default_na=False)
+            self.assertEqual((sheet['CI Stages'][0], sheet['CI Images'][0]), ('build, test', ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
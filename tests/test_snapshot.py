@@ -0,0 +1,46 @@
+import unittest
+
+from crawler.snapshot import CommitSnapshot
+from fake_project import FakeProject, make_branch, make_commit
+
+
+def build_project(num_commits: int = 250) -> FakeProject:
+    commits = [
+        make_commit(f'c{i}', [f'c{i - 1}'] if i else [], author='alice' if i % 2 else 'bob',
+                    message='fix: bug' if i % 5 == 0 else 'wip',
+                    created_at=f'2024-01-{i % 28 + 1:02d}T10:00:00.000+00:00')
+        for i in range(num_commits)
+    ]
+    branches = [make_branch('main', f'c{num_commits - 1}'), make_branch('dev', 'c10')]
+    return FakeProject(commits, branches, name='demo')
+
+
+class TestCommitSnapshot(unittest.TestCase):
+
+    def test_fetch_walks_history_once_and_counts_pages(self):
+        project = build_project(250)
+        snapshot = CommitSnapshot.fetch(project)
+        self.assertEqual(snapshot.total_commits, 250)
+        self.assertEqual(snapshot.branch_names, ['main', 'dev'])
+        # 3 pages of commits and 1 page of branches
+        self.assertEqual(snapshot.pages_fetched, 4)
+        self.assertEqual(len(project.commits.requests), 3)
+        self.assertTrue(all(request['all'] for request in project.commits.requests))
+
+    def test_fetch_without_branches(self):
+        project = build_project(100)
+        snapshot = CommitSnapshot.fetch(project, with_branches=False)
+        self.assertEqual(snapshot.branches, [])
+        # a full last page needs one extra (empty) request to know it is the last
+        self.assertEqual(snapshot.pages_fetched, 2)
+        self.assertEqual(project.branches.requests, [])
+
+    def test_metrics(self):
+        snapshot = CommitSnapshot.fetch(build_project(10))
+        self.assertEqual(snapshot.developer_counts(), {'bob': 5, 'alice': 5})
+        # bob authors c0, c2, ..., alice c1, c3, ...; fix commits are c0 and c5
+        self.assertEqual(snapshot.conventional_commit_percentage(), {'bob': 20.0, 'alice': 20.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
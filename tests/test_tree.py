@@ -0,0 +1,70 @@
+import unittest
+
+import gitlab
+
+from gitfile import get_project_file_paths, has_tests
+from crawler.tree import MARKERS, MarkerScan, scan_tree_markers
+from benchmarks.stub import GitLabStub, sample_project
+
+
+class TestTreeScan(unittest.TestCase):
+
+    def setUp(self):
+        self.project = sample_project()
+        for index in range(250):
+            self.project.files[f'src/pkg{index}/module.py'] = ''
+
+    def test_file_paths_in_one_recursive_listing(self):
+        with GitLabStub([self.project]) as stub:
+            project = gitlab.Gitlab(stub.url, private_token='token').projects.get(1)
+            stub.requests.clear()
+            file_paths = get_project_file_paths(project, 'main')
+            self.assertEqual(sorted(file_paths), sorted(self.project.files))
+            # 6 pages of 100 entries, whatever the number of directories
+            self.assertEqual(len(stub.requests), 6)
+
+    def test_scan_stops_once_every_marker_is_found(self):
+        self.project.files = {'tests/test_a.py': '', '.gitlab-ci.yml': '', 'Dockerfile': '',
+                              'docker/dockerfile': '', 'docker-compose.yml': ''}
+        self.project.files.update({f'zz/pkg{index}/module.py': '' for index in range(300)})
+        with GitLabStub([self.project]) as stub:
+            project = gitlab.Gitlab(stub.url, private_token='token').projects.get(1)
+            stub.requests.clear()
+            self.assertEqual(scan_tree_markers(project, 'main', probe=False), {
+                'docker': True, 'docker-compose': True, 'ci': True, 'root-docker-compose': True, 'tests': True,
+            })
+            self.assertEqual(len(stub.requests), 1)
+            self.assertTrue(has_tests(project))
+
+    def test_probes_decide_root_markers_without_a_walk(self):
+        self.project.files = {'Dockerfile': '', 'docker-compose.yml': '', 'test/test_a.py': ''}
+        self.project.files.update({f'src/pkg{index}/module.py': '' for index in range(300)})
+        with GitLabStub([self.project]) as stub:
+            project = gitlab.Gitlab(stub.url, private_token='token').projects.get(1)
+            stub.requests.clear()
+            self.assertEqual(scan_tree_markers(project, 'main', markers={
+                name: MARKERS[name] for name in ('docker', 'docker-compose', 'ci', 'root-docker-compose')
+            }), {'docker': True, 'docker-compose': True, 'ci': False, 'root-docker-compose': True})
+            # one HEAD request per probed path, and no tree page
+            self.assertEqual(len(stub.requests), 3)
+            self.assertFalse([path for path in stub.requests if path.endswith('/repository/tree')])
+            self.assertTrue(has_tests(project))
+
+    def test_marker_scan(self):
+        scan = MarkerScan()
+        self.assertFalse(scan.feed([{'type': 'tree', 'path': 'src/Tests'}, {'type': 'blob', 'path': 'a/Dockerfile'},
+                                    {'type': 'blob', 'path': 'deploy/.gitlab-ci.yml'},
+                                    {'type': 'blob', 'path': 'dockerfiles/readme.md'}]))
+        self.assertTrue(scan.found['tests'])
+        self.assertTrue(scan.found['docker'])
+        self.assertFalse(scan.found['ci'])
+        self.assertEqual(scan.pending, {'docker-compose', 'ci', 'root-docker-compose'})
+        scan.probed('.gitlab-ci.yml', False)
+        scan.probed('docker-compose.yml', True)
+        self.assertTrue(scan.done)
+        self.assertEqual(scan.finish(), {'docker': True, 'docker-compose': True, 'ci': False,
+                                         'root-docker-compose': True, 'tests': True})
+
+
+if __name__ == '__main__':
+    unittest.main()
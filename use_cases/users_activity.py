@@ -1,30 +1,44 @@
+import asyncio
+
 import gitlab
-from datetime import datetime
-from tqdm import tqdm
+import pandas as pd
+
+from crawler.activity import ActivityStore, scan_activity
+from crawler.async_client import AsyncGitLabClient
+from crawler.http_cache import install_http_cache
+from utils.basic_logger import simple_logger
+
+logger = simple_logger(__name__)
 
-def get_user_activity(settings):
+
+def get_user_activity(settings) -> pd.DataFrame:
+    """
+    First and last commit date, number of active projects and number of commits of every author, over all the refs
+    of all the projects. Projects are scanned concurrently and the results are kept in ``settings.cache_path``, so a
+    rerun only fetches the commits created since the previous one.
+    """
     gl = gitlab.Gitlab(settings.gitlab_url, private_token=settings.access_token)
-    projects = gl.projects.list(all=True)
-
-    user_commit_dates = {}
-
-    for project in tqdm(projects):
-        for commit in project.commits.list(all=True):
-            author_email = commit.author_email
-            commit_date = datetime.strptime(commit.created_at.split('T')[0], '%Y-%m-%d')
-
-            if author_email not in user_commit_dates:
-                user_commit_dates[author_email] = {'first': commit_date, 'last': commit_date}
-            else:
-                if commit_date < user_commit_dates[author_email]['first']:
-                    user_commit_dates[author_email]['first'] = commit_date
-                if commit_date > user_commit_dates[author_email]['last']:
-                    user_commit_dates[author_email]['last'] = commit_date
-
-    for user, dates in user_commit_dates.items():
-        print(f'User: {user}, First Commit: {dates["first"]}, Last Commit: {dates["last"]}')
-        
+    if settings.http_cache_path:
+        install_http_cache(gl, settings.http_cache_path, max_bytes=settings.http_cache_size_mb * 2 ** 20)
+    projects = [project.attributes for project in gl.projects.list(iterator=True)]
+
+    store = ActivityStore(settings.cache_path)
+    if settings.force_refresh:
+        store.reset()
+
+    async def scan():
+        async with AsyncGitLabClient(settings.gitlab_url, settings.access_token,
+                                     max_concurrency=settings.max_concurrency) as client:
+            await scan_activity(client, projects, store, window_days=settings.activity_window_days)
+            logger.info(f'Activity of {len(projects)} projects scanned with {client.num_requests} API requests')
+
+    asyncio.run(scan())
+    table = store.table(merge_identities=settings.merge_identities)
+    store.close()
+    return table
+
+
 if __name__ == '__main__':
     from config import Settings
     settings = Settings()
-    get_user_activity(settings)
\ No newline at end of file
+    print(get_user_activity(settings).to_string(index=False))
@@ -24,7 +24,11 @@ class ArgparseConfigSettingsSource(PydanticBaseSettingsSource):
     def _parse_args(self):
         parser = argparse.ArgumentParser(description='Command line arguments')
         for field_name, field in self.settings_cls.model_fields.items():
-            parser.add_argument(f'--{field_name}', type=field.annotation, help=f'{field_name} setting')
+            if field.annotation is bool:
+                # a bare flag switches a boolean setting on, `type=bool` would read any given value as True
+                parser.add_argument(f'--{field_name}', action='store_const', const=True, help=f'{field_name} setting')
+            else:
+                parser.add_argument(f'--{field_name}', type=field.annotation, help=f'{field_name} setting')
         return parser.parse_args()
 
     def get_field_value(self, field: FieldInfo, field_name: str) -> Tuple[Any, str, bool]: